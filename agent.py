@@ -11,8 +11,8 @@ from enum import Enum
 import uuid
 import models
 
-from python.helpers import extract_tools, files, errors, history, tokens, context as context_helper
-from python.helpers import dirty_json
+from python.helpers import extract_tools, files, errors, history, tokens, change_feed, context as context_helper
+from python.helpers import dirty_json, tool_registry, executors, loop_shards
 from python.helpers.print_style import PrintStyle
 
 from langchain_core.prompts import (
@@ -22,7 +22,7 @@ from langchain_core.messages import SystemMessage, BaseMessage
 
 import python.helpers.log as Log
 from python.helpers.dirty_json import DirtyJson
-from python.helpers.defer import DeferredTask
+from python.helpers.defer import DeferredTask, ThreadSafeEvent
 from typing import Callable
 from python.helpers.localization import Localization
 from python.helpers.extension import call_extensions
@@ -67,12 +67,13 @@ class AgentContext:
             AgentContext.set_current(self.id)
 
         # initialize state
+        self._changed = ThreadSafeEvent()  # pause state or interventions changed
         self.name = name
         self.config = config
         self.log = log or Log.Log()
         self.log.context = self
         self.agent0 = agent0 or Agent(0, self.config, self)
-        self.paused = paused
+        self._paused = paused
         self.streaming_agent = streaming_agent
         self.task: DeferredTask | None = None
         self.created_at = created_at or datetime.now(timezone.utc)
@@ -82,8 +83,30 @@ class AgentContext:
         self.last_message = last_message or datetime.now(timezone.utc)
         self.data = data or {}
         self.output_data = output_data or {}
+        change_feed.mark_dirty(self.id, listed=True)
 
+    @property
+    def paused(self) -> bool:
+        return self._paused
 
+    @paused.setter
+    def paused(self, value: bool):
+        changed = self._paused != value
+        self._paused = value
+        change_feed.mark_dirty(self.id)
+        if changed:
+            self._changed.set()
+
+    def notify_changed(self):
+        """Wake coroutines waiting in wait_for_change, e.g. after an intervention was set."""
+        self._changed.set()
+
+    async def wait_while_paused(self):
+        await self._changed.wait_for(lambda: not self._paused)
+
+    async def wait_for_change(self, predicate: Callable[[], bool], timeout: float | None = None) -> bool:
+        """Wait until predicate() is true, re-checked when pause state or interventions change."""
+        return await self._changed.wait_for(predicate, timeout)
 
     @staticmethod
     def get(id: str):
@@ -140,6 +163,8 @@ class AgentContext:
         context = AgentContext._contexts.pop(id, None)
         if context and context.task:
             context.task.kill()
+        change_feed.forget_context(id)
+        loop_shards.release(id)
         return context
 
     def get_data(self, key: str, recursive: bool = True):
@@ -157,6 +182,7 @@ class AgentContext:
     def set_output_data(self, key: str, value: Any, recursive: bool = True):
         # recursive is not used now, prepared for context hierarchy
         self.output_data[key] = value
+        change_feed.mark_dirty(self.id, listed=True)  # shown in the context list
 
     def output(self):
         return {
@@ -169,7 +195,7 @@ class AgentContext:
             ),
             "no": self.no,
             "log_guid": self.log.guid,
-            "log_version": len(self.log.updates),
+            "log_version": self.log.version,
             "log_length": len(self.log.logs),
             "paused": self.paused,
             "last_message": (
@@ -244,10 +270,11 @@ class AgentContext:
         self, func: Callable[..., Coroutine[Any, Any, Any]], *args: Any, **kwargs: Any
     ):
         if not self.task:
+            # the context's shard, all its tasks run on the same event loop
             self.task = DeferredTask(
-                thread_name=self.__class__.__name__,
+                thread_name=loop_shards.place(self.id),
             )
-        self.task.start_task(func, *args, **kwargs)
+        self.task.start_task(loop_shards.track, self.id, func, *args, **kwargs)
         return self.task
 
     # this wrapper ensures that superior agents are called back if the chat was loaded from file and original callstack is gone
@@ -348,7 +375,7 @@ class Agent:
 
         self.history = history.History(self)  # type: ignore[abstract]
         self.last_user_message: history.Message | None = None
-        self.intervention: UserMessage | None = None
+        self._intervention: UserMessage | None = None
         self.data: dict[str, Any] = {}  # free data object all the tools can use
 
         asyncio.run(self.call_extensions("agent_init"))
@@ -395,7 +422,9 @@ class Agent:
                             if stream_data.get("chunk"):
                                 printer.stream(stream_data["chunk"])
                             # Use the potentially modified full text for downstream processing
-                            await self.handle_reasoning_stream(stream_data["full"])
+                            await self.handle_reasoning_stream(
+                                stream_data["full"], masked=stream_data.get("masked", False)
+                            )
 
                         async def stream_callback(chunk: str, full: str):
                             await self.handle_intervention()
@@ -411,7 +440,9 @@ class Agent:
                             if stream_data.get("chunk"):
                                 printer.stream(stream_data["chunk"])
                             # Use the potentially modified full text for downstream processing
-                            await self.handle_response_stream(stream_data["full"])
+                            await self.handle_response_stream(
+                                stream_data["full"], masked=stream_data.get("masked", False)
+                            )
 
                         # call main LLM
                         agent_response, _reasoning = await self.call_chat_model(
@@ -521,12 +552,12 @@ class Agent:
         ]
         full_text = ChatPromptTemplate.from_messages(full_prompt).format()
 
-        # store as last context window content
+        # store as last context window content, tokenizing the whole window runs off the loop
         self.set_data(
             Agent.DATA_NAME_CTX_WINDOW,
             {
                 "text": full_text,
-                "tokens": tokens.approximate_tokens(full_text),
+                "tokens": await executors.run_in_thread(tokens.approximate_tokens, full_text),
             },
         )
 
@@ -754,9 +785,19 @@ class Agent:
         self.context.log.set_progress(message, True)
         return False
 
+    @property
+    def intervention(self) -> UserMessage | None:
+        return self._intervention
+
+    @intervention.setter
+    def intervention(self, value: UserMessage | None):
+        self._intervention = value
+        if value is not None:
+            self.context.notify_changed()
+
     async def handle_intervention(self, progress: str = ""):
-        while self.context.paused:
-            await asyncio.sleep(0.1)  # wait if paused
+        if self.context.paused:
+            await self.context.wait_while_paused()  # wait if paused
         if (
             self.intervention
         ):  # if there is an intervention message, but not yet processed
@@ -776,8 +817,14 @@ class Agent:
             raise InterventionException(msg)
 
     async def wait_if_paused(self):
-        while self.context.paused:
-            await asyncio.sleep(0.1)
+        if self.context.paused:
+            await self.context.wait_while_paused()
+
+    async def wait_for_intervention(self, timeout: float) -> bool:
+        """Sleep up to timeout seconds, returns True early on an intervention or a pause."""
+        return await self.context.wait_for_change(
+            lambda: self._intervention is not None or self.context.paused, timeout
+        )
 
     async def process_tools(self, msg: str):
         # search for tool usage requests in agent message
@@ -863,57 +910,52 @@ class Agent:
                 content=f"{self.agent_name}: Message misformat, no valid tool request found.",
             )
 
-    async def handle_reasoning_stream(self, stream: str):
+    async def handle_reasoning_stream(self, stream: str, masked: bool = False):
         await self.handle_intervention()
         await self.call_extensions(
             "reasoning_stream",
             loop_data=self.loop_data,
             text=stream,
+            masked=masked,
         )
 
-    async def handle_response_stream(self, stream: str):
+    async def handle_response_stream(self, stream: str, masked: bool = False):
         await self.handle_intervention()
         try:
             if len(stream) < 25:
                 return  # no reason to try
-            response = DirtyJson.parse_string(stream)
-            if isinstance(response, dict):
+            response, changed = self._parse_response_stream(stream)
+            if isinstance(response, dict) and changed:
                 await self.call_extensions(
                     "response_stream",
                     loop_data=self.loop_data,
                     text=stream,
-                    parsed=response,
+                    parsed=dict(response),  # extensions may replace top-level values
+                    changed=changed,
+                    masked=masked,  # secrets in text and parsed are masked already
                 )
 
         except Exception as e:
             pass
 
+    def _parse_response_stream(self, stream: str) -> tuple[Any, set[str]]:
+        # feed only the new part of the stream to the parser kept for this response,
+        # start over when earlier text changed (masking a secret that just completed)
+        state = self.loop_data.params_temporary.get("response_parser")
+        if not state or not stream.startswith(state[1]):
+            state = (DirtyJson(), "")
+        parser, fed = state
+        self.loop_data.params_temporary["response_parser"] = (parser, stream)
+        return parser.feed(stream[len(fed) :]), parser.changed
+
     def get_tool(
         self, name: str, method: str | None, args: dict, message: str, loop_data: LoopData | None, **kwargs
     ):
         from python.tools.unknown import Unknown
         from python.helpers.tool import Tool
 
-        classes = []
-
-        # try agent tools first
-        if self.config.profile:
-            try:
-                classes = extract_tools.load_classes_from_file(
-                    "agents/" + self.config.profile + "/tools/" + name + ".py", Tool  # type: ignore[arg-type]
-                )
-            except Exception:
-                pass
-
-        # try default tools
-        if not classes:
-            try:
-                classes = extract_tools.load_classes_from_file(
-                    "python/tools/" + name + ".py", Tool  # type: ignore[arg-type]
-                )
-            except Exception as e:
-                pass
-        tool_class = classes[0] if classes else Unknown
+        # profile tools first, then default tools, resolved once per profile and name
+        tool_class = tool_registry.get_tool_class(name, self.config.profile, Tool) or Unknown
         return tool_class(
             agent=self, name=name, method=method, args=args, message=message, loop_data=loop_data, **kwargs
         )
@@ -119,6 +119,14 @@ def initialize_agent(override_settings: dict | None = None):
     # return config object
     return config
 
+def initialize_workers():
+    from python.helpers import executors, loop_shards
+    set = settings.get_settings()
+    # pools are only replaced when their size changes
+    executors.configure(int(set["executor_threads"]), int(set["executor_processes"]))
+    # contexts placed already keep their event loop
+    loop_shards.configure(int(set["agent_loop_shards"]), set["agent_loop_placement"])
+
 def initialize_chats():
     from python.helpers import persist_chat
     async def initialize_chats_async():
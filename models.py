@@ -22,6 +22,7 @@ from litellm.types.utils import ModelResponse
 from python.helpers import dotenv
 from python.helpers import settings, dirty_json
 from python.helpers.dotenv import load_dotenv
+from python.helpers import embedding_service
 from python.helpers.providers import get_provider_config
 from python.helpers.rate_limiter import RateLimiter
 from python.helpers.tokens import approximate_tokens
@@ -913,7 +914,15 @@ def get_browser_model(
 
 def get_embedding_model(
     provider: str, name: str, model_config: Optional[ModelConfig] = None, **kwargs: Any
-) -> LiteLLMEmbeddingWrapper | LocalSentenceTransformerWrapper:
+) -> embedding_service.EmbeddingService:
     orig = provider.lower()
     provider_name, kwargs = _merge_provider_defaults("embedding", orig, kwargs)
-    return _get_litellm_embedding(name, provider_name, model_config, **kwargs)
+    # one shared instance per model so concurrent callers get batched together
+    key = repr((provider_name, name, sorted(kwargs.items()), model_config))
+    local = provider_name == "huggingface" and name.startswith("sentence-transformers/")
+    return embedding_service.get_service(
+        key,
+        lambda: _get_litellm_embedding(name, provider_name, model_config, **kwargs),
+        # local models encode in-process, parallel batches would only compete for the CPU
+        max_concurrency=1 if local else embedding_service.MAX_CONCURRENCY,
+    )
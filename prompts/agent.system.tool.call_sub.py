@@ -1,7 +1,7 @@
 import json
 from typing import Any
 from python.helpers.files import VariablesPlugin
-from python.helpers import files
+from python.helpers import files, prompt_templates
 from python.helpers.print_style import PrintStyle
 
 
@@ -10,8 +10,11 @@ class CallSubordinate(VariablesPlugin):
 
         # collect all prompt profiles from subdirectories (_context.md file)
         profiles = []
+        # rendered as part of the cached tools prompt, new profiles change the folder
+        prompt_templates.record_dependency(files.get_abs_path("agents"))
         agent_subdirs = files.get_subdirectories("agents", exclude=["_example"])
         for agent_subdir in agent_subdirs:
+            prompt_templates.record_dependency(files.get_abs_path("agents", agent_subdir))
             try:
                 context = files.read_prompt_file(
                     "_context.md",
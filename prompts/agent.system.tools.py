@@ -1,11 +1,14 @@
 import os
 from typing import Any
 from python.helpers.files import VariablesPlugin
-from python.helpers import files
+from python.helpers import files, prompt_templates
 from python.helpers.print_style import PrintStyle
 
 
 class CallSubordinate(VariablesPlugin):
+    # reused until a tool file or one of the folders changes
+    cache_variables = True
+
     def get_variables(self, file: str, backup_dirs: list[str] | None = None) -> dict[str, Any]:
 
         # collect all prompt folders in order of their priority
@@ -15,6 +18,10 @@ class CallSubordinate(VariablesPlugin):
             for backup_dir in backup_dirs:
                 folders.append(files.get_abs_path(backup_dir))
 
+        # new or removed tool files change the folders
+        for f in folders:
+            prompt_templates.record_dependency(f)
+
         # collect all tool instruction files
         prompt_files = files.get_unique_filenames_in_dirs(folders, "agent.system.tool.*.md")
         
@@ -22,6 +29,7 @@ class CallSubordinate(VariablesPlugin):
         tools = []
         for prompt_file in prompt_files:
             try:
+                prompt_templates.record_dependency(prompt_file)
                 tool = files.read_prompt_file(prompt_file)
                 tools.append(tool)
             except Exception as e:
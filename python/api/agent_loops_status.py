@@ -0,0 +1,22 @@
+from dataclasses import asdict
+
+from python.helpers.api import ApiHandler, Input, Output, Request
+from python.helpers import executors, loop_shards
+
+
+class AgentLoopsStatus(ApiHandler):
+    async def process(self, input: Input, request: Request) -> Output:
+        return {
+            "policy": loop_shards.get_policy(),
+            "shards": [asdict(shard) for shard in loop_shards.get_stats()],
+            # every monitored loop, shards and background loops (MCP sessions, job loop...)
+            "loops": [
+                {
+                    "name": lag.name,
+                    "lag_mean": lag.mean,
+                    "lag_max": lag.max,
+                    "blocked": lag.blocked,
+                }
+                for lag in executors.get_loop_lags()
+            ],
+        }
@@ -1,3 +1,5 @@
+import time
+
 from python.helpers.api import ApiHandler, Request, Response
 
 from agent import AgentContext, AgentContextType
@@ -5,6 +7,15 @@ from agent import AgentContext, AgentContextType
 from python.helpers.task_scheduler import TaskScheduler
 from python.helpers.localization import Localization
 from python.helpers.dotenv import get_dotenv_value
+from python.helpers import change_feed
+
+LONG_POLL_MAX_TIMEOUT = 30
+# the lists are rebuilt when the list revision moves, and at most this often
+# for state changed without notification
+CONTEXTS_CACHE_TTL = 1.0
+
+# timezone -> (list revision, time, contexts, tasks)
+_contexts_cache: dict[str, tuple[int, float, list[dict], list[dict]]] = {}
 
 
 class Poll(ApiHandler):
@@ -13,6 +24,13 @@ class Poll(ApiHandler):
         ctxid = input.get("context", "")
         from_no = input.get("log_from", 0)
         notifications_from = input.get("notifications_from", 0)
+        # long-poll: wait for a change when the client has already seen the current revision
+        revision = input.get("revision", 0)
+        timeout = min(float(input.get("timeout", 0) or 0), LONG_POLL_MAX_TIMEOUT)
+        # only changes of the lists and of the client's own context wake it up
+        if revision and timeout > 0:
+            await change_feed.wait_for_change(revision, timeout, ctxid)
+        revision = change_feed.get_revision()
 
         # Get timezone from input (default to dotenv default or UTC if not provided)
         timezone = input.get("timezone", get_dotenv_value("DEFAULT_USER_TIMEZONE", "UTC"))
@@ -34,7 +52,32 @@ class Poll(ApiHandler):
         notification_manager = AgentContext.get_notification_manager()
         notifications = notification_manager.output(start=notifications_from)
 
-        # loop AgentContext._contexts
+        ctxs, tasks = self.get_contexts_and_tasks(timezone, change_feed.get_list_revision())
+
+        # data from this server
+        return {
+            "deselect_chat": ctxid and not context,
+            "context": context.id if context else "",
+            "contexts": ctxs,
+            "tasks": tasks,
+            "logs": logs,
+            "log_guid": context.log.guid if context else "",
+            "log_version": context.log.version if context else 0,
+            "log_progress": context.log.progress if context else 0,
+            "log_progress_active": context.log.progress_active if context else False,
+            "paused": context.paused if context else False,
+            "notifications": notifications,
+            "notifications_guid": notification_manager.guid,
+            "notifications_version": len(notification_manager.updates),
+            "revision": revision,
+        }
+
+    @staticmethod
+    def get_contexts_and_tasks(timezone: str, revision: int):
+        # shared by all pollers, many open tabs do not multiply the work
+        cached = _contexts_cache.get(timezone)
+        if cached and cached[0] == revision and time.time() - cached[1] < CONTEXTS_CACHE_TTL:
+            return cached[2], cached[3]
 
         # Get a task scheduler instance
         scheduler = TaskScheduler.get()
@@ -107,19 +150,5 @@ class Poll(ApiHandler):
         ctxs.sort(key=lambda x: x["created_at"], reverse=True)
         tasks.sort(key=lambda x: x["created_at"], reverse=True)
 
-        # data from this server
-        return {
-            "deselect_chat": ctxid and not context,
-            "context": context.id if context else "",
-            "contexts": ctxs,
-            "tasks": tasks,
-            "logs": logs,
-            "log_guid": context.log.guid if context else "",
-            "log_version": len(context.log.updates) if context else 0,
-            "log_progress": context.log.progress if context else 0,
-            "log_progress_active": context.log.progress_active if context else False,
-            "paused": context.paused if context else False,
-            "notifications": notifications,
-            "notifications_guid": notification_manager.guid,
-            "notifications_version": len(notification_manager.updates),
-        }
+        _contexts_cache[timezone] = (revision, time.time(), ctxs, tasks)
+        return ctxs, tasks
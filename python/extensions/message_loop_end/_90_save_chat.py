@@ -9,4 +9,4 @@ class SaveChat(Extension):
         if self.agent.context.type == AgentContextType.BACKGROUND:
             return
 
-        persist_chat.save_tmp_chat(self.agent.context)
+        await persist_chat.save_tmp_chat_async(self.agent.context)
@@ -71,7 +71,7 @@ class RecallMemories(Extension):
         user_instruction = (
             loop_data.user_message.output_text() if loop_data.user_message else "None"
         )
-        history = self.agent.history.output_text()[-set["memory_recall_history_len"]:]
+        history = self.agent.history.output_text_tail(set["memory_recall_history_len"])
         message = self.agent.read_prompt(
             "memory.memories_query.msg.md", history=history, message=user_instruction
         )
@@ -114,21 +114,23 @@ class RecallMemories(Extension):
         # get memory database
         db = await Memory.get(self.agent)
 
-        # search for general memories and fragments
-        memories = await db.search_similarity_threshold(
+        # search for general memories and fragments and for solutions, one query embedding
+        found = await db.search_similarity_threshold_multi(
             query=query,
-            limit=set["memory_recall_memories_max_search"],
+            searches={
+                "memories": (
+                    set["memory_recall_memories_max_search"],
+                    f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
+                ),
+                "solutions": (
+                    set["memory_recall_solutions_max_search"],
+                    f"area == '{Memory.Area.SOLUTIONS.value}'",
+                ),
+            },
             threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
-        )
-
-        # search for solutions
-        solutions = await db.search_similarity_threshold(
-            query=query,
-            limit=set["memory_recall_solutions_max_search"],
-            threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.SOLUTIONS.value}'",  # exclude solutions
         )
+        memories = found["memories"]
+        solutions = found["solutions"]
 
         if not memories and not solutions:
             log_item.update(
@@ -1,4 +1,4 @@
-from python.helpers import persist_chat, tokens
+from python.helpers import persist_chat, tokens, change_feed
 from python.helpers.extension import Extension
 from agent import LoopData
 import asyncio
@@ -34,6 +34,7 @@ class RenameChat(Extension):
                     new_name = new_name[:40] + "..."
                 # apply to context and save
                 self.agent.context.name = new_name
-                persist_chat.save_tmp_chat(self.agent.context)
+                change_feed.mark_dirty(self.agent.context.id, listed=True)
+                await persist_chat.save_tmp_chat_async(self.agent.context)
         except Exception as e:
             pass  # non-critical
@@ -9,7 +9,13 @@ from python.extensions.before_main_llm_call._10_log_for_stream import build_head
 
 class LogFromStream(Extension):
 
-    async def execute(self, loop_data: LoopData = LoopData(), text: str = "", **kwargs):
+    async def execute(
+        self,
+        loop_data: LoopData = LoopData(),
+        text: str = "",
+        masked: bool = False,
+        **kwargs,
+    ):
 
         # thought length indicator
         pipes = "|" * math.ceil(math.sqrt(len(text)))
@@ -26,4 +32,4 @@ class LogFromStream(Extension):
 
         # update log message
         log_item = loop_data.params_temporary["log_item_generating"]
-        log_item.update(heading=heading, reasoning=text)
+        log_item.update(heading=heading, reasoning=text, masked=masked)
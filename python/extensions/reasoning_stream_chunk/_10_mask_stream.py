@@ -26,8 +26,14 @@ class MaskReasoningStreamChunk(Extension):
             # Update the stream data with processed chunk
             stream_data["chunk"] = processed_chunk
 
-            # Also mask the full text for consistency
-            stream_data["full"] = secrets_mgr.mask_values(stream_data["full"])
+            # Also mask the full text for consistency, reusing the masked part of the stream
+            masker_key = "_reason_stream_masker"
+            masker = agent.get_data(masker_key)
+            if not masker:
+                masker = secrets_mgr.create_stream_masker()
+                agent.set_data(masker_key, masker)
+            stream_data["full"] = masker.mask(stream_data["full"])
+            stream_data["masked"] = True
 
             # Print the processed chunk (this is where printing should happen)
             if processed_chunk:
@@ -22,6 +22,7 @@ class MaskReasoningStreamEnd(Extension):
 
                 # Clean up the filter
                 agent.set_data(filter_key, None)
+            agent.set_data("_reason_stream_masker", None)
         except Exception as e:
             # If masking fails, proceed without masking
             pass
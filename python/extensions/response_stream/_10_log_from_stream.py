@@ -15,6 +15,8 @@ class LogFromStream(Extension):
         loop_data: LoopData = LoopData(),
         text: str = "",
         parsed: dict = {},
+        changed: set[str] | None = None,
+        masked: bool = False,
         **kwargs,
     ):
 
@@ -41,6 +43,16 @@ class LogFromStream(Extension):
         # update log message
         log_item = loop_data.params_temporary["log_item_generating"]
 
+        # streamed responses only copy and mask the fields that changed
+        if changed is not None and log_item.kvps:
+            log_item.update_kvps(
+                {k: parsed[k] for k in changed if k in parsed},
+                heading=heading,
+                content=text,
+                masked=masked,
+            )
+            return
+
         # keep reasoning from previous logs in kvps
         kvps = {}
         if log_item.kvps is not None and "reasoning" in log_item.kvps:
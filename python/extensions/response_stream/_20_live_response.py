@@ -13,9 +13,12 @@ class LiveResponse(Extension):
         loop_data: LoopData = LoopData(),
         text: str = "",
         parsed: dict = {},
+        changed: set[str] | None = None,
         **kwargs,
     ):
         try:
+            if changed is not None and not changed & {"tool_name", "tool_args"}:
+                return  # response text did not change with this chunk
             if (
                 not "tool_name" in parsed
                 or parsed["tool_name"] != "response"
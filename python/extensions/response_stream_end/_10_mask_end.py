@@ -23,6 +23,7 @@ class MaskResponseStreamEnd(Extension):
 
                 # Clean up the filter
                 agent.set_data(filter_key, None)
+            agent.set_data("_resp_stream_masker", None)
         except Exception as e:
             # If masking fails, proceed without masking
             pass
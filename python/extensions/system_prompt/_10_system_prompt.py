@@ -1,9 +1,10 @@
+import os
 from typing import Any
 from python.helpers.extension import Extension
-from python.helpers.mcp_handler import MCPConfig
+from python.helpers.mcp_handler import MCPConfig, get_tools_revision
 from agent import Agent, LoopData
-from python.helpers.settings import get_settings
-from python.helpers import projects
+from python.helpers.settings import get_settings, get_settings_generation
+from python.helpers import files, projects, prompt_segments, prompt_templates
 
 
 class SystemPrompt(Extension):
@@ -15,11 +16,27 @@ class SystemPrompt(Extension):
         **kwargs: Any
     ):
         # append main system prompt and tools
-        main = get_main_prompt(self.agent)
-        tools = get_tools_prompt(self.agent)
-        mcp_tools = get_mcp_tools_prompt(self.agent)
-        secrets_prompt = get_secrets_prompt(self.agent)
-        project_prompt = get_project_prompt(self.agent)
+        # segments are cached per agent, prompt files they read are checked for changes
+        agent = self.agent
+        main = prompt_segments.get_segment(
+            agent, "main", agent.config.profile, lambda: get_main_prompt(agent)
+        )
+        tools = prompt_segments.get_segment(
+            agent,
+            "tools",
+            (agent.config.profile, agent.config.chat_model.vision),
+            lambda: get_tools_prompt(agent),
+        )
+        mcp_tools = prompt_segments.get_segment(
+            agent, "mcp_tools", get_tools_revision(), lambda: get_mcp_tools_prompt(agent)
+        )
+        secrets_prompt = prompt_segments.get_segment(
+            agent, "secrets", get_secrets_key(agent), lambda: get_secrets_prompt(agent)
+        )
+        project_name = agent.context.get_data(projects.CONTEXT_DATA_KEY_PROJECT)
+        project_prompt = prompt_segments.get_segment(
+            agent, "project", project_name, lambda: get_project_prompt(agent)
+        )
 
         system_prompt.append(main)
         system_prompt.append(tools)
@@ -55,6 +72,17 @@ def get_mcp_tools_prompt(agent: Agent):
     return ""
 
 
+def get_secrets_key(agent: Agent):
+    # loaded secrets are reused by the manager until its files change, variables come from settings
+    try:
+        from python.helpers.secrets import get_secrets_manager
+
+        secrets_manager = get_secrets_manager(agent.context)
+        return (id(secrets_manager), secrets_manager.load_secrets(), get_settings_generation())
+    except Exception:
+        return None
+
+
 def get_secrets_prompt(agent: Agent):
     try:
         # Use lazy import to avoid circular dependencies
@@ -73,6 +101,17 @@ def get_project_prompt(agent: Agent):
     result = agent.read_prompt("agent.system.projects.main.md")
     project_name = agent.context.get_data(projects.CONTEXT_DATA_KEY_PROJECT)
     if project_name:
+        # project edits are picked up through the files read here, the instructions
+        # folder changes when files are added or removed, each file when it is edited
+        prompt_templates.record_dependency(
+            projects.get_project_meta_folder(project_name, projects.PROJECT_HEADER_FILE)
+        )
+        instructions = projects.get_project_meta_folder(
+            project_name, projects.PROJECT_INSTRUCTIONS_DIR
+        )
+        prompt_templates.record_dependency(instructions)
+        for file in files.list_files(instructions):
+            prompt_templates.record_dependency(os.path.join(instructions, file))
         project_vars = projects.build_system_prompt_vars(project_name)
         result += "\n\n" + agent.read_prompt(
             "agent.system.projects.active.md", **project_vars
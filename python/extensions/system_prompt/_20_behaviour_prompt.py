@@ -1,13 +1,17 @@
 from datetime import datetime
 from python.helpers.extension import Extension
 from agent import Agent, LoopData
-from python.helpers import files, memory
+from python.helpers import files, memory, prompt_segments, prompt_templates
 
 
 class BehaviourPrompt(Extension):
 
     async def execute(self, system_prompt: list[str]=[], loop_data: LoopData = LoopData(), **kwargs):
-        prompt = read_rules(self.agent)
+        # rebuilt when the rules file changes or the behaviour tool updates it
+        rules_file = get_custom_rules_file(self.agent)
+        prompt = prompt_segments.get_segment(
+            self.agent, "behaviour", rules_file, lambda: read_rules(self.agent)
+        )
         system_prompt.insert(0, prompt) #.append(prompt)
 
 def get_custom_rules_file(agent: Agent):
@@ -15,6 +19,7 @@ def get_custom_rules_file(agent: Agent):
 
 def read_rules(agent: Agent):
     rules_file = get_custom_rules_file(agent)
+    prompt_templates.record_dependency(rules_file)
     if files.exists(rules_file):
         rules = files.read_file(rules_file) # no includes and vars here, that could crash
         return agent.read_prompt("agent.system.behaviour.md", rules=rules)
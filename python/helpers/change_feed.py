@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+# revisions are numbers of one sequence, bumped on every change visible to the web UI
+_revision = 0
+# last change of the context and task lists or notifications, seen by every client
+_list_revision = 0
+# last change per context (log, progress, pause state), seen by clients showing it
+_context_revisions: dict[str, int] = {}
+_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event, str]] = set()
+_lock = threading.Lock()
+
+
+def get_revision() -> int:
+    return _revision
+
+
+def get_list_revision() -> int:
+    return _list_revision
+
+
+def get_context_revision(ctxid: str) -> int:
+    return _context_revisions.get(ctxid, 0)
+
+
+def mark_dirty(ctxid: str = "", listed: bool = False) -> int:
+    """Record a change of a context, or of the lists and notifications when no context
+    is given, listed also when the change shows in the context list (name, project...).
+    Wakes up the pollers the change is relevant to."""
+    global _revision, _list_revision
+    with _lock:
+        _revision += 1
+        if ctxid:
+            _context_revisions[ctxid] = _revision
+        if listed or not ctxid:
+            _list_revision = _revision
+        waiters = [
+            waiter
+            for waiter in _waiters
+            if listed or not ctxid or waiter[2] == ctxid
+        ]
+        _waiters.difference_update(waiters)
+        revision = _revision
+    for loop, event, _ in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # request loop already closed
+    return revision
+
+
+def forget_context(ctxid: str):
+    with _lock:
+        _context_revisions.pop(ctxid, None)
+    mark_dirty()
+
+
+async def wait_for_change(since: int, timeout: float, ctxid: str = "") -> int:
+    """Wait until the lists or the given context change after revision `since` or the
+    timeout expires, return the current revision."""
+    with _lock:
+        if (
+            since > _revision  # revision of a previous server run
+            or _list_revision > since
+            or _context_revisions.get(ctxid, 0) > since
+        ):
+            return _revision
+        waiter = (asyncio.get_running_loop(), asyncio.Event(), ctxid)
+        _waiters.add(waiter)
+    try:
+        await asyncio.wait_for(waiter[1].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        with _lock:
+            _waiters.discard(waiter)
+    return _revision
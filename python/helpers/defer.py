@@ -1,8 +1,11 @@
 import asyncio
 from dataclasses import dataclass
 import threading
+import time
+import weakref
 from concurrent.futures import Future
 from typing import Any, Callable, Optional, Coroutine, TypeVar, Awaitable
+from python.helpers import executors
 
 T = TypeVar("T")
 
@@ -25,6 +28,7 @@ class EventLoopThread:
     def _start(self):
         if not hasattr(self, "loop") or not self.loop:
             self.loop = asyncio.new_event_loop()
+            executors.monitor_loop(self.loop, self.thread_name)
         if not hasattr(self, "thread") or not self.thread:
             self.thread = threading.Thread(
                 target=self._run_event_loop, daemon=True, name=self.thread_name
@@ -38,8 +42,11 @@ class EventLoopThread:
         self.loop.run_forever()
 
     def terminate(self):
-        if self.loop and self.loop.is_running():
-            self.loop.stop()
+        loop = self.loop
+        if loop and loop.is_running():
+            # the lag probe ends before the loop stops, the loop is not run again
+            future = asyncio.run_coroutine_threadsafe(executors.stop_monitoring(), loop)
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(loop.stop))
         self.loop = None
         self.thread = None
 
@@ -50,6 +57,59 @@ class EventLoopThread:
         return asyncio.run_coroutine_threadsafe(coro, self.loop)
 
 
+class ThreadSafeEvent:
+    """Wakes coroutines waiting for a condition, set from any thread.
+    Keeps one asyncio.Event per waiting event loop, sets it threadsafe."""
+
+    def __init__(self) -> None:
+        self._events: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Event] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def set(self):
+        with self._lock:
+            events = list(self._events.items())
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, event in events:
+            if loop is current:
+                event.set()
+                continue
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop closed meanwhile
+
+    async def wait_for(self, predicate: Callable[[], bool], timeout: float | None = None) -> bool:
+        """Wait until predicate() is true, checked again on every set(). False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            event = self._get_event()
+            # set() after the check above would be missed without checking again
+            if predicate():
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+        return True
+
+    def _get_event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            event = self._events.get(loop)
+            if event is None:
+                event = self._events[loop] = asyncio.Event()
+        event.clear()
+        return event
+
+
 @dataclass
 class ChildTask:
     task: "DeferredTask"
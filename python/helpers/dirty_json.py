@@ -1,4 +1,6 @@
 import json
+import re
+from typing import Any
 
 def try_parse(json_string: str):
     try:
@@ -15,16 +17,33 @@ def stringify(obj, **kwargs):
     return json.dumps(obj, ensure_ascii=False, **kwargs)
 
 
+_START = re.compile(r'[{\["]')
+_STRING_END = {q: re.compile(r"[%s\\]" % re.escape(q)) for q in ['"', "'", "`"]}
+_UNQUOTED_END = re.compile(r"[:,}\]]")
+_UNQUOTED_KEY = re.compile(r"[^\s:,}\]]*")
+_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
 class DirtyJson:
+    """Lenient JSON parser. Besides parse() for whole documents it can parse a stream:
+    feed() advances the same parser state with each chunk, so streaming a document costs
+    one pass over it. Containers and strings still being parsed are visible in `result`
+    with their content so far, `changed` holds the top-level keys touched by the last feed."""
+
     def __init__(self):
         self._reset()
 
     def _reset(self):
-        self.json_string = ""
+        self.json_string = ""  # unconsumed input while streaming
         self.index = 0
         self.current_char = None
         self.result = None
-        self.stack = []
+        self.closed = False  # no more input will come
+        self.changed: set = set()
+        self._parser = None
+        self._scanned = 0
+        self._slots: list[tuple[Any, Any]] = []  # where values being parsed are stored
+        self._root_key = None  # top-level key whose value is being parsed
 
     @staticmethod
     def parse_string(json_string):
@@ -33,31 +52,61 @@ class DirtyJson:
 
     def parse(self, json_string):
         self._reset()
-        self.json_string = json_string
 
         # Add bounds checking to prevent IndexError
         if not json_string:
             # Return None for empty strings
             return None
 
-        self.index = self.get_start_pos(self.json_string)
-
-        # Ensure index is within bounds
-        if self.index >= len(self.json_string):
-            # If start position is beyond string length, return None
-            return None
-
-        self.current_char = self.json_string[self.index]
-        self._parse()
+        self.json_string = json_string
+        self.closed = True
+        self._resume()
         return self.result
 
     def feed(self, chunk):
-        self.json_string += chunk
-        if not self.current_char and self.json_string:
-            self.current_char = self.json_string[0]
-        self._parse()
+        """Parse the next chunk of a streamed document, returns the result so far."""
+        self.changed = set()
+        if self._root_key is not None:
+            self.changed.add(self._root_key)
+        if self._parser is not False and chunk:
+            # drop consumed input, the parser never looks back
+            consumed = min(self.index, len(self.json_string))
+            self.json_string = self.json_string[consumed:] + chunk
+            self._scanned -= consumed
+            self.index -= consumed
+            self._resume()
         return self.result
 
+    def close(self):
+        """End the stream, values cut off at the end are completed as parse() would."""
+        self.closed = True
+        self._resume()
+        return self.result
+
+    def _resume(self):
+        if self._parser is False:
+            return  # document complete, the rest is ignored
+        if self._parser is None:
+            self._parser = self._parse_document()
+        self._refresh()
+        try:
+            next(self._parser)  # runs until more input is needed
+        except StopIteration:
+            self._parser = False
+        except Exception:
+            self._parser = False
+            raise
+
+    def _has(self, n):
+        # n chars from the current one are available, or the input is complete
+        return self.closed or self.index + n <= len(self.json_string)
+
+    def _refresh(self):
+        if self.index < len(self.json_string):
+            self.current_char = self.json_string[self.index]
+        else:
+            self.current_char = None
+
     def _advance(self, count=1):
         self.index += count
         if self.index < len(self.json_string):
@@ -65,79 +114,108 @@ class DirtyJson:
         else:
             self.current_char = None
 
+    def _move(self, index):
+        self.index = index
+        self._refresh()
+
+    def _publish(self, value):
+        # make a value visible in the result before it is complete
+        if self._slots:
+            container, key = self._slots[-1]
+            container[key] = value
+        else:
+            self.result = value
+
+    def _parse_document(self):
+        # skip any text before the document, wait for it while streaming
+        while True:
+            match = _START.search(self.json_string, self._scanned)
+            if match or self.closed:
+                break
+            self._scanned = len(self.json_string)
+            yield
+        self._move(match.start() if match else 0)
+
+        # Ensure index is within bounds
+        if self.current_char is None:
+            return
+        self.result = yield from self._parse_value()
+
     def _skip_whitespace(self):
-        while self.current_char is not None:
+        while True:
+            while not self._has(2):
+                yield
+            if self.current_char is None:
+                break
             if self.current_char.isspace():
                 self._advance()
             elif (
                 self.current_char == "/" and self._peek(1) == "/"
             ):  # Single-line comment
-                self._skip_single_line_comment()
+                yield from self._skip_single_line_comment()
             elif (
                 self.current_char == "/" and self._peek(1) == "*"
             ):  # Multi-line comment
-                self._skip_multi_line_comment()
+                yield from self._skip_multi_line_comment()
             else:
                 break
 
     def _skip_single_line_comment(self):
-        while self.current_char is not None and self.current_char != "\n":
-            self._advance()
-        if self.current_char == "\n":
-            self._advance()
+        while True:
+            end = self.json_string.find("\n", self.index)
+            if end != -1:
+                self._move(end + 1)
+                return
+            self._move(len(self.json_string))
+            if self.closed:
+                return
+            yield
 
     def _skip_multi_line_comment(self):
         self._advance(2)  # Skip /*
-        while self.current_char is not None:
-            if self.current_char == "*" and self._peek(1) == "/":
-                self._advance(2)  # Skip */
-                break
-            self._advance()
-
-    def _parse(self):
-        if self.result is None:
-            self.result = self._parse_value()
-        else:
-            self._continue_parsing()
-
-    def _continue_parsing(self):
-        while self.current_char is not None:
-            if isinstance(self.result, dict):
-                self._parse_object_content()
-            elif isinstance(self.result, list):
-                self._parse_array_content()
-            elif isinstance(self.result, str):
-                self.result = self._parse_string()
-            else:
-                break
+        while True:
+            end = self.json_string.find("*/", self.index)
+            if end != -1:
+                self._move(end + 2)  # Skip */
+                return
+            if self.closed:
+                self._move(len(self.json_string))
+                return
+            # keep a possible "*" at the end for the next chunk
+            self._move(max(self.index, len(self.json_string) - 1))
+            yield
 
     def _parse_value(self):
-        self._skip_whitespace()
+        yield from self._skip_whitespace()
         if self.current_char == "{":
             if self._peek(1) == "{":  # Handle {{
                 self._advance(2)
-            return self._parse_object()
+            return (yield from self._parse_object())
         elif self.current_char == "[":
-            return self._parse_array()
+            return (yield from self._parse_array())
         elif self.current_char in ['"', "'", "`"]:
+            while not self._has(3):
+                yield
             if self._peek(2) == self.current_char * 2:  # type: ignore
-                return self._parse_multiline_string()
-            return self._parse_string()
+                return (yield from self._parse_multiline_string())
+            return (yield from self._parse_string())
         elif self.current_char and (
             self.current_char.isdigit() or self.current_char in ["-", "+"]
         ):
-            return self._parse_number()
-        elif self._match("true"):
+            return (yield from self._parse_number())
+        elif (yield from self._match("true")):
             return True
-        elif self._match("false"):
+        elif (yield from self._match("false")):
             return False
-        elif self._match("null") or self._match("undefined"):
+        elif (yield from self._match("null")) or (yield from self._match("undefined")):
             return None
         elif self.current_char:
-            return self._parse_unquoted_string()
+            return (yield from self._parse_unquoted_string())
         return None
 
-    def _match(self, text: str) -> bool:
+    def _match(self, text: str):
+        while not self._has(len(text)):
+            yield
         # first char should match current char
         if not self.current_char or self.current_char.lower() != text[0].lower():
             return False
@@ -152,182 +230,217 @@ class DirtyJson:
     def _parse_object(self):
         obj = {}
         self._advance()  # Skip opening brace
-        self.stack.append(obj)
-        self._parse_object_content()
+        self._publish(obj)
+        yield from self._parse_object_content(obj)
         return obj
 
-    def _parse_object_content(self):
-        while self.current_char is not None:
-            self._skip_whitespace()
+    def _parse_object_content(self, obj: dict):
+        root = obj is self.result
+        while True:
+            while not self._has(1):
+                yield
+            if self.current_char is None:
+                return
+            yield from self._skip_whitespace()
             if self.current_char == "}":
                 if self._peek(1) == "}":  # Handle }}
                     self._advance(2)
                 else:
                     self._advance()
-                self.stack.pop()
                 return
             if self.current_char is None:
-                self.stack.pop()
                 return  # End of input reached while parsing object
 
-            key = self._parse_key()
+            key = yield from self._parse_key()
             value = None
-            self._skip_whitespace()
+            yield from self._skip_whitespace()
+
+            obj[key] = None
+            self._slots.append((obj, key))
+            if root:
+                self._root_key = key
+                self.changed.add(key)
 
             if self.current_char == ":":
                 self._advance()
-                value = self._parse_value()
+                value = yield from self._parse_value()
             elif self.current_char is None:
                 value = None  # End of input reached after key
             else:
-                value = self._parse_value()
+                value = yield from self._parse_value()
 
-            self.stack[-1][key] = value
+            self._slots.pop()
+            obj[key] = value
+            if root:
+                self._root_key = None
 
-            self._skip_whitespace()
+            yield from self._skip_whitespace()
             if self.current_char == ",":
                 self._advance()
                 continue
             elif self.current_char != "}":
                 if self.current_char is None:
-                    self.stack.pop()
                     return  # End of input reached after value
                 continue
 
     def _parse_key(self):
-        self._skip_whitespace()
+        yield from self._skip_whitespace()
         if self.current_char in ['"', "'"]:
-            return self._parse_string()
+            return (yield from self._parse_string(publish=False))
         else:
-            return self._parse_unquoted_key()
+            return (yield from self._parse_unquoted_key())
 
     def _parse_unquoted_key(self):
-        result = ""
-        while (
-            self.current_char is not None
-            and not self.current_char.isspace()
-            and self.current_char not in [":", ",", "}", "]"]
-        ):
-            result += self.current_char
-            self._advance()
-        return result
+        parts = []
+        while True:
+            end = _UNQUOTED_KEY.match(self.json_string, self.index).end()
+            parts.append(self.json_string[self.index : end])
+            self._move(end)
+            if self.current_char is not None or self.closed:
+                return "".join(parts)
+            yield
 
     def _parse_array(self):
         arr = []
         self._advance()  # Skip opening bracket
-        self.stack.append(arr)
-        self._parse_array_content()
+        self._publish(arr)
+        yield from self._parse_array_content(arr)
         return arr
 
-    def _parse_array_content(self):
-        while self.current_char is not None:
-            self._skip_whitespace()
+    def _parse_array_content(self, arr: list):
+        while True:
+            while not self._has(1):
+                yield
+            if self.current_char is None:
+                return
+            yield from self._skip_whitespace()
             if self.current_char == "]":
                 self._advance()
-                self.stack.pop()
                 return
-            value = self._parse_value()
-            self.stack[-1].append(value)
-            self._skip_whitespace()
+            arr.append(None)
+            self._slots.append((arr, len(arr) - 1))
+            value = yield from self._parse_value()
+            self._slots.pop()
+            arr[-1] = value
+            yield from self._skip_whitespace()
             if self.current_char == ",":
                 self._advance()
                 # handle trailing commas, end of array
-                self._skip_whitespace()
+                yield from self._skip_whitespace()
                 if self.current_char is None or self.current_char == "]":
                     if self.current_char == "]":
                         self._advance()
-                    self.stack.pop()
                     return
             elif self.current_char != "]":
-                self.stack.pop()
                 return
 
-    def _parse_string(self):
-        result = ""
+    def _parse_string(self, publish=True):
+        parts = []
         quote_char = self.current_char
+        end_pattern = _STRING_END[quote_char]  # type: ignore
         self._advance()  # Skip opening quote
-        while self.current_char is not None and self.current_char != quote_char:
-            if self.current_char == "\\":
-                self._advance()
-                if self.current_char in ['"', "'", "\\", "/", "b", "f", "n", "r", "t"]:
-                    result += {
-                        "b": "\b",
-                        "f": "\f",
-                        "n": "\n",
-                        "r": "\r",
-                        "t": "\t",
-                    }.get(self.current_char, self.current_char)
-                elif self.current_char == "u":
-                    self._advance()  # Skip 'u'
-                    unicode_char = ""
-                    # Try to collect exactly 4 hex digits
-                    for _ in range(4):
-                        if self.current_char is None or not self.current_char.isalnum():
-                            # If we can't get 4 hex digits, treat it as a literal '\u' followed by whatever we got
-                            return result + "\\u" + unicode_char
-                        unicode_char += self.current_char
-                        self._advance()
-                    try:
-                        result += chr(int(unicode_char, 16))
-                    except ValueError:
-                        # If invalid hex value, treat as literal
-                        result += "\\u" + unicode_char
-                    continue
-            else:
-                result += self.current_char
+        while True:
+            # copy everything up to the next quote or backslash at once
+            match = end_pattern.search(self.json_string, self.index)
+            end = match.start() if match else len(self.json_string)
+            if end > self.index:
+                parts.append(self.json_string[self.index : end])
+                self._move(end)
+            if self.current_char is None:
+                if self.closed:
+                    break
+                if publish:
+                    parts = ["".join(parts)]
+                    self._publish(parts[0])
+                yield
+                continue
+            if self.current_char == quote_char:
+                self._advance()  # Skip closing quote
+                break
+
+            while not self._has(2):
+                yield
+            self._advance()
+            if self.current_char in ['"', "'", "\\", "/", "b", "f", "n", "r", "t"]:
+                parts.append(_ESCAPES.get(self.current_char, self.current_char))  # type: ignore
+            elif self.current_char == "u":
+                while not self._has(5):
+                    yield
+                self._advance()  # Skip 'u'
+                unicode_char = ""
+                # Try to collect exactly 4 hex digits
+                for _ in range(4):
+                    if self.current_char is None or not self.current_char.isalnum():
+                        # If we can't get 4 hex digits, treat it as a literal '\u' followed by whatever we got
+                        return "".join(parts) + "\\u" + unicode_char
+                    unicode_char += self.current_char
+                    self._advance()
+                try:
+                    parts.append(chr(int(unicode_char, 16)))
+                except ValueError:
+                    # If invalid hex value, treat as literal
+                    parts.append("\\u" + unicode_char)
+                continue
             self._advance()
-        if self.current_char == quote_char:
-            self._advance()  # Skip closing quote
-        return result
+        return "".join(parts)
 
     def _parse_multiline_string(self):
-        result = ""
+        parts = []
         quote_char = self.current_char
         self._advance(3)  # Skip first quote
-        while self.current_char is not None:
-            if self.current_char == quote_char and self._peek(2) == quote_char * 2:  # type: ignore
-                self._advance(3)  # Skip first quote
+        while True:
+            end = self.json_string.find(quote_char * 3, self.index)  # type: ignore
+            if end != -1:
+                parts.append(self.json_string[self.index : end])
+                self._move(end + 3)  # Skip closing quotes
                 break
-            result += self.current_char
-            self._advance()
-        return result.strip()
+            if self.closed:
+                parts.append(self.json_string[self.index :])
+                self._move(len(self.json_string))
+                break
+            # keep possible closing quotes at the end for the next chunk
+            end = max(self.index, len(self.json_string) - 2)
+            parts.append(self.json_string[self.index : end])
+            self._move(end)
+            parts = ["".join(parts)]
+            self._publish(parts[0].strip())
+            yield
+        return "".join(parts).strip()
 
     def _parse_number(self):
         number_str = ""
-        while self.current_char is not None and (
-            self.current_char.isdigit()
-            or self.current_char in ["-", "+", ".", "e", "E"]
-        ):
-            number_str += self.current_char
-            self._advance()
+        while True:
+            while self.current_char is not None and (
+                self.current_char.isdigit()
+                or self.current_char in ["-", "+", ".", "e", "E"]
+            ):
+                number_str += self.current_char
+                self._advance()
+            if self.current_char is not None or self.closed:
+                break
+            yield
         try:
             return int(number_str)
         except ValueError:
             return float(number_str)
 
     def _parse_unquoted_string(self):
-        result = ""
-        while self.current_char is not None and self.current_char not in [
-            ":",
-            ",",
-            "}",
-            "]",
-        ]:
-            result += self.current_char
-            self._advance()
+        parts = []
+        while True:
+            match = _UNQUOTED_END.search(self.json_string, self.index)
+            end = match.start() if match else len(self.json_string)
+            parts.append(self.json_string[self.index : end])
+            self._move(end)
+            if self.current_char is not None or self.closed:
+                break
+            parts = ["".join(parts)]
+            self._publish(parts[0].strip())
+            yield
         self._advance()
-        return result.strip()
+        return "".join(parts).strip()
 
     def _peek(self, n):
-        peek_index = self.index + 1
-        result = ""
-        for _ in range(n):
-            if peek_index < len(self.json_string):
-                result += self.json_string[peek_index]
-                peek_index += 1
-            else:
-                break
-        return result
+        return self.json_string[self.index + 1 : self.index + 1 + n]
 
     def get_start_pos(self, input_str: str) -> int:
         chars = ["{", "[", '"']
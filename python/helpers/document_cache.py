@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from python.helpers import files
+
+CACHE_FILE = "tmp/document_query/cache.db"
+MAX_BYTES = 512 * 1024 * 1024  # least recently used documents are evicted above this size
+HASH_BLOCK = 1024 * 1024
+
+
+@dataclass
+class CachedDocument:
+    text: str
+    chunks: list[str] | None = None  # chunk texts, present together with vectors
+    vectors: np.ndarray | None = None
+    model: str = ""  # embedding model of the vectors
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    entries: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class DocumentCache:
+    """Extracted text, chunks and chunk vectors of documents in a single SQLite file.
+
+    Entries are content addressed: the key combines the normalized URI with a content
+    validator (file hash, ETag...), so a changed document is a new entry and old ones
+    age out. The total size is kept below max_bytes by evicting least recently used entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " key TEXT PRIMARY KEY, uri TEXT NOT NULL, text TEXT NOT NULL,"
+            " chunks TEXT, vectors BLOB, dim INTEGER, model TEXT,"
+            " size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS documents_accessed ON documents (accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> CachedDocument | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, chunks, vectors, dim, model FROM documents WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE documents SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+
+        text, chunks, vectors, dim, model = row
+        doc = CachedDocument(text=text, model=model or "")
+        if chunks is not None and vectors is not None:
+            doc.chunks = json.loads(chunks)
+            doc.vectors = np.frombuffer(vectors, dtype=np.float32).reshape(-1, dim)
+        return doc
+
+    def put(
+        self,
+        key: str,
+        uri: str,
+        text: str,
+        chunks: list[str] | None = None,
+        vectors: list[list[float]] | np.ndarray | None = None,
+        model: str = "",
+    ):
+        chunks_json = json.dumps(chunks) if chunks is not None else None
+        vectors_blob, dim = None, None
+        if chunks is not None and vectors is not None:
+            array = np.asarray(vectors, dtype=np.float32)
+            vectors_blob, dim = array.tobytes(), array.shape[1] if array.ndim == 2 else 0
+        size = len(text.encode("utf-8")) + len(chunks_json or "") + len(vectors_blob or b"")
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents"
+                " (key, uri, text, chunks, vectors, dim, model, size, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, uri, text, chunks_json, vectors_blob, dim, model, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+        return CacheStats(self.hits, self.misses, entries, size)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM documents"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evict = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM documents ORDER BY accessed"
+        ):
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM documents WHERE key = ?", evict)
+
+
+def make_key(uri: str, validator: str) -> str:
+    return hashlib.sha256(f"{uri}\0{validator}".encode("utf-8")).hexdigest()
+
+
+def file_validator(path: str) -> str:
+    """Content hash of a local file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            digest.update(block)
+    return "sha256:" + digest.hexdigest()
+
+
+def http_validator(headers) -> str | None:
+    """Validator from response headers, None when the server gives none."""
+    etag = headers.get("etag")
+    if etag:
+        return "etag:" + etag
+    modified = headers.get("last-modified")
+    if modified:
+        return f"modified:{modified}:{headers.get('content-length', '')}"
+    return None
+
+
+_cache: DocumentCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DocumentCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DocumentCache(files.get_abs_path(CACHE_FILE))
+        return _cache
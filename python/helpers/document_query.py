@@ -15,15 +15,14 @@ from datetime import datetime
 
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_community.document_loaders.text import TextLoader
-from langchain_community.document_loaders.pdf import PyMuPDFLoader
 from langchain_community.document_transformers import MarkdownifyTransformer
-from langchain_community.document_loaders.parsers.images import TesseractBlobParser
 
 from langchain_core.documents import Document
 from langchain.schema import SystemMessage, HumanMessage
 
 from python.helpers.print_style import PrintStyle
-from python.helpers import files, errors
+from python.helpers import files, errors, document_cache, pdf_extract, dirty_json, executors
+from python.helpers.document_cache import CachedDocument
 from agent import Agent
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -62,6 +61,7 @@ class DocumentQueryStore:
         """Initialize a DocumentQueryStore instance."""
         self.agent = agent
         self.vector_db: VectorDB | None = None
+        self.document_ids: dict[str, list[str]] = {}  # chunk ids by normalized URI
 
     @staticmethod
     def normalize_uri(uri: str) -> str:
@@ -98,7 +98,12 @@ class DocumentQueryStore:
         return VectorDB(self.agent, cache=True)
 
     async def add_document(
-        self, text: str, document_uri: str, metadata: dict | None = None
+        self,
+        text: str,
+        document_uri: str,
+        metadata: dict | None = None,
+        cached: CachedDocument | None = None,
+        cache_key: str | None = None,
     ) -> tuple[bool, list[str]]:
         """
         Add a document to the store with the given URI.
@@ -107,6 +112,8 @@ class DocumentQueryStore:
             text: The document text content
             document_uri: The URI that uniquely identifies this document
             metadata: Optional metadata for the document
+            cached: Cached chunks and vectors of the text, reused when embedded by the same model
+            cache_key: Document cache key to store new chunks and vectors under
 
         Returns:
             True if successful, False otherwise
@@ -122,11 +129,24 @@ class DocumentQueryStore:
         doc_metadata["document_uri"] = document_uri
         doc_metadata["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.DEFAULT_CHUNK_SIZE, chunk_overlap=self.DEFAULT_CHUNK_OVERLAP
-        )
-        chunks = text_splitter.split_text(text)
+        # Initialize vector db if not already initialized
+        if not self.vector_db:
+            self.vector_db = self.init_vector_db()
+
+        # Split text into chunks, or reuse cached chunks and vectors
+        vectors = None
+        if (
+            cached
+            and cached.chunks is not None
+            and cached.vectors is not None
+            and cached.model == self.vector_db.model_id
+        ):
+            chunks, vectors = cached.chunks, cached.vectors
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.DEFAULT_CHUNK_SIZE, chunk_overlap=self.DEFAULT_CHUNK_OVERLAP
+            )
+            chunks = await executors.run_in_thread(text_splitter.split_text, text)
 
         # Create documents
         docs = []
@@ -141,11 +161,15 @@ class DocumentQueryStore:
             return False, []
 
         try:
-            # Initialize vector db if not already initialized
-            if not self.vector_db:
-                self.vector_db = self.init_vector_db()
+            if vectors is None:
+                vectors = await self.vector_db.embed_documents(chunks)
+                if cache_key:
+                    document_cache.get_cache().put(
+                        cache_key, document_uri, text, chunks, vectors, self.vector_db.model_id
+                    )
 
-            ids = await self.vector_db.insert_documents(docs)
+            ids = await self.vector_db.insert_documents(docs, vectors)
+            self.document_ids[document_uri] = ids
             PrintStyle.standard(
                 f"Added document '{document_uri}' with {len(docs)} chunks"
             )
@@ -264,6 +288,7 @@ class DocumentQueryStore:
 
         # Collect IDs to delete
         ids_to_delete = [chunk.metadata["id"] for chunk in chunks]
+        self.document_ids.pop(document_uri, None)
 
         # Delete from vector store
         if ids_to_delete:
@@ -310,6 +335,45 @@ class DocumentQueryStore:
             PrintStyle.error(f"Error searching documents: {str(e)}")
             return []
 
+    async def search_documents_multi(
+        self,
+        queries: list[str],
+        document_uris: list[str],
+        limit: int = 10,
+        threshold: float = 0.5,
+    ) -> List[List[Document]]:
+        """
+        Search several queries at once within the given documents.
+
+        Args:
+            queries: The search query strings
+            document_uris: URIs of the documents to search within
+            limit: Maximum number of results to return per query
+            threshold: Minimum similarity score threshold (0-1)
+
+        Returns:
+            List of matching document chunks for each query
+        """
+        ids = [
+            id
+            for uri in document_uris
+            for id in self.document_ids.get(self.normalize_uri(uri), [])
+        ]
+        if not self.vector_db or not ids or not queries:
+            return [[] for _ in queries]
+
+        try:
+            results = await self.vector_db.search_by_similarity_threshold_multi(
+                queries=queries, limit=limit, threshold=threshold, ids=ids
+            )
+            PrintStyle.standard(
+                f"Search of {len(queries)} queries returned {sum(len(r) for r in results)} results"
+            )
+            return results
+        except Exception as e:
+            PrintStyle.error(f"Error searching documents: {str(e)}")
+            return [[] for _ in queries]
+
     async def search_document(
         self, document_uri: str, query: str, limit: int = 10, threshold: float = 0.5
     ) -> List[Document]:
@@ -358,6 +422,7 @@ class DocumentQueryHelper:
     ):
         self.agent = agent
         self.store = DocumentQueryStore.get(agent)
+        self.cache = document_cache.get_cache()
         self.progress_callback = progress_callback or (lambda x: None)
 
     async def document_qa(
@@ -368,45 +433,29 @@ class DocumentQueryHelper:
         )
         await self.agent.handle_intervention()
 
-        # index documents
-        await asyncio.gather(
-            *[self.document_get_content(uri, True) for uri in document_uris]
-        )
-        await self.agent.handle_intervention()
-        selected_chunks = {}
-        for question in questions:
-            self.progress_callback(f"Optimizing query: {question}")
-            await self.agent.handle_intervention()
-            human_content = f'Search Query: "{question}"'
-            system_content = self.agent.parse_prompt(
-                "fw.document_query.optmimize_query.md"
-            )
-
-            optimized_query = (
-                await self.agent.call_utility_model(
-                    system=system_content, message=human_content
-                )
-            ).strip()
-
-            await self.agent.handle_intervention()
-            self.progress_callback(f"Searching documents with query: {optimized_query}")
-
-            normalized_uris = [self.store.normalize_uri(uri) for uri in document_uris]
-            doc_filter = " or ".join(
-                [f"document_uri == '{uri}'" for uri in normalized_uris]
-            )
-
-            chunks = await self.store.search_documents(
-                query=optimized_query,
-                limit=100,
-                threshold=DEFAULT_SEARCH_THRESHOLD,
-                filter=doc_filter,
+        # queries are optimized while the documents are indexed
+        queries_task = asyncio.create_task(self.optimize_queries(questions))
+        try:
+            await asyncio.gather(
+                *[self.document_get_content(uri, True) for uri in document_uris]
             )
+            queries = await queries_task
+        finally:
+            queries_task.cancel()
+        await self.agent.handle_intervention()
 
-            self.progress_callback(f"Found {len(chunks)} chunks")
-
+        # one search over all documents, the best chunks per question across them
+        results = await self.store.search_documents_multi(
+            queries=queries,
+            document_uris=document_uris,
+            limit=100,
+            threshold=DEFAULT_SEARCH_THRESHOLD,
+        )
+        selected_chunks = {}
+        for chunks in results:
             for chunk in chunks:
                 selected_chunks[chunk.metadata["id"]] = chunk
+        self.progress_callback(f"Found {len(selected_chunks)} chunks")
 
         if not selected_chunks:
             self.progress_callback("No relevant content found in the documents")
@@ -439,6 +488,27 @@ class DocumentQueryHelper:
 
         return True, str(ai_response)
 
+    async def optimize_queries(self, questions: Sequence[str]) -> List[str]:
+        """Search queries for all questions from one utility model call.
+        Questions are used as they are when the response does not fit."""
+        self.progress_callback(f"Optimizing {len(questions)} queries")
+        await self.agent.handle_intervention()
+        response = await self.agent.call_utility_model(
+            system=self.agent.parse_prompt("fw.document_query.optimize_queries.md"),
+            message=json.dumps(list(questions), ensure_ascii=False),
+        )
+        queries = dirty_json.try_parse(response.strip())
+        if (
+            not isinstance(queries, list)
+            or len(queries) != len(questions)
+            or not all(isinstance(query, str) and query.strip() for query in queries)
+        ):
+            PrintStyle.warning(f"Unexpected optimized queries, using questions: {response}")
+            return list(questions)
+        queries = [query.strip() for query in queries]
+        self.progress_callback(f"Searching documents with queries: {json.dumps(queries)}")
+        return queries
+
     async def document_get_content(
         self, document_uri: str, add_to_db: bool = False
     ) -> str:
@@ -448,6 +518,7 @@ class DocumentQueryHelper:
         scheme = url.scheme or "file"
         mimetype, encoding = mimetypes.guess_type(document_uri)
         mimetype = mimetype or "application/octet-stream"
+        headers = None
 
         if mimetype == "application/octet-stream":
             if url.scheme in ["http", "https"]:
@@ -476,6 +547,7 @@ class DocumentQueryHelper:
                         f"DocumentQueryHelper::document_get_content: Document fetch error: {document_uri} ({last_error})"
                     )
 
+                headers = response.headers
                 mimetype = response.headers["content-type"]
                 if "content-length" in response.headers:
                     content_length = (
@@ -512,23 +584,42 @@ class DocumentQueryHelper:
         document_content = ""
         if not exists:
             await self.agent.handle_intervention()
-            if mimetype.startswith("image/"):
-                document_content = self.handle_image_document(document_uri, scheme)
+            cache_key = await self._get_cache_key(
+                document_uri, document_uri_norm, scheme, headers
+            )
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cache_key:
+                PrintStyle.standard(
+                    f"Document cache {'hit' if cached else 'miss'}: {document_uri_norm} "
+                    f"(hit rate {self.cache.stats().hit_rate:.0%})"
+                )
+            if cached:
+                self.progress_callback(f"Using cached document content")
+                document_content = cached.text
+            elif mimetype.startswith("image/"):
+                document_content = await executors.run_in_thread(
+                    self.handle_image_document, document_uri, scheme
+                )
             elif mimetype == "text/html":
-                document_content = self.handle_html_document(document_uri, scheme)
+                document_content = await executors.run_in_thread(
+                    self.handle_html_document, document_uri, scheme
+                )
             elif mimetype.startswith("text/") or mimetype == "application/json":
-                document_content = self.handle_text_document(document_uri, scheme)
+                document_content = await executors.run_in_thread(
+                    self.handle_text_document, document_uri, scheme
+                )
             elif mimetype == "application/pdf":
-                document_content = self.handle_pdf_document(document_uri, scheme)
+                document_content = await self.handle_pdf_document(document_uri, scheme)
             else:
-                document_content = self.handle_unstructured_document(
-                    document_uri, scheme
+                # parsers and OCR run in the worker thread pool, not on the agent loop
+                document_content = await executors.run_in_thread(
+                    self.handle_unstructured_document, document_uri, scheme
                 )
             if add_to_db:
                 self.progress_callback(f"Indexing document")
                 await self.agent.handle_intervention()
                 success, ids = await self.store.add_document(
-                    document_content, document_uri_norm
+                    document_content, document_uri_norm, cached=cached, cache_key=cache_key
                 )
                 if not success:
                     self.progress_callback(f"Failed to index document")
@@ -536,6 +627,8 @@ class DocumentQueryHelper:
                         f"DocumentQueryHelper::document_get_content: Failed to index document: {document_uri_norm}"
                     )
                 self.progress_callback(f"Indexed {len(ids)} chunks")
+            elif cache_key and not cached:
+                self.cache.put(cache_key, document_uri_norm, document_content)
         else:
             await self.agent.handle_intervention()
             doc = await self.store.get_document(document_uri_norm)
@@ -547,6 +640,31 @@ class DocumentQueryHelper:
                 )
         return document_content
 
+    async def _get_cache_key(
+        self, document: str, document_uri_norm: str, scheme: str, headers=None
+    ) -> str | None:
+        """Document cache key from the URI and the current content, None when not cacheable."""
+        try:
+            if scheme == "file":
+                validator = await executors.run_in_thread(document_cache.file_validator, document)
+            elif scheme in ["http", "https"]:
+                if headers is None:
+                    async with aiohttp.ClientSession() as session:
+                        async with session.head(
+                            document,
+                            timeout=aiohttp.ClientTimeout(total=2.0),
+                            allow_redirects=True,
+                        ) as response:
+                            if response.status < 400:
+                                headers = response.headers
+                validator = document_cache.http_validator(headers) if headers else None
+            else:
+                validator = None
+        except Exception as e:
+            PrintStyle.warning(f"Document cache skipped for {document_uri_norm}: {e}")
+            return None
+        return document_cache.make_key(document_uri_norm, validator) if validator else None
+
     def handle_image_document(self, document: str, scheme: str) -> str:
         return self.handle_unstructured_document(document, scheme)
 
@@ -587,21 +705,33 @@ class DocumentQueryHelper:
 
         return "\n".join([element.page_content for element in elements])
 
-    def handle_pdf_document(self, document: str, scheme: str) -> str:
-        temp_file_path = ""
+    async def handle_pdf_document(self, document: str, scheme: str) -> str:
+        temp_file_path = await executors.run_in_thread(self._get_pdf_file, document, scheme)
+
+        if not os.path.exists(temp_file_path):
+            raise ValueError(
+                f"DocumentQueryHelper::handle_pdf_document: Temporary file not found: {temp_file_path}"
+            )
+
+        try:
+            # pages are extracted and OCRed in worker processes, not on the agent loop
+            return await pdf_extract.extract_pdf(temp_file_path, self.progress_callback)
+        finally:
+            os.unlink(temp_file_path)
+
+    def _get_pdf_file(self, document: str, scheme: str) -> str:
+        import tempfile
+
         if scheme == "file":
             # Use RFC file operations to read the PDF file as binary
             file_content_bytes = files.read_file_bin(document)
-            # Create a temporary file for PyMuPDFLoader since it needs a file path
-            import tempfile
-
+            # Create a temporary file for the extraction workers since they need a file path
             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
                 temp_file.write(file_content_bytes)
-                temp_file_path = temp_file.name
+                return temp_file.name
         elif scheme in ["http", "https"]:
             # download the file from the web url to a temporary file using python libraries for downloading
             import requests
-            import tempfile
 
             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
                 response = requests.get(document, timeout=10.0)
@@ -610,51 +740,10 @@ class DocumentQueryHelper:
                         f"DocumentQueryHelper::handle_pdf_document: Failed to download PDF from {document}: {response.status_code}"
                     )
                 temp_file.write(response.content)
-                temp_file_path = temp_file.name
+                return temp_file.name
         else:
             raise ValueError(f"Unsupported scheme: {scheme}")
 
-        if not os.path.exists(temp_file_path):
-            raise ValueError(
-                f"DocumentQueryHelper::handle_pdf_document: Temporary file not found: {temp_file_path}"
-            )
-
-        try:
-            try:
-                loader = PyMuPDFLoader(
-                    temp_file_path,
-                    mode="single",
-                    extract_tables="markdown",
-                    extract_images=True,
-                    images_inner_format="text",
-                    images_parser=TesseractBlobParser(),
-                    pages_delimiter="\n",
-                )
-                elements: list[Document] = loader.load()
-                contents = "\n".join([element.page_content for element in elements])
-            except Exception as e:
-                PrintStyle.error(
-                    f"DocumentQueryHelper::handle_pdf_document: Error loading with PyMuPDF: {e}"
-                )
-                contents = ""
-
-            if not contents:
-                import pdf2image
-                import pytesseract
-
-                PrintStyle.debug(
-                    f"DocumentQueryHelper::handle_pdf_document: FALLBACK Converting PDF to images: {temp_file_path}"
-                )
-
-                # Convert PDF to images
-                pages = pdf2image.convert_from_path(temp_file_path)  # type: ignore
-                for page in pages:
-                    contents += pytesseract.image_to_string(page) + "\n\n"
-
-            return contents
-        finally:
-            os.unlink(temp_file_path)
-
     def handle_unstructured_document(self, document: str, scheme: str) -> str:
         elements: list[Document] = []
         if scheme in ["http", "https"]:
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
+
+BATCH_SIZE = 64  # texts per request to the embedding model
+BATCH_WINDOW = 0.005  # seconds to wait for more requests before dispatching a batch
+MAX_CONCURRENCY = 4  # batches in flight per model
+
+SQLITE_MAX_PARAMS = 500
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class SQLiteByteStore(ByteStore):
+    """Byte store kept in a single SQLite file instead of one file per key.
+
+    Keys missing here are looked up in the optional fallback store (the old
+    per-file cache) and copied over, so existing caches migrate lazily.
+    """
+
+    def __init__(self, path: str, fallback: ByteStore | None = None):
+        self.path = path
+        self.fallback = fallback
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+        found: dict[str, bytes] = {}
+        with self._lock:
+            for chunk in _chunks(list(keys), SQLITE_MAX_PARAMS):
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({marks})", chunk
+                )
+                found.update(rows)
+
+        if self.fallback:
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            if missing:
+                migrated = [
+                    (k, v)
+                    for k, v in zip(missing, self.fallback.mget(missing))
+                    if v is not None
+                ]
+                if migrated:
+                    self.mset(migrated)
+                    found.update(migrated)
+
+        return [found.get(k) for k in keys]
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, bytes]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                key_value_pairs,
+            )
+            self._conn.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for chunk in _chunks(list(keys), SQLITE_MAX_PARAMS):
+                marks = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM kv WHERE key IN ({marks})", chunk)
+            self._conn.commit()
+
+    def yield_keys(self, *, prefix: str | None = None) -> Iterator[str]:
+        with self._lock:
+            if prefix:
+                rows = self._conn.execute(
+                    "SELECT key FROM kv WHERE substr(key, 1, ?) = ?",
+                    (len(prefix), prefix),
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT key FROM kv").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.future: Future[list[list[float]]] = Future()
+
+
+class EmbeddingService(Embeddings):
+    """Shares one embeddings model between all callers.
+
+    Requests arriving at about the same time (recall, memorization, document
+    queries, knowledge import) are merged into batches of up to `batch_size`
+    texts, identical texts are embedded once, and at most `max_concurrency`
+    batches run at a time. Every batch goes through the model's own
+    embed_documents, so its rate limiter applies per request sent.
+    """
+
+    def __init__(
+        self,
+        model: Embeddings,
+        batch_size: int = BATCH_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        batch_window: float = BATCH_WINDOW,
+    ):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_window = batch_window
+        self.model_name = getattr(model, "model_name", "default")
+        self.a0_model_conf = getattr(model, "a0_model_conf", None)
+
+        self.requests_sent = 0
+        self.texts_sent = 0
+
+        self._pending: list[_Request] = []
+        self._pending_texts = 0
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="embedding"
+        )
+        self._dispatcher: threading.Thread | None = None
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._collect([r.future.result() for r in self._submit(texts)])
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._submit([text])[0].future.result()[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        requests = self._submit(texts)
+        results = await asyncio.gather(*[asyncio.wrap_future(r.future) for r in requests])
+        return self._collect(results)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        result = await asyncio.wrap_future(self._submit([text])[0].future)
+        return result[0]
+
+    def _collect(self, results: list[list[list[float]]]) -> list[list[float]]:
+        return [vector for result in results for vector in result]
+
+    def _submit(self, texts: list[str]) -> list[_Request]:
+        requests = [_Request(chunk) for chunk in _chunks(list(texts), self.batch_size)]
+        with self._cond:
+            self._pending.extend(requests)
+            self._pending_texts += len(texts)
+            if not self._dispatcher or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="embedding-dispatch", daemon=True
+                )
+                self._dispatcher.start()
+            self._cond.notify()
+        return requests
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # give concurrent callers a moment to join the batch
+                deadline = time.monotonic() + self.batch_window
+                while self._pending_texts < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            # while all slots are busy, new requests keep piling up into bigger batches
+            self._slots.acquire()
+            with self._cond:
+                batch = self._take_batch()
+            self._executor.submit(self._run_batch, batch)
+
+    def _take_batch(self) -> list[_Request]:
+        batch: list[_Request] = []
+        size = 0
+        while self._pending:
+            request = self._pending[0]
+            if batch and size + len(request.texts) > self.batch_size:
+                break
+            batch.append(self._pending.pop(0))
+            size += len(request.texts)
+        self._pending_texts -= size
+        return batch
+
+    def _run_batch(self, batch: list[_Request]):
+        try:
+            unique = list(dict.fromkeys(t for r in batch for t in r.texts))
+            self.requests_sent += 1
+            self.texts_sent += len(unique)
+            vectors = dict(zip(unique, self.model.embed_documents(unique)))
+            for request in batch:
+                request.future.set_result([vectors[t] for t in request.texts])
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+
+_services: dict[str, EmbeddingService] = {}
+_stores: dict[str, SQLiteByteStore] = {}
+_services_lock = threading.Lock()
+
+
+def get_service(
+    key: str,
+    factory: Callable[[], Embeddings],
+    max_concurrency: int = MAX_CONCURRENCY,
+) -> EmbeddingService:
+    """Shared service for the model identified by key, created on first use."""
+    with _services_lock:
+        service = _services.get(key)
+        if not service:
+            service = _services[key] = EmbeddingService(
+                factory(), max_concurrency=max_concurrency
+            )
+        return service
+
+
+def get_store(path: str, fallback: ByteStore | None = None) -> SQLiteByteStore:
+    """Shared store for the cache file at path, one connection per file."""
+    path = os.path.abspath(path)
+    with _services_lock:
+        store = _stores.get(path)
+        if not store:
+            store = _stores[path] = SQLiteByteStore(path, fallback=fallback)
+        return store
+
+
+def _chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -0,0 +1,210 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from python.helpers.print_style import PrintStyle
+
+T = TypeVar("T")
+
+# worker pools shared by all agent event loops, sizes are configurable in settings (0 = auto)
+# threads run work that releases the GIL (FAISS, tiktoken, file and sqlite IO),
+# processes run pure python parsing and OCR
+THREAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+PROCESS_WORKERS = min(4, os.cpu_count() or 1)
+
+LAG_INTERVAL = 0.25  # seconds between lag probes of a monitored loop
+LAG_WARN = 0.5  # lag a loop is reported as blocked from
+LAG_WARN_EVERY = 10  # seconds between warnings of one loop
+
+
+@dataclass
+class LoopLag:
+    """Event loop responsiveness, how late the probes of a loop woke up."""
+
+    name: str
+    samples: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+    blocked: int = 0  # probes later than LAG_WARN
+    warned: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.samples if self.samples else 0.0
+
+    def add(self, lag: float):
+        self.samples += 1
+        self.total += lag
+        self.last = lag
+        self.max = max(self.max, lag)
+        if lag >= LAG_WARN:
+            self.blocked += 1
+
+
+class _SharedThreadPool(ThreadPoolExecutor):
+    """Default executor of the monitored loops, a loop closed by asyncio.run
+    shuts its default executor down, the shared pool is only closed by configure()."""
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        pass
+
+    def close(self):
+        super().shutdown(wait=False)
+
+
+_threads = 0
+_processes = 0
+_thread_pool: _SharedThreadPool | None = None
+_process_pool: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+_serial_pools: dict[str, ThreadPoolExecutor] = {}
+_loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LoopLag]" = (
+    weakref.WeakKeyDictionary()
+)
+_probes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def configure(threads: int = 0, processes: int = 0):
+    """Set pool sizes, 0 for the default. Running pools are replaced, queued work still finishes."""
+    global _threads, _processes, _thread_pool, _process_pool
+    old_threads = old_processes = None
+    with _lock:
+        if threads != _threads:
+            _threads, old_threads, _thread_pool = threads, _thread_pool, None
+        if processes != _processes:
+            _processes, old_processes, _process_pool = processes, _process_pool, None
+        loops = list(_loops)
+    if old_threads:
+        # monitored loops use the thread pool as default executor
+        for loop in loops:
+            _set_default_executor(loop)
+        old_threads.close()
+    if old_processes:
+        old_processes.shutdown(wait=False)
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = _SharedThreadPool(
+                max_workers=_threads or THREAD_WORKERS, thread_name_prefix="Worker"
+            )
+        return _thread_pool
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # spawned workers, forking a process running event loop threads is unsafe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_processes or PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def get_serial_pool(name: str) -> ThreadPoolExecutor:
+    """Single thread pool of a name, work submitted to it runs in submission order."""
+    with _lock:
+        pool = _serial_pools.get(name)
+        if pool is None:
+            pool = _serial_pools[name] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=name
+            )
+        return pool
+
+
+def get_process_workers() -> int:
+    return _processes or PROCESS_WORKERS
+
+
+async def run_in_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking call in the shared thread pool, the event loop stays responsive."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_thread_pool(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_in_process(func: Callable[..., T], *args: Any) -> T:
+    """Run a CPU bound call in the shared process pool. func and args must be picklable."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def monitor_loop(loop: asyncio.AbstractEventLoop, name: str) -> LoopLag:
+    """Measure the lag of an event loop and make the thread pool its default executor,
+    so asyncio.to_thread and run_in_executor(None) calls share the managed pool."""
+    with _lock:
+        lag = _loops.get(loop)
+        if lag:
+            return lag
+        lag = _loops[loop] = LoopLag(name)
+    _set_default_executor(loop)
+    loop.call_soon_threadsafe(_start_probe, loop, lag)
+    return lag
+
+
+async def stop_monitoring():
+    """Stop the lag probe of the running loop. Call before the loop is stopped for good,
+    a probe still pending when the loop is dropped is reported as a destroyed task."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        task = _probes.pop(loop, None)
+    if task and not task.done():
+        task.cancel()
+        await asyncio.wait([task])
+
+
+def get_loop_lags() -> list[LoopLag]:
+    with _lock:
+        return list(_loops.values())
+
+
+def _set_default_executor(loop: asyncio.AbstractEventLoop):
+    pool = get_thread_pool()
+    try:
+        loop.call_soon_threadsafe(loop.set_default_executor, pool)
+    except RuntimeError:
+        pass  # loop closed
+
+
+def _start_probe(loop: asyncio.AbstractEventLoop, lag: LoopLag):
+    with _lock:
+        if _loops.get(loop) is lag:
+            _probes[loop] = loop.create_task(_probe(loop, lag))
+
+
+async def _probe(loop: asyncio.AbstractEventLoop, lag: LoopLag):
+    try:
+        await _measure(lag)
+    finally:
+        with _lock:
+            if _loops.get(loop) is lag:
+                del _loops[loop]
+
+
+async def _measure(lag: LoopLag):
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(LAG_INTERVAL)
+        late = max(0.0, time.monotonic() - start - LAG_INTERVAL)
+        lag.add(late)
+        if late >= LAG_WARN and time.monotonic() - lag.warned >= LAG_WARN_EVERY:
+            lag.warned = time.monotonic()
+            PrintStyle.warning(
+                f"Event loop '{lag.name}' was blocked for {late:.2f}s "
+                f"({lag.blocked} times, max {lag.max:.2f}s)"
+            )
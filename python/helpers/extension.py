@@ -1,10 +1,16 @@
 from abc import abstractmethod
+from dataclasses import dataclass
+import os
+import time
 from typing import Any
 from python.helpers import extract_tools, files 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from agent import Agent
 
+# how often (seconds) extension folders are checked for changes when watching is enabled
+WATCH_INTERVAL = 2.0
+
 class Extension:
 
     def __init__(self, agent: "Agent|None", **kwargs):
@@ -16,15 +22,105 @@ class Extension:
         pass
 
 
+@dataclass
+class ExtensionTiming:
+    extension_point: str
+    name: str
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+@dataclass
+class _Chain:
+    classes: list[type[Extension]]
+    signature: tuple
+    checked: float
+
+
 async def call_extensions(extension_point: str, agent: "Agent|None" = None, **kwargs) -> Any:
 
+    profile = agent.config.profile if agent else ""
+
+    # call extensions
+    for cls in get_extension_chain(extension_point, profile):
+        start = time.perf_counter()
+        try:
+            await cls(agent=agent).execute(**kwargs)
+        finally:
+            _record_timing(extension_point, cls, time.perf_counter() - start)
+
+
+def get_extension_chain(extension_point: str, profile: str = "") -> list[type[Extension]]:
+    """Ordered extension classes for the extension point, profile extensions overriding defaults by file name.
+    Resolved once per (profile, extension point), reloaded on file changes when watching is enabled."""
+    key = (profile, extension_point)
+    chain = _chains.get(key)
+    if chain and (time.monotonic() - chain.checked < WATCH_INTERVAL or not _watch_enabled()):
+        return chain.classes
+
+    folders = _get_folders(extension_point, profile)
+    signature = _get_signature(folders)
+    if chain and chain.signature == signature:
+        chain.checked = time.monotonic()
+        return chain.classes
+
+    if chain:
+        for folder in folders:
+            _cache.pop(folder, None) # files changed, import them again
+    chain = _Chain(_resolve_chain(folders), signature, time.monotonic())
+    _chains[key] = chain
+    return chain.classes
+
+
+def clear_cache():
+    _cache.clear()
+    _chains.clear()
+
+
+def get_timings() -> list[ExtensionTiming]:
+    """Per-extension call counters, slowest total first."""
+    return sorted(_timings.values(), key=lambda t: t.total, reverse=True)
+
+
+def reset_timings():
+    _timings.clear()
+
+
+def set_watch(enabled: bool | None):
+    """Enable or disable reloading on file changes, None means only in development."""
+    global _watch
+    _watch = enabled
+
+
+def _get_file_from_module(module_name: str) -> str:
+    return module_name.split(".")[-1]
+
+_cache: dict[str, list[type[Extension]]] = {}
+_chains: dict[tuple[str, str], _Chain] = {}
+_timings: dict[tuple[str, str], ExtensionTiming] = {}
+_watch: bool | None = None
+
+
+def _get_folders(extension_point: str, profile: str) -> list[str]:
+    folders = [files.get_abs_path("python/extensions/" + extension_point)]
+    if profile:
+        folders.append(files.get_abs_path("agents/" + profile + "/extensions/" + extension_point))
+    return folders
+
+
+def _resolve_chain(folders: list[str]) -> list[type[Extension]]:
     # get default extensions
-    defaults = await _get_extensions("python/extensions/" + extension_point)
+    defaults = _get_extensions(folders[0])
     classes = defaults
 
     # get agent extensions
-    if agent and agent.config.profile:
-        agentics = await _get_extensions("agents/" + agent.config.profile + "/extensions/" + extension_point)
+    if len(folders) > 1:
+        agentics = _get_extensions(folders[1])
         if agentics:
             # merge them, agentics overwrite defaults
             unique = {}
@@ -33,19 +129,10 @@ async def call_extensions(extension_point: str, agent: "Agent|None" = None, **kw
 
             # sort by name
             classes = sorted(unique.values(), key=lambda cls: _get_file_from_module(cls.__module__))
-
-    # call extensions
-    for cls in classes:
-        await cls(agent=agent).execute(**kwargs)
+    return classes
 
 
-def _get_file_from_module(module_name: str) -> str:
-    return module_name.split(".")[-1]
-
-_cache: dict[str, list[type[Extension]]] = {}
-async def _get_extensions(folder:str):
-    global _cache
-    folder = files.get_abs_path(folder)
+def _get_extensions(folder: str) -> list[type[Extension]]:
     if folder in _cache:
         classes = _cache[folder]
     else:
@@ -58,3 +145,35 @@ async def _get_extensions(folder:str):
 
     return classes
 
+
+def _get_signature(folders: list[str]) -> tuple:
+    if not _watch_enabled():
+        return ()
+    signature = []
+    for folder in folders:
+        try:
+            with os.scandir(folder) as entries:
+                signature.append(tuple(sorted(
+                    (e.name, e.stat().st_mtime_ns) for e in entries if e.name.endswith(".py")
+                )))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _watch_enabled() -> bool:
+    if _watch is None:
+        from python.helpers import runtime
+        return runtime.is_development()
+    return _watch
+
+
+def _record_timing(extension_point: str, cls: type[Extension], elapsed: float):
+    name = _get_file_from_module(cls.__module__)
+    timing = _timings.get((extension_point, name))
+    if not timing:
+        timing = _timings[(extension_point, name)] = ExtensionTiming(extension_point, name)
+    timing.calls += 1
+    timing.total += elapsed
+    if elapsed > timing.max:
+        timing.max = elapsed
@@ -18,6 +18,11 @@ import mimetypes
 
 
 class VariablesPlugin(ABC):
+    # set to True when the variables only depend on the arguments and on files read through
+    # read_prompt_file or registered with prompt_templates.record_dependency,
+    # plugins of prompts read while building them must register their own sources too
+    cache_variables: bool = False
+
     @abstractmethod
     def get_variables(self, file: str, backup_dirs: list[str] | None = None, **kwargs) -> dict[str, Any]:  # type: ignore
         pass
@@ -39,16 +44,15 @@ def load_plugin_variables(
         plugin_file = find_file_in_dirs(plugin_filename, directories)
     except FileNotFoundError:
         plugin_file = None
+    _record_prompt_lookup(plugin_filename, directories, plugin_file)
 
     if plugin_file and exists(plugin_file):
 
-        from python.helpers import extract_tools
+        from python.helpers import prompt_templates
 
-        classes = extract_tools.load_classes_from_file(
-            plugin_file, VariablesPlugin, one_per_file=False
+        return prompt_templates.load_plugin_variables(
+            plugin_file, file, backup_dirs, **kwargs
         )
-        for cls in classes:
-            return cls().get_variables(file, backup_dirs, **kwargs)  # type: ignore < abstract class here is ok, it is always a subclass
 
         # load python code and extract variables variables from it
         # module = None
@@ -86,33 +90,29 @@ def parse_file(
     if _directories is None:
         _directories = []
 
+    from python.helpers import prompt_templates
+
     # Find the file in the directories
     absolute_path = find_file_in_dirs(_filename, _directories)
+    _record_prompt_lookup(_filename, _directories, absolute_path)
 
-    # Read the file content
-    with open(absolute_path, "r", encoding=_encoding) as f:
-        # content = remove_code_fences(f.read())
-        content = f.read()
+    # compiled once per file version, code fences removed
+    template = prompt_templates.get_template(absolute_path, parse=True, encoding=_encoding)
 
-    is_json = is_full_json_template(content)
-    content = remove_code_fences(content)
     variables = load_plugin_variables(absolute_path, _directories, **kwargs) or {}  # type: ignore
     variables.update(kwargs)
-    if is_json:
-        content = replace_placeholders_json(content, **variables)
+    if template.is_json:
+        content = prompt_templates.render(template, variables)
         obj = json.loads(content)
         # obj = replace_placeholders_dict(obj, **variables)
         return obj
     else:
-        content = replace_placeholders_text(content, **variables)
-        # Process include statements
-        content = process_includes(
-            # here we use kwargs, the plugin variables are not inherited
-            content,
-            _directories,
-            **kwargs,
+        # here we use kwargs for includes, the plugin variables are not inherited
+        return prompt_templates.render(
+            template,
+            variables,
+            include=lambda path: read_prompt_file(path, _directories, **kwargs),
         )
-        return content
 
 
 def read_prompt_file(
@@ -127,30 +127,26 @@ def read_prompt_file(
         _file = os.path.basename(_file)
         _directories = [folder_path] + _directories
 
+    from python.helpers import prompt_templates
+
     # Find the file in the directories
     absolute_path = find_file_in_dirs(_file, _directories)
+    _record_prompt_lookup(_file, _directories, absolute_path)
 
-    # Read the file content
-    with open(absolute_path, "r", encoding=_encoding) as f:
-        # content = remove_code_fences(f.read())
-        content = f.read()
+    # compiled once per file version
+    template = prompt_templates.get_template(absolute_path, encoding=_encoding)
 
     variables = load_plugin_variables(_file, _directories, **kwargs) or {}  # type: ignore
     variables.update(kwargs)
 
-    # Replace placeholders with values from kwargs
-    content = replace_placeholders_text(content, **variables)
-
-    # Process include statements
-    content = process_includes(
-        # here we use kwargs, the plugin variables are not inherited
-        content,
-        _directories,
-        **kwargs,
+    # Replace placeholders and process include statements in one pass,
+    # here we use kwargs for includes, the plugin variables are not inherited
+    return prompt_templates.render(
+        template,
+        variables,
+        include=lambda path: read_prompt_file(path, _directories, **kwargs),
     )
 
-    return content
-
 
 def read_file(relative_path: str, encoding="utf-8"):
     # Try to get the absolute path for the file from the original directory or backup directories
@@ -264,6 +260,20 @@ def find_file_in_dirs(_filename: str, _directories: list[str]):
     )
 
 
+def _record_prompt_lookup(filename: str, directories: list[str], found: str | None):
+    # folders searched before the one the file was found in are dependencies of cached
+    # prompts too, a file added to one of them (e.g. a profile override) takes precedence
+    from python.helpers import prompt_templates
+
+    if not prompt_templates.tracking():
+        return
+    for directory in directories:
+        full_path = get_abs_path(directory, filename)
+        if full_path == found:
+            break
+        prompt_templates.record_dependency(os.path.dirname(full_path))
+
+
 def get_unique_filenames_in_dirs(dir_paths: list[str], pattern: str = "*"):
     # returns absolute paths for unique filenames, priority by order in dir_paths
     seen = set()
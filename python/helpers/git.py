@@ -49,9 +49,15 @@ def get_git_info():
 
     return git_info
 
+_version: str | None = None
+
 def get_version():
-    try:
-        git_info = get_git_info()
-        return str(git_info.get("short_tag", "")).strip() or "unknown"
-    except Exception:
-        return "unknown"
\ No newline at end of file
+    # the running code does not change its version, read git only once per process
+    global _version
+    if _version is None:
+        try:
+            git_info = get_git_info()
+            _version = str(git_info.get("short_tag", "")).strip() or "unknown"
+        except Exception:
+            _version = "unknown"
+    return _version
\ No newline at end of file
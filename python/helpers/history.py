@@ -4,7 +4,7 @@ from collections import OrderedDict
 from collections.abc import Mapping
 import json
 import math
-from typing import Coroutine, Literal, TypedDict, cast, Union, Dict, List, Any
+from typing import Coroutine, Iterator, Literal, TypedDict, cast, Union, Dict, List, Any
 from python.helpers import messages, tokens, settings, call_llm
 from enum import Enum
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
@@ -40,6 +40,11 @@ class OutputMessage(TypedDict):
 
 
 class Record:
+    # enclosing record, notified when this one changes
+    _parent: "Record | None" = None
+    _tokens_cache: int | None = None
+    revision: int = 0
+
     def __init__(self):
         pass
 
@@ -47,6 +52,13 @@ class Record:
     def get_tokens(self) -> int:
         pass
 
+    def mark_changed(self):
+        """Bump the revision and drop cached totals of this record and its parents."""
+        self.revision += 1
+        self._tokens_cache = None
+        if self._parent:
+            self._parent.mark_changed()
+
     @abstractmethod
     async def compress(self) -> bool:
         pass
@@ -55,6 +67,10 @@ class Record:
     def output(self) -> list[OutputMessage]:
         pass
 
+    def output_reversed(self) -> Iterator[OutputMessage]:
+        """Output messages from the last one, earlier records are only rendered when reached."""
+        return reversed(self.output())
+
     @abstractmethod
     async def summarize(self) -> str:
         pass
@@ -80,7 +96,8 @@ class Message(Record):
         self.ai = ai
         self.content = content
         self.summary: str = ""
-        self.tokens: int = tokens or self.calculate_tokens()
+        # 0 until counted, by get_tokens or in a batch by the topic
+        self.tokens: int = tokens
 
     def get_tokens(self) -> int:
         if not self.tokens:
@@ -93,7 +110,8 @@ class Message(Record):
 
     def set_summary(self, summary: str):
         self.summary = summary
-        self.tokens = self.calculate_tokens()
+        self.tokens = 0
+        self.mark_changed()
 
     async def compress(self):
         return False
@@ -119,31 +137,50 @@ class Message(Record):
     @staticmethod
     def from_dict(data: dict, history: "History"):
         content = data.get("content", "Content lost")
-        msg = Message(ai=data["ai"], content=content)
+        msg = Message(ai=data["ai"], content=content, tokens=data.get("tokens", 0))
         msg.summary = data.get("summary", "")
-        msg.tokens = data.get("tokens", 0)
         return msg
 
 
 class Topic(Record):
     def __init__(self, history: "History"):
         self.history = history
-        self.summary: str = ""
+        self._summary: str = ""
         self.messages: list[Message] = []
 
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value
+        self.mark_changed()
+
     def get_tokens(self):
-        if self.summary:
-            return tokens.approximate_tokens(self.summary)
-        else:
-            return sum(msg.get_tokens() for msg in self.messages)
+        if self._tokens_cache is None:
+            if self.summary:
+                self._tokens_cache = tokens.approximate_tokens(self.summary)
+            else:
+                _count_missing_tokens(self.messages)
+                self._tokens_cache = sum(msg.get_tokens() for msg in self.messages)
+        return self._tokens_cache
 
     def add_message(
         self, ai: bool, content: MessageContent, tokens: int = 0
     ) -> Message:
         msg = Message(ai=ai, content=content, tokens=tokens)
+        msg._parent = self
         self.messages.append(msg)
+        self.mark_changed()
         return msg
 
+    def set_messages(self, messages: list[Message]):
+        for msg in messages:
+            msg._parent = self
+        self.messages = messages
+        self.mark_changed()
+
     def output(self) -> list[OutputMessage]:
         if self.summary:
             return [OutputMessage(ai=False, content=self.summary)]
@@ -151,6 +188,13 @@ class Topic(Record):
             msgs = [m for r in self.messages for m in r.output()]
             return msgs
 
+    def output_reversed(self) -> Iterator[OutputMessage]:
+        if self.summary:
+            yield OutputMessage(ai=False, content=self.summary)
+        else:
+            for msg in reversed(self.messages):
+                yield from msg.output_reversed()
+
     async def summarize(self):
         self.summary = await self.summarize_messages(self.messages)
         return self.summary
@@ -210,7 +254,9 @@ class Topic(Record):
                 "fw.msg_summary.md", summary=summary
             )
             sum_msg = Message(False, sum_msg_content)
-            self.messages[1 : cnt_to_sum + 1] = [sum_msg]
+            self.set_messages(
+                self.messages[:1] + [sum_msg] + self.messages[cnt_to_sum + 1 :]
+            )
             return True
         return False
 
@@ -236,23 +282,40 @@ class Topic(Record):
     def from_dict(data: dict, history: "History"):
         topic = Topic(history=history)
         topic.summary = data.get("summary", "")
-        topic.messages = [
-            Message.from_dict(m, history=history) for m in data.get("messages", [])
-        ]
+        topic.set_messages(
+            [Message.from_dict(m, history=history) for m in data.get("messages", [])]
+        )
         return topic
 
 
 class Bulk(Record):
     def __init__(self, history: "History"):
         self.history = history
-        self.summary: str = ""
+        self._summary: str = ""
         self.records: list[Record] = []
 
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value
+        self.mark_changed()
+
     def get_tokens(self):
-        if self.summary:
-            return tokens.approximate_tokens(self.summary)
-        else:
-            return sum([r.get_tokens() for r in self.records])
+        if self._tokens_cache is None:
+            if self.summary:
+                self._tokens_cache = tokens.approximate_tokens(self.summary)
+            else:
+                self._tokens_cache = sum([r.get_tokens() for r in self.records])
+        return self._tokens_cache
+
+    def set_records(self, records: list[Record]):
+        for record in records:
+            record._parent = self
+        self.records = records
+        self.mark_changed()
 
     def output(
         self, human_label: str = "user", ai_label: str = "ai"
@@ -263,6 +326,13 @@ class Bulk(Record):
             msgs = [m for r in self.records for m in r.output()]
             return msgs
 
+    def output_reversed(self) -> Iterator[OutputMessage]:
+        if self.summary:
+            yield OutputMessage(ai=False, content=self.summary)
+        else:
+            for record in reversed(self.records):
+                yield from record.output_reversed()
+
     async def compress(self):
         return False
 
@@ -287,7 +357,9 @@ class Bulk(Record):
         bulk = Bulk(history=history)
         bulk.summary = data["summary"]
         cls = data["_cls"]
-        bulk.records = [Record.from_dict(r, history=history) for r in data["records"]]
+        bulk.set_records(
+            [Record.from_dict(r, history=history) for r in data["records"]]
+        )
         return bulk
 
 
@@ -340,6 +412,27 @@ class History(Record):
         result += self.current.output()
         return result
 
+    def output_reversed(self) -> Iterator[OutputMessage]:
+        yield from self.current.output_reversed()
+        for topic in reversed(self.topics):
+            yield from topic.output_reversed()
+        for bulk in reversed(self.bulks):
+            yield from bulk.output_reversed()
+
+    def output_text_tail(self, length: int, human_label="user", ai_label="ai") -> str:
+        """Same as output_text()[-length:], only the messages needed for the tail are rendered."""
+        if length <= 0:
+            return self.output_text(human_label, ai_label)[-length:]
+        parts: list[str] = []
+        size = -1  # no separator before the first message
+        for output in self.output_reversed():
+            part = _stringify_output(output, ai_label, human_label)
+            parts.append(part)
+            size += len(part) + 1
+            if size >= length:
+                break
+        return "\n".join(reversed(parts))[-length:]
+
     @staticmethod
     def from_dict(data: dict, history: "History"):
         history.counter = data.get("counter", 0)
@@ -405,7 +498,7 @@ class History(Record):
         # move oldest topic to bulks and summarize
         for topic in self.topics:
             bulk = Bulk(history=self)
-            bulk.records.append(topic)
+            bulk.set_records([topic])
             if topic.summary:
                 bulk.summary = topic.summary
             else:
@@ -440,7 +533,7 @@ class History(Record):
 
     async def merge_bulks(self, bulks: list[Bulk]) -> Bulk:
         bulk = Bulk(history=self)
-        bulk.records = cast(list[Record], bulks)
+        bulk.set_records(cast(list[Record], bulks))
         await bulk.summarize()
         return bulk
 
@@ -453,6 +546,15 @@ def deserialize_history(json_data: str, agent) -> History:
     return history
 
 
+def _count_missing_tokens(msgs: list[Message]):
+    # messages loaded without a stored count are tokenized in one batch
+    missing = [m for m in msgs if not m.tokens]
+    if len(missing) > 1:
+        counts = tokens.approximate_tokens_batch([m.output_text() for m in missing])
+        for msg, count in zip(missing, counts):
+            msg.tokens = count
+
+
 def _get_ctx_size_for_history() -> int:
     set = settings.get_settings()
     return int(set["chat_model_ctx_length"] * set["chat_model_ctx_history"])
@@ -1,7 +1,11 @@
 import glob
 import os
 import hashlib
-from typing import Any, Dict, Literal, TypedDict
+import multiprocessing
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Literal, NotRequired, TypedDict
 from langchain_community.document_loaders import (
     CSVLoader,
     PyPDFLoader,
@@ -13,6 +17,28 @@ from python.helpers.print_style import PrintStyle
 
 text_loader_kwargs = {"autodetect_encoding": True}
 
+# Mapping file extensions to corresponding loader classes
+# Note: Using TextLoader for JSON and MD to avoid parsing issues with consolidation
+file_types_loaders = {
+    "txt": TextLoader,
+    "pdf": PyPDFLoader,
+    "csv": CSVLoader,
+    "html": UnstructuredHTMLLoader,
+    "json": TextLoader,  # Use TextLoader for better consolidation compatibility
+    "md": TextLoader,    # Use TextLoader for better consolidation compatibility
+}
+
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+LOAD_WORKERS = min(8, len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1))
+# smaller imports are parsed in this process, starting worker processes costs seconds
+LOAD_PARALLEL_MIN_FILES = 2
+LOAD_PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+PROGRESS_EVERY = 25  # files
+
+_load_pool: ProcessPoolExecutor | None = None
+_load_pool_users = 0
+_load_pool_lock = threading.Lock()
+
 
 class KnowledgeImport(TypedDict):
     file: str
@@ -20,16 +46,62 @@ class KnowledgeImport(TypedDict):
     ids: list[str]
     state: Literal["changed", "original", "removed"]
     documents: list[Any]
+    mtime: NotRequired[float]
+    size: NotRequired[int]
 
 
 def calculate_checksum(file_path: str) -> str:
     hasher = hashlib.md5()
     with open(file_path, "rb") as f:
-        buf = f.read()
-        hasher.update(buf)
+        while chunk := f.read(CHECKSUM_CHUNK_SIZE):
+            hasher.update(chunk)
     return hasher.hexdigest()
 
 
+def load_file_documents(file_path: str, ext: str) -> list[Any]:
+    """Parse one knowledge file into documents, runs in the loader process pool."""
+    loader_cls = file_types_loaders[ext]
+    loader = loader_cls(
+        file_path,
+        **(
+            text_loader_kwargs
+            if ext in ["txt", "csv", "html", "md"]
+            else {}
+        ),
+    )
+    return loader.load_and_split()
+
+
+def _get_load_pool() -> ProcessPoolExecutor:
+    global _load_pool
+    with _load_pool_lock:
+        if _load_pool is None:
+            # spawn, forking a process with running threads and event loops is not safe
+            _load_pool = ProcessPoolExecutor(
+                max_workers=LOAD_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _load_pool
+
+
+@contextmanager
+def load_pool_session():
+    """Keep the loader processes while an import runs. Imports of other memories may run
+    at the same time, the processes are stopped when the last of them is done."""
+    global _load_pool, _load_pool_users
+    with _load_pool_lock:
+        _load_pool_users += 1
+    try:
+        yield
+    finally:
+        with _load_pool_lock:
+            _load_pool_users -= 1
+            pool = _load_pool if _load_pool_users == 0 else None
+            if pool is not None:
+                _load_pool = None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
 def load_knowledge(
     log_item: LogItem | None,
     knowledge_dir: str,
@@ -45,17 +117,6 @@ def load_knowledge(
     intelligent memory consolidation system.
     """
 
-    # Mapping file extensions to corresponding loader classes
-    # Note: Using TextLoader for JSON and MD to avoid parsing issues with consolidation
-    file_types_loaders = {
-        "txt": TextLoader,
-        "pdf": PyPDFLoader,
-        "csv": CSVLoader,
-        "html": UnstructuredHTMLLoader,
-        "json": TextLoader,  # Use TextLoader for better consolidation compatibility
-        "md": TextLoader,    # Use TextLoader for better consolidation compatibility
-    }
-
     cnt_files = 0
     cnt_docs = 0
 
@@ -114,6 +175,7 @@ def load_knowledge(
                 progress=f"\nFound {len(kn_files)} knowledge files in {knowledge_dir}, processing...",
             )
 
+    changed: list[tuple[str, str, KnowledgeImport]] = []
     for file_path in kn_files:
         try:
             # Get file extension safely
@@ -125,10 +187,6 @@ def load_knowledge(
             if ext not in file_types_loaders:
                 continue  # Skip unsupported file types
 
-            checksum = calculate_checksum(file_path)
-            if not checksum:
-                continue  # Skip files with checksum errors
-
             file_key = file_path
 
             # Load existing data from the index or create a new entry
@@ -140,51 +198,30 @@ def load_knowledge(
                 "documents": []
             })
 
+            # unchanged size and modification time, skip hashing
+            stat = os.stat(file_path)
+            if (
+                file_data.get("checksum")
+                and file_data.get("mtime") == stat.st_mtime
+                and file_data.get("size") == stat.st_size
+            ):
+                file_data["state"] = "original"
+                index[file_key] = file_data
+                continue
+
+            checksum = calculate_checksum(file_path)
+            if not checksum:
+                continue  # Skip files with checksum errors
+
             # Check if file has changed
             if file_data.get("checksum") == checksum:
                 file_data["state"] = "original"
             else:
                 file_data["state"] = "changed"
-
-            # Process changed files
-            if file_data["state"] == "changed":
                 file_data["checksum"] = checksum
-                loader_cls = file_types_loaders[ext]
-
-                try:
-                    loader = loader_cls(
-                        file_path,
-                        **(
-                            text_loader_kwargs
-                            if ext in ["txt", "csv", "html", "md"]
-                            else {}
-                        ),
-                    )
-                    documents = loader.load_and_split()
-
-                    # Enhanced metadata for better consolidation compatibility
-                    enhanced_metadata = {
-                        **metadata,
-                        "source_file": os.path.basename(file_path),
-                        "source_path": file_path,
-                        "file_type": ext,
-                        "knowledge_source": True,  # Flag to distinguish from conversation memories
-                        "import_timestamp": None,  # Will be set when inserted into memory
-                    }
-
-                    # Apply metadata to all documents
-                    for doc in documents:
-                        doc.metadata = {**doc.metadata, **enhanced_metadata}
-
-                    file_data["documents"] = documents
-                    cnt_files += 1
-                    cnt_docs += len(documents)
-
-                except Exception as e:
-                    PrintStyle(font_color="red").print(f"Error loading {file_path}: {e}")
-                    if log_item:
-                        log_item.stream(progress=f"\nError loading {os.path.basename(file_path)}: {e}")
-                    continue
+                changed.append((file_path, ext, file_data))
+            file_data["mtime"] = stat.st_mtime
+            file_data["size"] = stat.st_size
 
             # Update the index
             index[file_key] = file_data
@@ -193,6 +230,61 @@ def load_knowledge(
             PrintStyle(font_color="red").print(f"Error processing {file_path}: {e}")
             continue
 
+    # Parse changed files, in worker processes when there are enough of them
+    with load_pool_session():
+        pool: Executor | None = None
+        changed_bytes = sum(data.get("size", 0) for _, _, data in changed)
+        if (
+            LOAD_WORKERS > 1
+            and len(changed) >= LOAD_PARALLEL_MIN_FILES
+            and changed_bytes >= LOAD_PARALLEL_MIN_BYTES
+        ):
+            try:
+                pool = _get_load_pool()
+            except Exception as e:
+                PrintStyle(font_color="yellow").print(f"Loading knowledge serially: {e}")
+        futures = (
+            [pool.submit(load_file_documents, path, ext) for path, ext, _ in changed]
+            if pool
+            else None
+        )
+
+        for i, (file_path, ext, file_data) in enumerate(changed):
+            try:
+                documents = (
+                    futures[i].result() if futures else load_file_documents(file_path, ext)
+                )
+
+                # Enhanced metadata for better consolidation compatibility
+                enhanced_metadata = {
+                    **metadata,
+                    "source_file": os.path.basename(file_path),
+                    "source_path": file_path,
+                    "file_type": ext,
+                    "knowledge_source": True,  # Flag to distinguish from conversation memories
+                    "import_timestamp": None,  # Will be set when inserted into memory
+                }
+
+                # Apply metadata to all documents
+                for doc in documents:
+                    doc.metadata = {**doc.metadata, **enhanced_metadata}
+
+                file_data["documents"] = documents
+                cnt_files += 1
+                cnt_docs += len(documents)
+
+            except Exception as e:
+                PrintStyle(font_color="red").print(f"Error loading {file_path}: {e}")
+                if log_item:
+                    log_item.stream(progress=f"\nError loading {os.path.basename(file_path)}: {e}")
+                # not loaded, keep the previous version and retry next time
+                file_data["state"] = "original"
+                file_data["checksum"] = ""
+                continue
+
+            if log_item and (i + 1) % PROGRESS_EVERY == 0:
+                log_item.stream(progress=f"\nLoaded {i + 1}/{len(changed)} changed files")
+
     # Mark removed files
     current_files = set(kn_files)
     for file_key, file_data in list(index.items()):
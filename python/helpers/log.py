@@ -9,6 +9,7 @@ from python.helpers.strings import truncate_text_by_ratio
 import copy
 from typing import TypeVar
 from python.helpers.secrets import get_secrets_manager
+from python.helpers import change_feed
 
 
 if TYPE_CHECKING:
@@ -157,6 +158,24 @@ class LogItem:
                 **kwargs,
             )
 
+    def update_kvps(
+        self,
+        kvps: dict,
+        heading: str | None = None,
+        content: str | None = None,
+        masked: bool = False,
+    ):
+        """Update only the given kvps, others are kept as they are (streamed fields).
+        With masked, content and kvps are known to have secrets masked already."""
+        if self.guid == self.log.guid:
+            self.log._update_item(
+                self.no,
+                heading=heading,
+                content=content,
+                kvps_update=kvps,
+                masked=masked,
+            )
+
     def stream(
         self,
         heading: str | None = None,
@@ -189,7 +208,9 @@ class Log:
     def __init__(self):
         self.context: "AgentContext|None" = None # set from outside
         self.guid: str = str(uuid.uuid4())
-        self.updates: list[int] = []
+        self.version: int = 0  # number of item updates so far
+        # item no -> version of its last update, least recently updated first
+        self._updated: OrderedDict[int, int] = OrderedDict()
         self.logs: list[LogItem] = []
         self.set_initial_progress()
 
@@ -237,6 +258,8 @@ class Log:
         temp: bool | None = None,
         update_progress: ProgressUpdate | None = None,
         id: Optional[str] = None,
+        kvps_update: dict | None = None,
+        masked: bool = False,
         **kwargs,
     ):
         item = self.logs[no]
@@ -260,7 +283,8 @@ class Log:
             heading = _truncate_heading(heading)
             item.heading = heading
         if content is not None:
-            content = self._mask_recursive(content)
+            if not masked:
+                content = self._mask_recursive(content)
             content = _truncate_content(content, item.type)
             item.content = content
         if kvps is not None:
@@ -270,13 +294,26 @@ class Log:
             item.kvps = kvps
         elif item.kvps is None:
             item.kvps = OrderedDict()
+        if kvps_update:
+            kvps_update = copy.deepcopy(kvps_update)
+            if not masked:
+                kvps_update = self._mask_recursive(kvps_update)
+            kvps_update = _truncate_value(kvps_update)
+            item.kvps.update(kvps_update)  # type: ignore
         if kwargs:
             kwargs = copy.deepcopy(kwargs)
-            kwargs = self._mask_recursive(kwargs)
+            if not masked:
+                kwargs = self._mask_recursive(kwargs)
             item.kvps.update(kwargs)
 
-        self.updates += [item.no]
         self._update_progress_from_item(item)
+        self.mark_updated(item.no)
+
+    def mark_updated(self, no: int):
+        self.version += 1
+        self._updated[no] = self.version
+        self._updated.move_to_end(no)
+        change_feed.mark_dirty(self.context.id if self.context else "")
 
     def set_progress(self, progress: str, no: int = 0, active: bool = True):
         progress = self._mask_recursive(progress)
@@ -286,28 +323,29 @@ class Log:
             no = len(self.logs)
         self.progress_no = no
         self.progress_active = active
+        change_feed.mark_dirty(self.context.id if self.context else "")
 
     def set_initial_progress(self):
         self.set_progress("Waiting for input", 0, False)
 
-    def output(self, start=None, end=None):
+    def output(self, start=None):
+        """Output of items updated after version `start`, in log order."""
         if start is None:
             start = 0
-        if end is None:
-            end = len(self.updates)
 
-        out = []
-        seen = set()
-        for update in self.updates[start:end]:
-            if update not in seen:
-                out.append(self.logs[update].output())
-                seen.add(update)
+        # walk back from the most recent update, cost depends on changed items only
+        nos = []
+        for no in reversed(self._updated):
+            if self._updated[no] <= start:
+                break
+            nos.append(no)
 
-        return out
+        return [self.logs[no].output() for no in sorted(nos)]
 
     def reset(self):
         self.guid = str(uuid.uuid4())
-        self.updates = []
+        self.version = 0
+        self._updated = OrderedDict()
         self.logs = []
         self.set_initial_progress()
 
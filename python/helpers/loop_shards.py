@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Literal
+
+from python.helpers import executors
+
+# agent contexts run on one of several event loop threads (shards), a context keeps its
+# shard for its lifetime, so its tasks, subordinates and scheduled runs share one loop
+THREAD_NAME = "AgentContext"  # thread of the first shard, the single loop without sharding
+
+Policy = Literal["least_loaded", "round_robin", "hash"]
+POLICIES: list[Policy] = ["least_loaded", "round_robin", "hash"]
+
+
+@dataclass
+class ShardStats:
+    name: str
+    contexts: int  # contexts placed on the shard
+    running: int  # tasks running now
+    started: int  # tasks started in total
+    lag_mean: float  # event loop lag in seconds, see executors.monitor_loop
+    lag_max: float
+    blocked: int
+
+
+@dataclass
+class _Shard:
+    name: str
+    contexts: set[str] = field(default_factory=set)
+    running: int = 0
+    started: int = 0
+
+
+_shards: list[_Shard] = [_Shard(THREAD_NAME)]
+_count = 1
+_policy: Policy = "least_loaded"
+_placements: dict[str, _Shard] = {}
+_next = 0
+_lock = threading.Lock()
+
+
+def configure(shards: int = 1, policy: str = "least_loaded"):
+    """Number of agent event loop threads and the policy placing new contexts on them.
+    Contexts already placed keep their shard."""
+    global _count, _policy
+    with _lock:
+        _count = max(1, int(shards))
+        _policy = policy if policy in POLICIES else "least_loaded"  # type: ignore
+        while len(_shards) < _count:
+            _shards.append(_Shard(f"{THREAD_NAME}-{len(_shards)}"))
+
+
+def place(ctxid: str) -> str:
+    """Thread name of the event loop the context runs on, chosen on first use."""
+    with _lock:
+        shard = _placements.get(ctxid)
+        if shard is None:
+            shard = _placements[ctxid] = _choose(ctxid)
+            shard.contexts.add(ctxid)
+        return shard.name
+
+
+def release(ctxid: str):
+    """Forget the placement of a removed context."""
+    with _lock:
+        shard = _placements.pop(ctxid, None)
+        if shard:
+            shard.contexts.discard(ctxid)
+
+
+async def track(
+    ctxid: str, func: Callable[..., Coroutine[Any, Any, Any]], *args: Any, **kwargs: Any
+):
+    """Run func counted as a running task of the context's shard."""
+    with _lock:
+        shard = _placements.get(ctxid)
+        if shard:
+            shard.running += 1
+            shard.started += 1
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        if shard:
+            with _lock:
+                shard.running -= 1
+
+
+def get_stats() -> list[ShardStats]:
+    lags = {lag.name: lag for lag in executors.get_loop_lags()}
+    with _lock:
+        shards = [
+            (shard.name, len(shard.contexts), shard.running, shard.started)
+            for index, shard in enumerate(_shards)
+            # shards above the configured count are listed while contexts remain on them
+            if index < _count or shard.contexts or shard.running
+        ]
+    stats = []
+    for name, contexts, running, started in shards:
+        lag = lags.get(name)
+        stats.append(
+            ShardStats(
+                name=name,
+                contexts=contexts,
+                running=running,
+                started=started,
+                lag_mean=lag.mean if lag else 0.0,
+                lag_max=lag.max if lag else 0.0,
+                blocked=lag.blocked if lag else 0,
+            )
+        )
+    return stats
+
+
+def get_policy() -> Policy:
+    return _policy
+
+
+def _choose(ctxid: str) -> _Shard:
+    global _next
+    active = _shards[:_count]
+    if _policy == "hash":
+        # stable across restarts, a loaded chat returns to the same shard
+        digest = hashlib.sha1(ctxid.encode("utf-8")).digest()
+        return active[int.from_bytes(digest[:4], "big") % len(active)]
+    if _policy == "round_robin":
+        shard = active[_next % len(active)]
+        _next += 1
+        return shard
+    # fewest running tasks first, then fewest contexts, then the lower shard
+    return min(active, key=lambda shard: (shard.running, len(shard.contexts)))
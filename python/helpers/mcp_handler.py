@@ -23,6 +23,7 @@ from datetime import timedelta
 import json
 from python.helpers import errors
 from python.helpers import settings
+from python.helpers import mcp_session_pool
 
 import httpx
 
@@ -75,6 +76,19 @@ def _determine_server_type(config_dict: dict) -> str:
         return "MCPServerLocal"
 
 
+# bumped whenever the configured servers or their tool lists change
+_tools_revision = 0
+
+
+def get_tools_revision() -> int:
+    return _tools_revision
+
+
+def _bump_tools_revision():
+    global _tools_revision
+    _tools_revision += 1
+
+
 def _is_streaming_http_type(server_type: str) -> bool:
     """Check if the server type is a streaming HTTP variant."""
     return server_type.lower() in ["http-stream", "streaming-http", "streamable-http", "http-streaming"]
@@ -221,7 +235,8 @@ class MCPServerRemote(BaseModel):
     verify: bool = Field(default=True, description="Verify SSL certificates")
     disabled: bool = Field(default=False)
 
-    __lock: ClassVar[threading.Lock] = PrivateAttr(default=threading.Lock())
+    # reentrant, update() reads the instance while holding it
+    __lock: ClassVar[threading.RLock] = PrivateAttr(default=threading.RLock())
     __client: Optional["MCPClientRemote"] = PrivateAttr(default=None)
 
     def __init__(self, config: dict[str, Any]):
@@ -252,8 +267,9 @@ class MCPServerRemote(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # not holding the lock while waiting, calls run concurrently on the pooled session
+        return await client.call_tool(tool_name, input_data)  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerRemote":
         with self.__lock:
@@ -276,6 +292,8 @@ class MCPServerRemote(BaseModel):
                         key = "url"  # remap serverUrl to url
 
                     setattr(self, key, value)
+            # the configuration may have changed, connect again
+            self.__client.close_session()  # type: ignore
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
@@ -300,7 +318,8 @@ class MCPServerLocal(BaseModel):
     verify: bool = Field(default=True, description="Verify SSL certificates")
     disabled: bool = Field(default=False)
 
-    __lock: ClassVar[threading.Lock] = PrivateAttr(default=threading.Lock())
+    # reentrant, update() reads the instance while holding it
+    __lock: ClassVar[threading.RLock] = PrivateAttr(default=threading.RLock())
     __client: Optional["MCPClientLocal"] = PrivateAttr(default=None)
 
     def __init__(self, config: dict[str, Any]):
@@ -331,8 +350,9 @@ class MCPServerLocal(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # not holding the lock while waiting, calls run concurrently on the pooled session
+        return await client.call_tool(tool_name, input_data)  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerLocal":
         with self.__lock:
@@ -353,6 +373,8 @@ class MCPServerLocal(BaseModel):
                     if key == "name":
                         value = normalize_name(value)
                     setattr(self, key, value)
+            # the configuration may have changed, connect again
+            self.__client.close_session()  # type: ignore
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
@@ -373,15 +395,18 @@ MCPServer = Annotated[
 class MCPConfig(BaseModel):
     servers: list[MCPServer] = Field(default_factory=list)
     disconnected_servers: list[dict[str, Any]] = Field(default_factory=list)
-    __lock: ClassVar[threading.Lock] = PrivateAttr(default=threading.Lock())
+    # reentrant, update() reads the instance while holding it
+    __lock: ClassVar[threading.RLock] = PrivateAttr(default=threading.RLock())
     __instance: ClassVar[Any] = PrivateAttr(default=None)
     __initialized: ClassVar[bool] = PrivateAttr(default=False)
 
     @classmethod
     def get_instance(cls) -> "MCPConfig":
-        # with cls.__lock:
         if cls.__instance is None:
-            cls.__instance = cls(servers_list=[])
+            # agents on all event loop shards share one config
+            with cls.__lock:
+                if cls.__instance is None:
+                    cls.__instance = cls(servers_list=[])
         return cls.__instance
 
     @classmethod
@@ -465,6 +490,9 @@ class MCPConfig(BaseModel):
                 "servers": servers_data
             }  # Prepare data for re-initialization or update
 
+            # sessions of the previous servers are not used anymore
+            mcp_session_pool.pool.close_all()
+
             # Option 1: Re-initialize the existing instance (if __init__ is idempotent for other fields)
             instance.__init__(servers_list=servers_data)
 
@@ -483,6 +511,7 @@ class MCPConfig(BaseModel):
             #         )
 
             cls.__initialized = True
+            _bump_tools_revision()
             return instance
 
     @classmethod
@@ -698,20 +727,20 @@ class MCPConfig(BaseModel):
     def get_tools_prompt(self, server_name: str = "") -> str:
         """Get a prompt for all tools"""
 
-        # just to wait for pending initialization
+        # waits for pending initialization, the list is replaced by updates from other shards
         with self.__lock:
-            pass
+            servers = list(self.servers)
 
         prompt = '## "Remote (MCP Server) Agent Tools" available:\n\n'
         server_names = []
-        for server in self.servers:
+        for server in servers:
             if not server_name or server.name == server_name:
                 server_names.append(server.name)
 
         if server_name and server_name not in server_names:
             raise ValueError(f"Server {server_name} not found")
 
-        for server in self.servers:
+        for server in servers:
             if server.name in server_names:
                 server_name = server.name
                 prompt += f"### {server_name}\n"
@@ -811,64 +840,37 @@ class MCPClientBase(ABC):
         self,
         coro_func: Callable[[ClientSession], Awaitable[T]],
         read_timeout_seconds=60,
+        retry: bool = False,
     ) -> T:
         """
-        Manages the lifecycle of an MCP session for a single operation.
-        Creates a temporary session, executes coro_func with it, and ensures cleanup.
+        Runs coro_func with the long-lived session of this client from the session pool.
+        The session is created on first use, health checked when idle, reconnected when
+        the connection is lost and closed after a period without requests.
+        With retry, coro_func is repeated once on a new session if the connection dropped.
         """
         operation_name = coro_func.__name__  # For logging
-        # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Creating new session for operation '{operation_name}'...")
-        # Store the original exception outside the async block
-        original_exception = None
         try:
-            async with AsyncExitStack() as temp_stack:
-                try:
-
-                    stdio, write = await self._create_stdio_transport(temp_stack)
-                    # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name} - {operation_name}): Transport created. Initializing session...")
-                    session = await temp_stack.enter_async_context(
-                        ClientSession(
-                            stdio,  # type: ignore
-                            write,  # type: ignore
-                            read_timeout_seconds=timedelta(
-                                seconds=read_timeout_seconds
-                            ),
-                        )
-                    )
-                    await session.initialize()
-
-                    result = await coro_func(session)
-
-                    return result
-                except Exception as e:
-                    # Store the original exception and raise a dummy exception
-                    excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
-                    if excs:
-                        original_exception = excs[0]
-                    else:
-                        original_exception = e
-                    # Create a dummy exception to break out of the async block
-                    raise RuntimeError("Dummy exception to break out of async block")
+            return await mcp_session_pool.pool.run(
+                self,
+                self._create_stdio_transport,
+                coro_func,
+                init_timeout=read_timeout_seconds,
+                retry=retry,
+            )
         except Exception as e:
-            # Check if this is our dummy exception
-            if original_exception is not None:
-                e = original_exception
-            # We have the original exception stored
+            excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
+            if excs:
+                e = excs[0]
             PrintStyle(
                 background_color="#AA4455", font_color="white", padding=False
             ).print(
                 f"MCPClientBase ({self.server.name} - {operation_name}): Error during operation: {type(e).__name__}: {e}"
             )
             raise e  # Re-raise the original exception
-        # finally:
-        #     PrintStyle(font_color="cyan").print(
-        #         f"MCPClientBase ({self.server.name} - {operation_name}): Session and transport will be closed by AsyncExitStack."
-        #     )
-        # This line should ideally be unreachable if the try/except/finally logic within the 'async with' is exhaustive.
-        # Adding it to satisfy linters that might not fully trace the raise/return paths through async context managers.
-        raise RuntimeError(
-            f"MCPClientBase ({self.server.name} - {operation_name}): _execute_with_session exited 'async with' block unexpectedly."
-        )
+
+    def close_session(self):
+        """Close the pooled session, the next operation connects again."""
+        mcp_session_pool.pool.close(self)
 
     async def update_tools(self) -> "MCPClientBase":
         # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Starting 'update_tools' operation...")
@@ -884,6 +886,7 @@ class MCPClientBase(ABC):
                     }
                     for tool in response.tools
                 ]
+            _bump_tools_revision()
             PrintStyle(font_color="green").print(
                 f"MCPClientBase ({self.server.name}): Tools updated. Found {len(self.tools)} tools."
             )
@@ -894,6 +897,7 @@ class MCPClientBase(ABC):
                 list_tools_op,
                 read_timeout_seconds=self.server.init_timeout
                 or set["mcp_client_init_timeout"],
+                retry=True,  # listing tools is safe to repeat
             )
         except Exception as e:
             # e = eg.exceptions[0]
@@ -907,6 +911,7 @@ class MCPClientBase(ABC):
             with self.__lock:
                 self.tools = []  # Ensure tools are cleared on failure
                 self.error = f"Failed to initialize. {error_text[:200]}{'...' if len(error_text) > 200 else ''}"  # store error from tools fetch
+            _bump_tools_revision()
         return self
 
     def has_tool(self, tool_name: str) -> bool:
@@ -954,7 +959,12 @@ class MCPClientBase(ABC):
             return response
 
         try:
-            return await self._execute_with_session(call_tool_op)
+            set = settings.get_settings()
+            return await self._execute_with_session(
+                call_tool_op,
+                read_timeout_seconds=self.server.init_timeout
+                or set["mcp_client_init_timeout"],
+            )
         except Exception as e:
             # Error logged by _execute_with_session. Re-raise a specific error for the caller.
             PrintStyle(
@@ -0,0 +1,202 @@
+import asyncio
+from contextlib import AsyncExitStack
+from datetime import timedelta
+import time
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from mcp import ClientSession
+
+from python.helpers.defer import EventLoopThread
+
+T = TypeVar("T")
+
+IDLE_TIMEOUT = 300.0  # seconds without requests before a session is closed
+HEALTH_CHECK_AFTER = 30.0  # sessions idle longer than this are pinged before reuse
+PING_TIMEOUT = 5.0
+MAX_CONCURRENT_REQUESTS = 4  # requests in flight per server
+EVICTION_INTERVAL = 30.0
+
+# opens the transport inside the given exit stack, returns (read_stream, write_stream)
+Connect = Callable[[AsyncExitStack], Awaitable[tuple[Any, Any]]]
+
+
+class PooledSession:
+    """One long-lived MCP session. The transport and session contexts are entered and exited
+    by a single owner task, as anyio requires, requests run concurrently on the session."""
+
+    def __init__(self, connect: Connect, init_timeout: float):
+        self._connect = connect
+        self.init_timeout = init_timeout
+        self.session: ClientSession | None = None
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+        self.connects = 0
+        self._owner: asyncio.Task | None = None
+        self._close: asyncio.Event | None = None
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.session and self._owner and not self._owner.done())
+
+    async def run(self, op: Callable[[ClientSession], Awaitable[T]]) -> T:
+        async with self._slots:
+            session = await self._get()
+            self.in_flight += 1
+            try:
+                return await op(session)
+            except Exception:
+                # a failed request may mean the server is gone, drop the session if it does not answer
+                if self.session is session and not await self._healthy():
+                    async with self._lock:
+                        if self.session is session:
+                            await self._shutdown()
+                raise
+            finally:
+                self.in_flight -= 1
+                self.last_used = time.monotonic()
+
+    async def close(self):
+        async with self._lock:
+            await self._shutdown()
+
+    async def _get(self) -> ClientSession:
+        async with self._lock:
+            if self.alive:
+                idle = time.monotonic() - self.last_used
+                if self.in_flight or idle < HEALTH_CHECK_AFTER or await self._healthy():
+                    return self.session  # type: ignore
+                await self._shutdown()
+            return await self._start()
+
+    async def _healthy(self) -> bool:
+        try:
+            await asyncio.wait_for(self.session.send_ping(), PING_TIMEOUT)  # type: ignore
+            return True
+        except Exception:
+            return False
+
+    async def _start(self) -> ClientSession:
+        ready: asyncio.Future[ClientSession] = asyncio.get_running_loop().create_future()
+        self._close = asyncio.Event()
+        self._owner = asyncio.create_task(self._own(ready, self._close))
+        self.session = await ready
+        self.connects += 1
+        self.last_used = time.monotonic()
+        return self.session
+
+    async def _own(self, ready: "asyncio.Future[ClientSession]", close: asyncio.Event):
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await self._connect(stack)
+                session = await stack.enter_async_context(
+                    ClientSession(
+                        read,
+                        write,
+                        read_timeout_seconds=timedelta(seconds=self.init_timeout),
+                    )
+                )
+                await session.initialize()
+                ready.set_result(session)
+                # keep the transport open until closed or the connection drops
+                await close.wait()
+        except asyncio.CancelledError:
+            ready.cancel()
+            raise
+        except BaseException as e:
+            # connection failed or dropped, the next request connects again
+            if not ready.done():
+                ready.set_exception(_unwrap(e))
+        finally:
+            if ready.done() and not ready.cancelled() and not ready.exception():
+                if self.session is ready.result():
+                    self.session = None
+
+    async def _shutdown(self):
+        owner, self._owner = self._owner, None
+        if self._close:
+            self._close.set()
+        if owner and not owner.done():
+            try:
+                await asyncio.wait_for(owner, PING_TIMEOUT)
+            except BaseException:
+                owner.cancel()
+        self.session = None
+
+
+class SessionPool:
+    """Long-lived MCP sessions by key, kept on a dedicated event loop so they can be
+    shared by agents running on different loops. Idle sessions are evicted."""
+
+    def __init__(self, thread_name: str = "MCPSessions"):
+        self.thread_name = thread_name
+        self._sessions: dict[Hashable, PooledSession] = {}
+        self._evictor: asyncio.Task | None = None
+
+    async def run(
+        self,
+        key: Hashable,
+        connect: Connect,
+        op: Callable[[ClientSession], Awaitable[T]],
+        init_timeout: float = 60,
+        retry: bool = False,
+    ) -> T:
+        """Run op with the pooled session for key, connecting first if needed.
+        With retry, op is repeated once on a new session when the connection was lost."""
+        future = self._loop().run_coroutine(
+            self._run(key, connect, op, init_timeout, retry)
+        )
+        return await asyncio.wrap_future(future)
+
+    async def _run(self, key, connect, op, init_timeout, retry):
+        if not self._evictor or self._evictor.done():
+            self._evictor = asyncio.create_task(self._evict_idle())
+        pooled = self._sessions.get(key)
+        if not pooled:
+            pooled = self._sessions[key] = PooledSession(connect, init_timeout)
+        try:
+            return await pooled.run(op)
+        except Exception:
+            if not retry or pooled.alive:
+                raise
+            return await pooled.run(op)
+
+    def close(self, key: Hashable):
+        """Close the session for key, e.g. after the server configuration changed."""
+        if key in self._sessions:
+            self._loop().run_coroutine(self._close([key])).result()
+
+    def close_all(self):
+        if self._sessions:
+            self._loop().run_coroutine(self._close(list(self._sessions))).result()
+
+    async def _close(self, keys: list[Hashable]):
+        for key in keys:
+            pooled = self._sessions.pop(key, None)
+            if pooled:
+                await pooled.close()
+
+    async def _evict_idle(self):
+        while self._sessions:
+            await asyncio.sleep(EVICTION_INTERVAL)
+            now = time.monotonic()
+            idle = [
+                key
+                for key, pooled in self._sessions.items()
+                if not pooled.in_flight and now - pooled.last_used > IDLE_TIMEOUT
+            ]
+            await self._close(idle)
+
+    def _loop(self) -> EventLoopThread:
+        return EventLoopThread(self.thread_name)
+
+
+def _unwrap(e: BaseException) -> BaseException:
+    # anyio task groups wrap transport errors in exception groups
+    while getattr(e, "exceptions", None):
+        e = e.exceptions[0]  # type: ignore
+    return e
+
+
+pool = SessionPool()
@@ -1,8 +1,11 @@
+import asyncio
+from concurrent.futures import Future
+import threading
 from datetime import datetime
-from typing import Any, List, Sequence
+from typing import Callable, List, Sequence
 from langchain.storage import InMemoryByteStore, LocalFileStore
 from langchain.embeddings import CacheBackedEmbeddings
-from python.helpers import guids
+from python.helpers import guids, executors
 
 # from langchain_chroma import Chroma
 from langchain_community.vectorstores import FAISS
@@ -26,19 +29,23 @@ from python.helpers.print_style import PrintStyle
 from . import files
 from langchain_core.documents import Document
 from python.helpers import knowledge_import
+from python.helpers.memory_journal import MemoryJournal
+from python.helpers.vector_index import AnnSearchMixin
+from python.helpers import settings
 from python.helpers.log import Log, LogItem
 from enum import Enum
 from agent import Agent, AgentContext
 import models
 import logging
-from simpleeval import simple_eval
+from python.helpers.metadata_index import MetadataFilter
+from python.helpers.embedding_service import get_store
 
 
 # Raise the log level so WARNING messages aren't shown
 logging.getLogger("langchain_core.vectorstores.base").setLevel(logging.ERROR)
 
 
-class MyFaiss(FAISS):
+class MyFaiss(AnnSearchMixin, FAISS):
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -60,34 +67,57 @@ class Memory:
         INSTRUMENTS = "instruments"
 
     index: dict[str, "MyFaiss"] = {}
+    _preload_tasks: dict[str, asyncio.Task] = {}
+    # stores being opened, waited for by other callers instead of opening them twice
+    _opening: dict[str, Future] = {}
+    # knowledge imports cancelled by a reload, done once they have stopped
+    _stopping: dict[str, Future] = {}
+    _generations: dict[str, int] = {}  # bumped on reload, stores opened meanwhile are dropped
+    # agents on different event loop shards may open the same memory at once
+    _index_lock = threading.RLock()
+
+    KNOWLEDGE_INSERT_BATCH = 512  # documents embedded and inserted at once
+    EMBEDDINGS_CACHE_FILE = "embeddings.db"
 
     @staticmethod
     async def get(agent: Agent):
         memory_subdir = get_agent_memory_subdir(agent)
-        if Memory.index.get(memory_subdir) is None:
+        log_item: LogItem | None = None
+
+        def open_db():
+            nonlocal log_item
             log_item = agent.context.log.log(
                 type="util",
                 heading=f"Initializing VectorDB in '/{memory_subdir}'",
             )
-            db, created = Memory.initialize(
+            db, _created = Memory.initialize(
                 log_item,
                 agent.config.embeddings_model,
                 memory_subdir,
                 False,
             )
-            Memory.index[memory_subdir] = db
-            wrap = Memory(db, memory_subdir=memory_subdir)
+            return db
+
+        db, opened = await Memory._open(memory_subdir, open_db)
+        wrap = Memory(db, memory_subdir=memory_subdir)
+        if opened:
             knowledge_subdirs = get_knowledge_subdirs_by_memory_subdir(
                 memory_subdir, agent.config.knowledge_subdirs or []
             )
             if knowledge_subdirs:
-                await wrap.preload_knowledge(log_item, knowledge_subdirs, memory_subdir)
-            return wrap
-        else:
-            return Memory(
-                db=Memory.index[memory_subdir],
-                memory_subdir=memory_subdir,
-            )
+                if settings.get_settings()["memory_knowledge_background"]:
+                    # do not block the first message, recall sees knowledge as it arrives
+                    with Memory._index_lock:
+                        # not when reloaded meanwhile, the next store imports it
+                        if Memory.index.get(memory_subdir) is db:
+                            Memory._preload_tasks[memory_subdir] = asyncio.create_task(
+                                wrap.preload_knowledge_background(
+                                    log_item, knowledge_subdirs, memory_subdir
+                                )
+                            )
+                else:
+                    await wrap.preload_knowledge(log_item, knowledge_subdirs, memory_subdir)
+        return wrap
 
     @staticmethod
     async def get_by_subdir(
@@ -95,36 +125,101 @@ class Memory:
         log_item: LogItem | None = None,
         preload_knowledge: bool = True,
     ):
-        if not Memory.index.get(memory_subdir):
-            import initialize
+        import initialize
 
+        agent_config = None
+
+        def open_db():
+            nonlocal agent_config
             agent_config = initialize.initialize_agent()
-            model_config = agent_config.embeddings_model
             db, _created = Memory.initialize(
                 log_item=log_item,
-                model_config=model_config,
+                model_config=agent_config.embeddings_model,
                 memory_subdir=memory_subdir,
                 in_memory=False,
             )
-            wrap = Memory(db, memory_subdir=memory_subdir)
-            if preload_knowledge:
-                knowledge_subdirs = get_knowledge_subdirs_by_memory_subdir(
-                    memory_subdir, agent_config.knowledge_subdirs or []
-                )
-                if knowledge_subdirs:
-                    await wrap.preload_knowledge(
-                        log_item, knowledge_subdirs, memory_subdir
-                    )
-            Memory.index[memory_subdir] = db
-        return Memory(db=Memory.index[memory_subdir], memory_subdir=memory_subdir)
+            return db
+
+        db, opened = await Memory._open(memory_subdir, open_db)
+        wrap = Memory(db, memory_subdir=memory_subdir)
+        if opened and preload_knowledge and agent_config:
+            knowledge_subdirs = get_knowledge_subdirs_by_memory_subdir(
+                memory_subdir, agent_config.knowledge_subdirs or []
+            )
+            if knowledge_subdirs:
+                await wrap.preload_knowledge(log_item, knowledge_subdirs, memory_subdir)
+        return wrap
 
     @staticmethod
     async def reload(agent: Agent):
-        memory_subdir = get_agent_memory_subdir(agent)
-        if Memory.index.get(memory_subdir):
-            del Memory.index[memory_subdir]
+        Memory._close(get_agent_memory_subdir(agent))
         return await Memory.get(agent)
 
+    @staticmethod
+    async def _open(
+        memory_subdir: str, open_db: Callable[[], "MyFaiss"]
+    ) -> tuple["MyFaiss", bool]:
+        """Store of the subdir, opened by the first caller in a worker thread.
+        Callers from other shards wait for it without blocking their event loop,
+        the index lock is only held to look up and register stores.
+        Returns the store and whether this call opened it."""
+        while True:
+            with Memory._index_lock:
+                db = Memory.index.get(memory_subdir)
+                if db is not None:
+                    return db, False
+                opening = Memory._opening.get(memory_subdir)
+                if opening is None:
+                    opening = Memory._opening[memory_subdir] = Future()
+                    stopping = Memory._stopping.pop(memory_subdir, None)
+                    generation = Memory._generations.get(memory_subdir, 0)
+                    break
+            db = await asyncio.wrap_future(opening)
+            if db is not None:
+                return db, False
+            # the opening call failed, was cancelled or reloaded meanwhile, try again
+
+        try:
+            if stopping:
+                # the knowledge import of the previous store may still write to the folder
+                await asyncio.wrap_future(stopping)
+            db = await executors.run_in_thread(open_db)
+        except BaseException:
+            with Memory._index_lock:
+                Memory._opening.pop(memory_subdir, None)
+                if stopping and not stopping.done():
+                    Memory._stopping.setdefault(memory_subdir, stopping)
+            opening.set_result(None)
+            raise
+        with Memory._index_lock:
+            Memory._opening.pop(memory_subdir, None)
+            current = Memory._generations.get(memory_subdir, 0) == generation
+            if current:
+                Memory.index[memory_subdir] = db
+        opening.set_result(db if current else None)
+        if not current:
+            # reloaded while opening, open again with the new settings
+            return await Memory._open(memory_subdir, open_db)
+        return db, True
+
+    @staticmethod
+    def _close(memory_subdir: str | None = None):
+        """Forget the store of the subdir, of all subdirs when None, so it is opened again.
+        Running knowledge imports are cancelled on their event loops, a store is
+        reopened once its import has stopped."""
+        with Memory._index_lock:
+            subdirs = (
+                [memory_subdir]
+                if memory_subdir is not None
+                else set(Memory.index) | set(Memory._opening) | set(Memory._preload_tasks)
+            )
+            for subdir in subdirs:
+                Memory.index.pop(subdir, None)
+                Memory._generations[subdir] = Memory._generations.get(subdir, 0) + 1
+                task = Memory._preload_tasks.pop(subdir, None)
+                if task and not task.done():
+                    Memory._stopping[subdir] = _cancel_task(task)
+
     @staticmethod
     def initialize(
         log_item: LogItem | None,
@@ -150,11 +245,16 @@ class Memory:
             store = InMemoryByteStore()
         else:
             os.makedirs(em_dir, exist_ok=True)
-            store = LocalFileStore(em_dir)
+            # single file cache, vectors from the old one-file-per-vector cache are migrated on read
+            store = get_store(
+                os.path.join(em_dir, Memory.EMBEDDINGS_CACHE_FILE),
+                fallback=LocalFileStore(em_dir),
+            )
 
         embeddings_model = models.get_embedding_model(
             model_config.provider,
             model_config.name,
+            model_config=model_config,
             **model_config.build_kwargs(),
         )
         embeddings_model_id = files.safe_file_name(
@@ -172,6 +272,10 @@ class Memory:
 
         created = False
 
+        journal = MemoryJournal.get(db_dir)
+        # a running compaction may still be writing the snapshot files
+        journal.wait_for_compaction()
+
         # if db folder exists and is not empty:
         if os.path.exists(db_dir) and files.exists(db_dir, "index.faiss"):
             db = MyFaiss.load_local(
@@ -195,9 +299,23 @@ class Memory:
                     # model matches
                     emb_ok = True
 
+            # index and docstore out of sync (interrupted snapshot write), rebuild from docs
+            if db and (
+                db.index.ntotal != len(db.index_to_docstore_id)
+                or not journal.snapshot_intact()
+            ):
+                emb_ok = False
+
+            # apply changes written since the last snapshot
+            if db and emb_ok:
+                replayed = journal.replay(db)
+                if replayed and log_item:
+                    log_item.stream(progress=f"\nReplayed {replayed} memory changes")
+
             # re-index -  create new DB and insert existing docs
             if db and not emb_ok:
                 docs = db.get_all_docs()
+                journal.replay_docs(docs)  # journaled vectors are not reusable here
                 db = None
 
         # DB not loaded, create one
@@ -237,6 +355,9 @@ class Memory:
 
             created = True
 
+        # train the configured ANN index over the loaded vectors
+        db.set_ann_index_type(settings.get_settings()["memory_index_type"])
+
         return db, created
 
     def __init__(
@@ -247,6 +368,24 @@ class Memory:
         self.db = db
         self.memory_subdir = memory_subdir
 
+    async def preload_knowledge_background(
+        self, log_item: LogItem | None, kn_dirs: list[str], memory_subdir: str
+    ):
+        try:
+            await self.preload_knowledge(log_item, kn_dirs, memory_subdir)
+            if log_item:
+                log_item.stream(progress="\nKnowledge import finished")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            PrintStyle.error(f"Knowledge import failed: {e}")
+            if log_item:
+                log_item.stream(progress=f"\nKnowledge import failed: {e}")
+        finally:
+            with Memory._index_lock:
+                if Memory._preload_tasks.get(memory_subdir) is asyncio.current_task():
+                    del Memory._preload_tasks[memory_subdir]
+
     async def preload_knowledge(
         self, log_item: LogItem | None, kn_dirs: list[str], memory_subdir: str
     ):
@@ -268,20 +407,46 @@ class Memory:
             with open(index_path, "r") as f:
                 index = json.load(f)
 
-        # preload knowledge folders
-        index = self._preload_knowledge_folders(log_item, kn_dirs, index)
+        # preload knowledge folders, parsing runs off the event loop,
+        # loader processes are kept until all folders are parsed
+        with knowledge_import.load_pool_session():
+            index = await executors.run_in_thread(
+                self._preload_knowledge_folders, log_item, kn_dirs, index
+            )
 
-        for file in index:
-            if index[file]["state"] in ["changed", "removed"] and index[file].get(
-                "ids", []
-            ):  # for knowledge files that have been changed or removed and have IDs
-                await self.delete_documents_by_ids(
-                    index[file]["ids"]
-                )  # remove original version
-            if index[file]["state"] == "changed":
-                index[file]["ids"] = await self.insert_documents(
-                    index[file]["documents"]
-                )  # insert new version
+        # remove original versions of changed and removed files at once
+        outdated_ids = [
+            id
+            for data in index.values()
+            if data["state"] in ["changed", "removed"]
+            for id in data.get("ids", [])
+        ]
+        if outdated_ids:
+            await self.delete_documents_by_ids(outdated_ids)
+
+        # insert new versions in large batches
+        changed = [data for data in index.values() if data["state"] == "changed"]
+        docs = [doc for data in changed for doc in data["documents"]]
+        ids: list[str] = []
+        try:
+            for start in range(0, len(docs), Memory.KNOWLEDGE_INSERT_BATCH):
+                ids += await self.insert_documents(
+                    docs[start : start + Memory.KNOWLEDGE_INSERT_BATCH]
+                )
+                if log_item:
+                    log_item.stream(
+                        progress=f"\nEmbedded {len(ids)}/{len(docs)} knowledge documents"
+                    )
+        except BaseException:
+            # cancelled or failed, the inserted batches are not in the import index
+            # and would be inserted again next time, remove them
+            if ids:
+                await self.delete_documents_by_ids(ids)
+            raise
+        pos = 0
+        for data in changed:
+            data["ids"] = ids[pos : pos + len(data["documents"])]
+            pos += len(data["documents"])
 
         # remove index where state="removed"
         index = {k: v for k, v in index.items() if v["state"] != "removed"}
@@ -351,6 +516,25 @@ class Memory:
             filter=comparator,
         )
 
+    async def search_similarity_threshold_multi(
+        self, query: str, searches: dict[str, tuple[int, str]], threshold: float
+    ) -> dict[str, list[Document]]:
+        """Several searches of one query, named (limit, filter) pairs.
+        The query is embedded once and all searches share one pass over the index."""
+        embedding = await self.db.embedding_function.aembed_query(query)  # type: ignore
+        relevance = self.db._select_relevance_score_fn()
+        plans = [
+            (Memory._get_comparator(filter) if filter else None, limit)
+            for limit, filter in searches.values()
+        ]
+        results = await executors.run_in_thread(
+            self.db.similarity_search_multi_by_vector, embedding, plans
+        )
+        return {
+            name: [doc for doc, score in found if relevance(score) >= threshold]
+            for name, found in zip(searches, results)
+        }
+
     async def delete_documents_by_query(
         self, query: str, threshold: float, filter: str = ""
     ):
@@ -374,7 +558,9 @@ class Memory:
                 # fnd = self.db.get(where={"id": {"$in": document_ids}})
                 # if fnd["ids"]: self.db.delete(ids=fnd["ids"])
                 # tot += len(fnd["ids"])
-                await self.db.adelete(ids=document_ids)
+                with self.db._store_lock:  # journal in the order of the changes
+                    self.db.delete(ids=document_ids)
+                    self._journal().append_delete(document_ids)  # persist
                 tot += len(document_ids)
 
             # If fewer than K document IDs, break the loop
@@ -382,7 +568,7 @@ class Memory:
                 break
 
         if tot:
-            self._save_db()  # persist
+            self._compact_if_needed()
         return removed
 
     async def delete_documents_by_ids(self, ids: list[str]):
@@ -392,10 +578,10 @@ class Memory:
         )  # existing docs to remove (prevents error)
         if rem_docs:
             rem_ids = [doc.metadata["id"] for doc in rem_docs]  # ids to remove
-            await self.db.adelete(ids=rem_ids)
-
-        if rem_docs:
-            self._save_db()  # persist
+            with self.db._store_lock:
+                self.db.delete(ids=rem_ids)
+                self._journal().append_delete(rem_ids)  # persist
+            self._compact_if_needed()
         return rem_docs
 
     async def insert_text(self, text, metadata: dict = {}):
@@ -414,17 +600,53 @@ class Memory:
                 if not doc.metadata.get("area", ""):
                     doc.metadata["area"] = Memory.Area.MAIN.value
 
-            await self.db.aadd_documents(documents=docs, ids=ids)
-            self._save_db()  # persist
+            await self._add_documents(docs, ids)
+            self._compact_if_needed()
         return ids
 
     async def update_documents(self, docs: list[Document]):
         ids = [doc.metadata["id"] for doc in docs]
-        await self.db.adelete(ids=ids)  # delete originals
-        ins = await self.db.aadd_documents(documents=docs, ids=ids)  # add updated
-        self._save_db()  # persist
+        # embed first, when it fails the originals are kept
+        texts, vectors = await self._embed_documents(docs)
+        # replaced at once, searches and compaction see either version
+        with self.db._store_lock:
+            existing = [doc.metadata["id"] for doc in self.db.get_by_ids(ids)]
+            if existing:
+                self.db.delete(ids=existing)  # delete originals
+            ins = self._store_documents(docs, ids, texts, vectors)  # add updated
+        self._compact_if_needed()
         return ins
 
+    async def _add_documents(self, docs: list[Document], ids: list[str]):
+        texts, vectors = await self._embed_documents(docs)
+        with self.db._store_lock:
+            return self._store_documents(docs, ids, texts, vectors)
+
+    async def _embed_documents(self, docs: list[Document]):
+        # embed here so the vectors can be journaled along with the documents
+        texts = [doc.page_content for doc in docs]
+        vectors = await self.db.embedding_function.aembed_documents(texts)  # type: ignore
+        return texts, vectors
+
+    def _store_documents(
+        self, docs: list[Document], ids: list[str], texts: list[str], vectors: list
+    ):
+        # called holding db._store_lock, journal in the order of the changes,
+        # adds are upserts on replay so they also persist updates
+        added = self.db.add_embeddings(
+            zip(texts, vectors), metadatas=[doc.metadata for doc in docs], ids=ids
+        )
+        self._journal().append_add(docs, ids, vectors)  # persist
+        return added
+
+    def _journal(self) -> MemoryJournal:
+        return MemoryJournal.get(abs_db_dir(self.memory_subdir))
+
+    def _compact_if_needed(self):
+        journal = self._journal()
+        if journal.needs_compaction():
+            journal.compact(self.db)
+
     def _save_db(self):
         Memory._save_db_file(self.db, self.memory_subdir)
 
@@ -437,19 +659,17 @@ class Memory:
     @staticmethod
     def _save_db_file(db: MyFaiss, memory_subdir: str):
         abs_dir = abs_db_dir(memory_subdir)
-        db.save_local(folder_path=abs_dir)
+        journal = MemoryJournal.get(abs_dir)
+        journal.wait_for_compaction()
+        with db._store_lock:
+            db.save_local(folder_path=abs_dir)
+            journal.mark_snapshot()
+            journal.reset()  # full snapshot contains all journaled changes
 
     @staticmethod
     def _get_comparator(condition: str):
-        def comparator(data: dict[str, Any]):
-            try:
-                result = simple_eval(condition, names=data)
-                return result
-            except Exception as e:
-                PrintStyle.error(f"Error evaluating condition: {e}")
-                return False
-
-        return comparator
+        # compiled once, applied as a pre-filter mask when it only uses indexed fields
+        return MetadataFilter(condition, log_errors=True)
 
     @staticmethod
     def _score_normalizer(val: float) -> float:
@@ -489,7 +709,22 @@ def get_custom_knowledge_subdir_abs(agent: Agent) -> str:
 
 def reload():
     # clear the memory index, this will force all DBs to reload
-    Memory.index = {}
+    Memory._close()
+
+
+def _cancel_task(task: asyncio.Task) -> Future:
+    """Cancel a task running on any event loop, the future is done once the task is."""
+    done: Future = Future()
+
+    def cancel():
+        task.add_done_callback(lambda _: done.set_result(None))
+        task.cancel()
+
+    try:
+        task.get_loop().call_soon_threadsafe(cancel)
+    except RuntimeError:  # loop closed, the task will not run again
+        done.set_result(None)
+    return done
 
 
 def abs_db_dir(memory_subdir: str) -> str:
@@ -0,0 +1,288 @@
+import base64
+import hashlib
+import json
+import os
+import pickle
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from langchain_core.documents import Document
+from python.helpers.print_style import PrintStyle
+
+if TYPE_CHECKING:
+    from python.helpers.memory import MyFaiss
+
+
+JOURNAL_FILE = "index.journal"
+COMPACTING_FILE = "index.journal.compacting"
+INDEX_FILE = "index.faiss"
+STORE_FILE = "index.pkl"
+# digests of the index and store files of the last completely written snapshot
+SNAPSHOT_FILE = "index.snapshot"
+
+# compaction thresholds, whichever is hit first
+COMPACT_MAX_OPS = 2000
+COMPACT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class MemoryJournal:
+    """Append-only write-ahead log next to a FAISS memory index.
+
+    Inserts, updates and deletes are appended as JSON lines in O(delta) instead of
+    rewriting index.faiss/index.pkl. Once the journal grows past the thresholds,
+    a snapshot is taken and written in a background thread, then the journal is dropped.
+    Loading replays the compacting and active journal on top of the last snapshot.
+    """
+
+    _instances: dict[str, "MemoryJournal"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_dir: str) -> "MemoryJournal":
+        with cls._instances_lock:
+            if db_dir not in cls._instances:
+                cls._instances[db_dir] = cls(db_dir)
+            return cls._instances[db_dir]
+
+    def __init__(self, db_dir: str):
+        self.db_dir = db_dir
+        self.journal_path = os.path.join(db_dir, JOURNAL_FILE)
+        self.compacting_path = os.path.join(db_dir, COMPACTING_FILE)
+        self._lock = threading.RLock()
+        self._compaction: threading.Thread | None = None
+        self._ops = 0
+
+    def append_add(
+        self, docs: Sequence[Document], ids: Sequence[str], vectors: Sequence[Any]
+    ):
+        # add is an upsert on replay, so updates are journaled the same way
+        records = [
+            {
+                "id": id,
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+                "vector": _encode_vector(vector),
+            }
+            for doc, id, vector in zip(docs, ids, vectors)
+        ]
+        self._append({"op": "add", "docs": records})
+
+    def append_delete(self, ids: Sequence[str]):
+        self._append({"op": "delete", "ids": list(ids)})
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            os.makedirs(self.db_dir, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._ops += 1
+
+    def replay(self, db: "MyFaiss") -> int:
+        """Apply journaled operations to a freshly loaded snapshot, return count of applied operations."""
+        self.wait_for_compaction()
+        applied = 0
+        with self._lock:
+            for path in (self.compacting_path, self.journal_path):
+                for entry in _read_entries(path):
+                    apply_entry(db, entry)
+                    applied += 1
+            self._ops = applied
+        return applied
+
+    def replay_docs(self, docs: dict[str, Document]) -> int:
+        """Apply journaled operations to a plain docstore dict, used when the index gets rebuilt."""
+        self.wait_for_compaction()
+        applied = 0
+        with self._lock:
+            for path in (self.compacting_path, self.journal_path):
+                for entry in _read_entries(path):
+                    if entry.get("op") == "add":
+                        for r in entry.get("docs", []):
+                            docs[r["id"]] = Document(
+                                r["text"], metadata=r.get("metadata", {})
+                            )
+                    elif entry.get("op") == "delete":
+                        for id in entry.get("ids", []):
+                            docs.pop(id, None)
+                    applied += 1
+        return applied
+
+    def needs_compaction(self) -> bool:
+        with self._lock:
+            if self._ops >= COMPACT_MAX_OPS:
+                return True
+            try:
+                return os.path.getsize(self.journal_path) >= COMPACT_MAX_BYTES
+            except OSError:
+                return False
+
+    def is_compacting(self) -> bool:
+        return bool(self._compaction and self._compaction.is_alive())
+
+    def compact(self, db: "MyFaiss", background: bool = True) -> bool:
+        """Snapshot the index and write it to disk, in a background thread by default.
+        The snapshot itself is taken synchronously so it is consistent with the journal rotation.
+        """
+        # store lock first, changes hold it while journaling
+        with getattr(db, "_store_lock", None) or nullcontext(), self._lock:
+            if self.is_compacting():
+                return False
+            if not os.path.exists(self.journal_path):
+                return False
+            # leftover from an interrupted compaction, fold it into the new one
+            if os.path.exists(self.compacting_path):
+                with open(self.compacting_path, "a", encoding="utf-8") as dst, open(
+                    self.journal_path, "r", encoding="utf-8"
+                ) as src:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+            self._ops = 0
+
+            index_data = faiss.serialize_index(db.index)
+            store_data = pickle.dumps((db.docstore, db.index_to_docstore_id))
+
+            if not background:
+                self._write_snapshot(index_data, store_data)
+                return True
+
+            self._compaction = threading.Thread(
+                target=self._write_snapshot,
+                args=(index_data, store_data),
+                name="MemoryJournalCompaction",
+                daemon=True,
+            )
+            self._compaction.start()
+            return True
+
+    def _write_snapshot(self, index_data: np.ndarray, store_data: bytes):
+        try:
+            index_tmp = os.path.join(self.db_dir, INDEX_FILE + ".tmp")
+            store_tmp = os.path.join(self.db_dir, STORE_FILE + ".tmp")
+            with open(index_tmp, "wb") as f:
+                index_data.tofile(f)
+            with open(store_tmp, "wb") as f:
+                f.write(store_data)
+            # the files are replaced one by one, the marker written after both
+            # tells a complete snapshot from one torn by a crash when loading
+            os.replace(store_tmp, os.path.join(self.db_dir, STORE_FILE))
+            os.replace(index_tmp, os.path.join(self.db_dir, INDEX_FILE))
+            self._write_marker(_digest(index_data), _digest(store_data))
+            with self._lock:
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+        except Exception as e:
+            # journal stays on disk and will be replayed, nothing is lost
+            PrintStyle.error(f"Memory journal compaction failed: {e}")
+
+    def mark_snapshot(self):
+        """Record the snapshot files written by FAISS.save_local as one complete snapshot."""
+        self._write_marker(
+            _file_digest(os.path.join(self.db_dir, INDEX_FILE)),
+            _file_digest(os.path.join(self.db_dir, STORE_FILE)),
+        )
+
+    def snapshot_intact(self) -> bool:
+        """Whether the index and store files belong to the same snapshot.
+        Snapshots written before markers were used have none and pass."""
+        marker_path = os.path.join(self.db_dir, SNAPSHOT_FILE)
+        try:
+            with open(marker_path, "r", encoding="utf-8") as f:
+                marker = json.load(f)
+        except FileNotFoundError:
+            return True
+        except (OSError, json.JSONDecodeError):
+            return False
+        return marker.get("index") == _file_digest(
+            os.path.join(self.db_dir, INDEX_FILE)
+        ) and marker.get("store") == _file_digest(os.path.join(self.db_dir, STORE_FILE))
+
+    def _write_marker(self, index_digest: str, store_digest: str):
+        marker_path = os.path.join(self.db_dir, SNAPSHOT_FILE)
+        with open(marker_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"index": index_digest, "store": store_digest}, f)
+        os.replace(marker_path + ".tmp", marker_path)
+
+    def wait_for_compaction(self, timeout: float | None = None):
+        thread = self._compaction
+        if thread and thread.is_alive():
+            thread.join(timeout)
+
+    def reset(self):
+        """Drop all journal files, called after a full snapshot has been saved."""
+        self.wait_for_compaction()
+        with self._lock:
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._ops = 0
+
+
+def apply_entry(db: "MyFaiss", entry: dict):
+    op = entry.get("op")
+    if op == "add":
+        records = entry.get("docs", [])
+        if not records:
+            return
+        ids = [r["id"] for r in records]
+        existing = [id for id in ids if id in db.docstore._dict]  # type: ignore
+        if existing:
+            db.delete(ids=existing)
+        db.add_embeddings(
+            [(r["text"], _decode_vector(r["vector"])) for r in records],
+            metadatas=[r.get("metadata", {}) for r in records],
+            ids=ids,
+        )
+    elif op == "delete":
+        ids = [id for id in entry.get("ids", []) if id in db.docstore._dict]  # type: ignore
+        if ids:
+            db.delete(ids=ids)
+
+
+def _read_entries(path: str):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # torn write at the end of the journal after a crash
+                PrintStyle.error(f"Skipping corrupted memory journal entry in {path}")
+
+
+def _digest(data: Any) -> str:
+    return hashlib.blake2b(memoryview(data), digest_size=16).hexdigest()
+
+
+def _file_digest(path: str) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                hasher.update(chunk)
+    except OSError:
+        return ""
+    return hasher.hexdigest()
+
+
+def _encode_vector(vector: Any) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode(
+        "ascii"
+    )
+
+
+def _decode_vector(data: str) -> list[float]:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).tolist()
@@ -0,0 +1,164 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+import numpy as np
+from simpleeval import simple_eval
+
+from python.helpers.print_style import PrintStyle
+
+# metadata fields kept as columns, filters over other fields fall back to per-document evaluation
+INDEXED_FIELDS = ("area", "timestamp", "knowledge_source", "document_uri", "id")
+
+_COMPARE_OPS: dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+# compiled plan nodes: ("cmp", field, op, value) | ("and", [plans]) | ("or", [plans]) | ("not", plan)
+Plan = tuple
+
+
+class MetadataFilter:
+    """Filter condition in simpleeval syntax, compiled once.
+
+    Called with a metadata dict it behaves like the original per-document comparator.
+    When the condition only uses indexed fields, `plan` holds a compiled form that
+    a MetadataIndex evaluates over whole columns at once.
+    """
+
+    def __init__(self, condition: str, log_errors: bool = False):
+        self.condition = condition
+        self.log_errors = log_errors
+        self.plan: Plan | None = compile_filter(condition)
+
+    def __call__(self, data: dict[str, Any]) -> bool:
+        try:
+            return simple_eval(self.condition, names=data)
+        except Exception as e:
+            if self.log_errors:
+                PrintStyle.error(f"Error evaluating condition: {e}")
+            return False
+
+
+@lru_cache(maxsize=256)
+def compile_filter(condition: str) -> Plan | None:
+    try:
+        tree = ast.parse(condition.strip(), mode="eval")
+        return _compile_node(tree.body)
+    except Exception:
+        return None  # unsupported or invalid, evaluated per document
+
+
+def _compile_node(node: ast.AST) -> Plan:
+    if isinstance(node, ast.BoolOp):
+        kind = "and" if isinstance(node.op, ast.And) else "or"
+        return (kind, [_compile_node(v) for v in node.values])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return ("not", _compile_node(node.operand))
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left, right, op = node.left, node.comparators[0], type(node.ops[0])
+        if op not in _COMPARE_OPS:
+            raise ValueError("unsupported operator")
+        # only plain constants, simpleeval has no list or dict literals
+        if isinstance(left, ast.Name) and left.id in INDEXED_FIELDS and isinstance(right, ast.Constant):
+            return ("cmp", left.id, op, right.value)
+        # reversed form: 'main' == area
+        if (
+            isinstance(right, ast.Name)
+            and right.id in INDEXED_FIELDS
+            and isinstance(left, ast.Constant)
+            and op in (ast.Eq, ast.NotEq)
+        ):
+            return ("cmp", right.id, op, left.value)
+    raise ValueError("unsupported expression")
+
+
+class MetadataIndex:
+    """Columnar, dictionary-encoded copy of selected metadata fields by index position."""
+
+    def __init__(self, fields: Iterable[str] = INDEXED_FIELDS):
+        self.fields = tuple(fields)
+        self._codes: dict[str, list[int]] = {f: [] for f in self.fields}
+        self._lookup: dict[str, dict[Any, int]] = {f: {} for f in self.fields}
+        self._values: dict[str, list[Any]] = {f: [] for f in self.fields}
+        self._columns: dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self._codes[self.fields[0]]) if self.fields else 0
+
+    def append(self, metadatas: Iterable[dict[str, Any]]):
+        for metadata in metadatas:
+            for field in self.fields:
+                value = metadata.get(field, None)
+                code = -1  # missing field
+                if field in metadata:
+                    key = _hashable(value)
+                    code = self._lookup[field].get(key, -1)
+                    if code == -1:
+                        code = len(self._values[field])
+                        self._lookup[field][key] = code
+                        self._values[field].append(value)
+                self._codes[field].append(code)
+        self._columns = {}
+
+    def column(self, field: str) -> np.ndarray:
+        if field not in self._columns:
+            self._columns[field] = np.array(self._codes[field], dtype=np.int64)
+        return self._columns[field]
+
+    def mask(self, plan: Plan) -> np.ndarray:
+        """Boolean mask of positions matching the plan, with simpleeval semantics
+        (a referenced field missing in the document makes the whole condition false)."""
+        value, error = self._eval(plan)
+        return value & ~error
+
+    def mask_in(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        """Boolean mask of positions where the field holds one of the values."""
+        lookup = self._lookup[field]
+        codes = [lookup[key] for key in map(_hashable, values) if key in lookup]
+        return np.isin(self.column(field), np.array(codes, dtype=np.int64))
+
+    def _eval(self, plan: Plan) -> tuple[np.ndarray, np.ndarray]:
+        kind = plan[0]
+        if kind == "cmp":
+            _, field, op, const = plan
+            func = _COMPARE_OPS[op]
+            table = np.zeros(len(self._values[field]) + 1, dtype=bool)
+            for code, val in enumerate(self._values[field]):
+                try:
+                    table[code] = bool(func(val, const))
+                except TypeError:
+                    table[code] = False
+            codes = self.column(field)
+            # code -1 indexes the trailing False slot of the table
+            return table[codes], codes == -1
+        if kind == "not":
+            value, error = self._eval(plan[1])
+            return ~value, error
+        # python short-circuit: later operands only matter (and can only fail) when evaluated
+        value, error = self._eval(plan[1][0])
+        for sub in plan[1][1:]:
+            sub_value, sub_error = self._eval(sub)
+            evaluated = ~error & (value if kind == "and" else ~value)
+            error = error | (evaluated & sub_error)
+            if kind == "and":
+                value = value & sub_value
+            else:
+                value = value | sub_value
+        return value, error
+
+
+def _hashable(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
@@ -0,0 +1,138 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Literal
+
+from python.helpers import executors
+from python.helpers.print_style import PrintStyle
+
+# runs in worker processes, keep imports of this module light
+
+Backend = Literal["pymupdf", "pdf2image"]
+
+PAGES_PER_TASK = 4  # pages extracted by one worker call
+TASKS_PER_WORKER = 2  # calls queued per worker, bounds pages held in memory
+OCR_DPI = 200
+
+
+async def extract_pdf(
+    path: str,
+    progress_callback: Callable[[str], None] | None = None,
+    executor: Executor | None = None,
+) -> str:
+    """Text of a PDF file, pages extracted in parallel worker processes.
+
+    Pages with a text layer are read by PyMuPDF (tables as markdown), pages without
+    one are rendered and OCRed by Tesseract one at a time. Only a few page ranges are
+    in flight at once, the results are joined in page order.
+    PDFs PyMuPDF cannot open are rendered with pdf2image and OCRed page by page."""
+    progress = progress_callback or (lambda msg: None)
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+
+    backend: Backend = "pymupdf"
+    try:
+        page_count = await loop.run_in_executor(executor, count_pages, path, backend)
+    except Exception as e:
+        PrintStyle.error(f"Error loading PDF with PyMuPDF, falling back to OCR: {e}")
+        backend = "pdf2image"
+        page_count = await loop.run_in_executor(executor, count_pages, path, backend)
+
+    pages = [""] * page_count
+    ranges = iter(
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    )
+    pending: set[asyncio.Future] = set()
+
+    def submit():
+        page_range = next(ranges, None)
+        if page_range:
+            pending.add(
+                loop.run_in_executor(executor, extract_range, path, *page_range, backend)
+            )
+
+    done = ocr = 0
+    progress(f"Extracting {page_count} PDF pages")
+    try:
+        for _ in range(executors.get_process_workers() * TASKS_PER_WORKER):
+            submit()
+        while pending:
+            finished, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                for index, text, ocred in future.result():
+                    pages[index] = text
+                    done += 1
+                    ocr += ocred
+                submit()
+            progress(f"Extracted {done}/{page_count} PDF pages ({ocr} with OCR)")
+    finally:
+        for future in pending:
+            future.cancel()
+
+    return "\n".join(pages)
+
+
+def count_pages(path: str, backend: Backend) -> int:
+    if backend == "pdf2image":
+        import pdf2image
+
+        return int(pdf2image.pdfinfo_from_path(path)["Pages"])
+    import fitz
+
+    with fitz.open(path) as pdf:
+        return pdf.page_count
+
+
+def extract_range(
+    path: str, start: int, end: int, backend: Backend
+) -> list[tuple[int, str, bool]]:
+    """(page index, text, OCR used) for pages start..end-1, runs in a worker process."""
+    if backend == "pdf2image":
+        return _ocr_range(path, start, end)
+
+    import fitz
+
+    result = []
+    with fitz.open(path) as pdf:
+        for index in range(start, end):
+            page = pdf[index]
+            text = page.get_text("text").strip()
+            if not text:
+                # no text layer, scanned page
+                pix = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+                result.append((index, _ocr_image("L", pix.width, pix.height, pix.samples), True))
+                continue
+            try:
+                tables = [table.to_markdown() for table in page.find_tables().tables]
+            except Exception:
+                tables = []
+            result.append((index, "\n".join([text, *tables]), False))
+    return result
+
+
+def _ocr_range(path: str, start: int, end: int) -> list[tuple[int, str, bool]]:
+    import pdf2image
+    import pytesseract
+
+    result = []
+    for index in range(start, end):
+        # one page rendered at a time (pdf2image pages are 1-based)
+        images = pdf2image.convert_from_path(
+            path, dpi=OCR_DPI, first_page=index + 1, last_page=index + 1
+        )
+        text = "".join(pytesseract.image_to_string(image) for image in images)
+        result.append((index, text, True))
+    return result
+
+
+def _ocr_image(mode: str, width: int, height: int, samples: bytes) -> str:
+    import pytesseract
+    from PIL import Image
+
+    return pytesseract.image_to_string(Image.frombytes(mode, (width, height), samples))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    return executors.get_process_pool()
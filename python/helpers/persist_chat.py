@@ -1,9 +1,13 @@
+import asyncio
 from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+import os
+import threading
+from typing import Any, Callable
 import uuid
 from agent import Agent, AgentConfig, AgentContext, AgentContextType
-from python.helpers import files, history
+from python.helpers import executors, files, history
 import json
 from initialize import initialize_agent
 
@@ -12,6 +16,36 @@ from python.helpers.log import Log, LogItem
 CHATS_FOLDER = "tmp/chats"
 LOG_SIZE = 1000
 CHAT_FILE_NAME = "chat.json"
+JOURNAL_FILE_NAME = "chat.journal"
+# rewrite the snapshot once the journal grows past either limit
+JOURNAL_MAX_ENTRIES = 200
+JOURNAL_MAX_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class _HistoryState:
+    history: history.History
+    bulks: list[tuple[history.Record, int]]
+    topics: list[tuple[history.Record, int]]
+    current: history.Topic
+    current_revision: int
+    current_count: int
+
+
+@dataclass
+class _JournalState:
+    """What of a context is already persisted, so the next save only journals the difference."""
+
+    journal_id: str
+    entries: int = 0
+    bytes: int = 0
+    log_guid: str = ""
+    log_cursor: int = 0
+    histories: dict[int, _HistoryState] = field(default_factory=dict)
+
+
+_journal_states: dict[str, _JournalState] = {}
+_journal_lock = threading.RLock()
 
 
 def get_chat_folder_path(ctxid: str):
@@ -29,17 +63,76 @@ def get_chat_folder_path(ctxid: str):
 def get_chat_msg_files_folder(ctxid: str):
     return files.get_abs_path(get_chat_folder_path(ctxid), "messages")
 
-def save_tmp_chat(context: AgentContext):
-    """Save context to the chats folder"""
+def save_tmp_chat(context: AgentContext, snapshot: bool = False):
+    """Save context to the chats folder.
+    Changes since the previous save are appended to the chat journal, the full
+    snapshot is only rewritten on first save, when forced or when the journal grows too big."""
+    write = _prepare_save(context, snapshot)
+    if write:
+        _get_writer().submit(write).result()
+
+
+async def save_tmp_chat_async(context: AgentContext, snapshot: bool = False):
+    """save_tmp_chat for the agent loop, the context is serialized on the loop
+    (consistent with running tasks) and the files are written in the chat writer thread."""
+    write = _prepare_save(context, snapshot)
+    if write:
+        await asyncio.wrap_future(_get_writer().submit(write))
+
+
+def _get_writer():
+    # one writer thread, journal lines are written in the order they were serialized
+    return executors.get_serial_pool("ChatWriter")
+
+
+def _prepare_save(context: AgentContext, snapshot: bool) -> Callable[[], None] | None:
     # Skip saving BACKGROUND contexts as they should be ephemeral
     if context.type == AgentContextType.BACKGROUND:
-        return
+        return None
 
-    path = _get_chat_file_path(context.id)
-    files.make_dirs(path)
+    with _journal_lock:
+        state = _journal_states.get(context.id)
+        if (
+            snapshot
+            or state is None
+            or state.entries >= JOURNAL_MAX_ENTRIES
+            or state.bytes >= JOURNAL_MAX_BYTES
+        ):
+            return _prepare_snapshot(context)
+
+        entry = _serialize_delta(context, state)
+        line = _safe_json_serialize(entry, ensure_ascii=False) + "\n"
+        state.entries += 1
+        state.bytes += len(line)
+        journal = _get_journal_file_path(context.id)
+
+    def write():
+        with open(journal, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    return write
+
+
+def _prepare_snapshot(context: AgentContext) -> Callable[[], None]:
+    state = _JournalState(journal_id=str(uuid.uuid4()))
     data = _serialize_context(context)
+    data["journal_id"] = state.journal_id
+    _track_persisted(context, state)
+    _journal_states[context.id] = state
+
+    path = _get_chat_file_path(context.id)
+    journal = _get_journal_file_path(context.id)
     js = _safe_json_serialize(data, ensure_ascii=False)
-    files.write_file(path, js)
+    header = _safe_json_serialize({"journal_id": state.journal_id}) + "\n"
+
+    def write():
+        files.make_dirs(path)
+        # replace atomically, a journal with the old id is ignored when loading
+        files.write_file(path + ".tmp", js)
+        os.replace(path + ".tmp", path)
+        files.write_file(journal, header)
+
+    return write
 
 
 def save_tmp_chats():
@@ -64,6 +157,7 @@ def load_tmp_chats():
         try:
             js = files.read_file(file)
             data = json.loads(js)
+            _replay_journal(data, os.path.join(os.path.dirname(file), JOURNAL_FILE_NAME))
             ctx = _deserialize_context(data)
             ctxids.append(ctx.id)
         except Exception as e:
@@ -75,6 +169,10 @@ def _get_chat_file_path(ctxid: str):
     return files.get_abs_path(CHATS_FOLDER, ctxid, CHAT_FILE_NAME)
 
 
+def _get_journal_file_path(ctxid: str):
+    return files.get_abs_path(CHATS_FOLDER, ctxid, JOURNAL_FILE_NAME)
+
+
 def _convert_v080_chats():
     json_files = files.list_files(CHATS_FOLDER, "*.json")
     for file in json_files:
@@ -105,8 +203,11 @@ def export_json_chat(context: AgentContext):
 
 def remove_chat(ctxid):
     """Remove a chat or task context"""
+    with _journal_lock:
+        _journal_states.pop(ctxid, None)
     path = get_chat_folder_path(ctxid)
-    files.delete_dir(path)
+    # after the pending writes of the chat
+    _get_writer().submit(files.delete_dir, path).result()
 
 
 def remove_msg_files(ctxid):
@@ -116,14 +217,23 @@ def remove_msg_files(ctxid):
 
 
 def _serialize_context(context: AgentContext):
-    # serialize agents
+    return {
+        **_serialize_context_meta(context),
+        "agents": [_serialize_agent(agent) for agent in _get_agents(context)],
+        "log": _serialize_log(context.log),
+    }
+
+
+def _get_agents(context: AgentContext) -> list[Agent]:
     agents = []
     agent = context.agent0
     while agent:
-        agents.append(_serialize_agent(agent))
+        agents.append(agent)
         agent = agent.data.get(Agent.DATA_NAME_SUBORDINATE, None)
+    return agents
 
 
+def _serialize_context_meta(context: AgentContext):
     data = {k: v for k, v in context.data.items() if not k.startswith("_")}
     output_data = {k: v for k, v in context.output_data.items() if not k.startswith("_")}
 
@@ -141,11 +251,9 @@ def _serialize_context(context: AgentContext):
             if context.last_message
             else datetime.fromtimestamp(0).isoformat()
         ),
-        "agents": agents,
         "streaming_agent": (
             context.streaming_agent.number if context.streaming_agent else 0
         ),
-        "log": _serialize_log(context.log),
         "data": data,
         "output_data": output_data,
     }
@@ -174,6 +282,158 @@ def _serialize_log(log: Log):
     }
 
 
+def _track_persisted(context: AgentContext, state: _JournalState):
+    state.log_guid = context.log.guid
+    state.log_cursor = context.log.version
+    state.histories = {
+        agent.number: _get_history_state(agent.history) for agent in _get_agents(context)
+    }
+
+
+def _get_history_state(hist: history.History) -> _HistoryState:
+    return _HistoryState(
+        history=hist,
+        bulks=[(b, b.revision) for b in hist.bulks],
+        topics=[(t, t.revision) for t in hist.topics],
+        current=hist.current,
+        current_revision=hist.current.revision,
+        current_count=len(hist.current.messages),
+    )
+
+
+def _serialize_delta(context: AgentContext, state: _JournalState):
+    agents = []
+    for agent in _get_agents(context):
+        prev = state.histories.get(agent.number)
+        agents.append(
+            {
+                "number": agent.number,
+                "data": {k: v for k, v in agent.data.items() if not k.startswith("_")},
+                "history": _serialize_history_delta(agent.history, prev),
+            }
+        )
+
+    log = context.log
+    if log.guid != state.log_guid:
+        log_delta = {**_serialize_log(log), "reset": True}
+    else:
+        log_delta = {
+            "guid": log.guid,
+            "logs": log.output(start=state.log_cursor),
+            "progress": log.progress,
+            "progress_no": log.progress_no,
+        }
+
+    _track_persisted(context, state)
+    return {
+        "context": _serialize_context_meta(context),
+        "agents": agents,
+        "log": log_delta,
+    }
+
+
+def _serialize_history_delta(hist: history.History, prev: _HistoryState | None):
+    if prev is None or prev.history is not hist:
+        return {"full": hist.to_dict()}
+
+    def changed(records: list[Any], persisted: list[tuple[history.Record, int]]):
+        return len(records) != len(persisted) or any(
+            r is not p or r.revision != rev for r, (p, rev) in zip(records, persisted)
+        )
+
+    delta: dict[str, Any] = {"counter": hist.counter}
+    if changed(hist.bulks, prev.bulks):
+        delta["bulks"] = [b.to_dict() for b in hist.bulks]
+    if changed(hist.topics, prev.topics):
+        delta["topics"] = [t.to_dict() for t in hist.topics]
+
+    current, count = hist.current, len(hist.current.messages)
+    appended = count - prev.current_count
+    # only new messages were added: every other change also bumps the revision
+    if (
+        current is prev.current
+        and appended >= 0
+        and current.revision - prev.current_revision == appended
+    ):
+        if appended:
+            delta["current_append"] = {
+                "start": prev.current_count,
+                "messages": [m.to_dict() for m in current.messages[prev.current_count :]],
+            }
+    else:
+        delta["current"] = current.to_dict()
+    return delta
+
+
+def _replay_journal(data: dict[str, Any], path: str):
+    """Apply journaled changes on top of a loaded snapshot."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    if len(lines) < 2:
+        return
+    try:
+        header = json.loads(lines[0])
+    except json.JSONDecodeError:
+        return
+    # journal left behind by an interrupted snapshot rewrite
+    if not data.get("journal_id") or header.get("journal_id") != data["journal_id"]:
+        return
+
+    histories: dict[int, dict[str, Any]] = {}
+    for agent in data.get("agents", []):
+        histories[agent["number"]] = (
+            json.loads(agent["history"]) if agent.get("history") else {}
+        )
+    logs = {item.get("no", i): item for i, item in enumerate(data.get("log", {}).get("logs", []))}
+
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            break  # torn write at the end of the journal
+
+        data.update(entry["context"])
+
+        agents = []
+        for agent in entry["agents"]:
+            hist = _apply_history_delta(histories.get(agent["number"], {}), agent["history"])
+            histories[agent["number"]] = hist
+            agents.append({"number": agent["number"], "data": agent["data"]})
+        data["agents"] = agents
+
+        log_delta = entry["log"]
+        if log_delta.get("reset"):
+            logs = {}
+        for item in log_delta["logs"]:
+            logs[item["no"]] = item
+        data["log"] = {
+            "guid": log_delta["guid"],
+            "progress": log_delta["progress"],
+            "progress_no": log_delta["progress_no"],
+        }
+
+    for agent in data.get("agents", []):
+        agent["history"] = json.dumps(histories.get(agent["number"], {}), ensure_ascii=False)
+    data["log"]["logs"] = [logs[no] for no in sorted(logs)][-LOG_SIZE:]
+
+
+def _apply_history_delta(hist: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    if "full" in delta:
+        return delta["full"]
+    hist = {**hist, "counter": delta["counter"]}
+    for key in ("bulks", "topics", "current"):
+        if key in delta:
+            hist[key] = delta[key]
+    if "current_append" in delta:
+        append = delta["current_append"]
+        current = dict(hist["current"])
+        current["messages"] = current.get("messages", [])[: append["start"]] + append["messages"]
+        hist["current"] = current
+    return hist
+
+
 def _deserialize_context(data):
     config = initialize_agent()
     log = _deserialize_log(data.get("log", None))
@@ -269,11 +529,11 @@ def _deserialize_log(data: dict[str, Any]) -> "Log":
                 type=item_data["type"],
                 heading=item_data.get("heading", ""),
                 content=item_data.get("content", ""),
-                kvps=OrderedDict(item_data["kvps"]) if item_data["kvps"] else None,
+                kvps=OrderedDict(item_data.get("kvps") or {}),  # as in live items
                 temp=item_data.get("temp", False),
             )
         )
-        log.updates.append(i)
+        log.mark_updated(i)
         i += 1
 
     return log
@@ -1,7 +1,7 @@
 import os
 from typing import Literal, TypedDict, TYPE_CHECKING
 
-from python.helpers import files, dirty_json, persist_chat, file_tree
+from python.helpers import files, dirty_json, persist_chat, file_tree, prompt_segments
 from python.helpers.print_style import PrintStyle
 
 
@@ -153,6 +153,7 @@ def update_project(name: str, data: EditProjectData):
     save_project_variables(name, current["variables"])
     save_project_secrets(name, current["secrets"])
 
+    prompt_segments.invalidate("project")
     reactivate_project_in_chats(name)
     return name
 
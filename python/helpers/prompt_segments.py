@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+import time
+from typing import Any, Callable, TYPE_CHECKING
+import weakref
+
+from python.helpers import prompt_templates
+
+if TYPE_CHECKING:
+    from agent import Agent
+
+
+@dataclass
+class _Segment:
+    key: Any
+    text: str
+    dependencies: dict[str, tuple]
+    checked: float
+
+
+_segments: "weakref.WeakKeyDictionary[Agent, dict[str, _Segment]]" = weakref.WeakKeyDictionary()
+
+
+def get_segment(agent: "Agent", name: str, key: Any, build: Callable[[], str]) -> str:
+    """System prompt segment of the agent, built again only when its key changes,
+    when it was invalidated, or when a file read while building it changes on disk."""
+    segments = _segments.get(agent)
+    if segments is None:
+        segments = _segments[agent] = {}
+    segment = segments.get(name)
+    if segment and segment.key == key and prompt_templates.dependencies_current(segment):
+        return segment.text
+
+    with prompt_templates.track_dependencies() as deps:
+        text = build()
+    segments[name] = _Segment(key, text, deps.files, time.monotonic())
+    return text
+
+
+def invalidate(name: str | None = None, agent: "Agent | None" = None):
+    """Drop cached segments by name, for one agent or for all of them."""
+    targets = [_segments.get(agent)] if agent else list(_segments.values())
+    for segments in targets:
+        if segments is None:
+            continue
+        if name:
+            segments.pop(name, None)
+        else:
+            segments.clear()
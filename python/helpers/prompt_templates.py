@@ -0,0 +1,262 @@
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import json
+import os
+import re
+import time
+from typing import Any, Callable
+
+# how often (seconds) a cached template or plugin is checked for changes on disk
+CHECK_INTERVAL = 1.0
+
+# {{ include 'file' }} or {{placeholder}}
+_TOKEN_PATTERN = re.compile(r"{{\s*include\s*['\"](.*?)['\"]\s*}}|{{([^{}]+?)}}")
+_INCLUDE_PATTERN = re.compile(r"{{\s*include\s*['\"](.*?)['\"]\s*}}")
+
+# compiled parts: literal str | ("var", name, raw) | ("include", path, raw)
+Part = str | tuple
+
+
+@dataclass
+class Template:
+    path: str
+    parts: list[Part]
+    is_json: bool
+    signature: tuple
+    checked: float
+
+
+@dataclass
+class _Plugin:
+    classes: list[type]
+    signature: tuple
+    checked: float
+
+
+@dataclass
+class _CachedVariables:
+    variables: dict[str, Any]
+    dependencies: dict[str, tuple]
+    checked: float
+
+
+@dataclass
+class _Dependencies:
+    files: dict[str, tuple] = field(default_factory=dict)
+
+
+_templates: dict[tuple[str, bool], Template] = {}
+_plugins: dict[str, _Plugin] = {}
+_variables: dict[tuple, _CachedVariables] = {}
+_collector: contextvars.ContextVar[_Dependencies | None] = contextvars.ContextVar(
+    "prompt_dependencies", default=None
+)
+
+
+def get_template(path: str, parse: bool = False, encoding: str = "utf-8") -> Template:
+    """Compiled template for the file, read and parsed again only when the file changes.
+    With parse=True code fences are removed first and full json templates are detected (parse_file)."""
+    key = (path, parse)
+    template = _templates.get(key)
+    now = time.monotonic()
+    if template and now - template.checked < CHECK_INTERVAL:
+        record_dependency(path, template.signature)
+        return template
+
+    signature = _signature(path)
+    if signature is None:
+        _templates.pop(key, None)
+        raise FileNotFoundError(f"File '{path}' not found.")
+    if template and template.signature == signature:
+        template.checked = now
+    else:
+        with open(path, "r", encoding=encoding) as f:
+            content = f.read()
+        template = _templates[key] = compile_template(path, content, parse, signature)
+        template.checked = now
+    record_dependency(path, signature)
+    return template
+
+
+def compile_template(path: str, content: str, parse: bool = False, signature: tuple = ()) -> Template:
+    from python.helpers import files
+
+    is_json = False
+    if parse:
+        is_json = bool(files.is_full_json_template(content))
+        content = files.remove_code_fences(content)
+
+    parts: list[Part] = []
+    pos = 0
+    for match in _TOKEN_PATTERN.finditer(content):
+        if match.start() > pos:
+            parts.append(content[pos : match.start()])
+        raw = match.group(0)
+        if match.group(1) is not None and not is_json:
+            parts.append(("include", match.group(1), raw))
+        elif match.group(2) is not None:
+            parts.append(("var", match.group(2), raw))
+        else:
+            parts.append(raw)  # includes are not processed in json templates
+        pos = match.end()
+    if pos < len(content):
+        parts.append(content[pos:])
+    return Template(path, parts, is_json, signature, 0.0)
+
+
+def render(
+    template: Template,
+    variables: dict[str, Any],
+    include: Callable[[str], str] | None = None,
+) -> str:
+    """Substitute variables and includes in a single pass. Values are not scanned for
+    placeholders, only includes in them are expanded (with the include of this template)."""
+    out: list[str] = []
+    for part in template.parts:
+        if type(part) is str:
+            out.append(part)
+        elif part[0] == "var":
+            if part[1] in variables:
+                value = variables[part[1]]
+                if template.is_json:
+                    out.append(json.dumps(value))
+                else:
+                    out.append(_expand_includes(str(value), include))
+            else:
+                out.append(part[2])
+        else:
+            out.append(_render_include(part, include))
+    return "".join(out)
+
+
+def _expand_includes(value: str, include: Callable[[str], str] | None) -> str:
+    # e.g. tool instructions collected by a plugin, their includes resolve in the outer folders
+    if not include or "{{" not in value:
+        return value
+    return _INCLUDE_PATTERN.sub(
+        lambda match: _render_include(("include", match.group(1), match.group(0)), include),
+        value,
+    )
+
+
+def _render_include(part: tuple, include: Callable[[str], str] | None) -> str:
+    _, path, raw = part
+    # if the path is absolute, do not process it
+    if not include or os.path.isabs(path):
+        return raw
+    try:
+        return include(path)
+    except FileNotFoundError:
+        return raw  # keep original if file not found
+
+
+def load_plugin_variables(
+    plugin_file: str, file: str, backup_dirs: list[str], **kwargs
+) -> dict[str, Any]:
+    """Variables from the VariablesPlugin in plugin_file. Plugin classes are imported once per
+    file version; results of plugins with cache_variables set are reused until a file or folder
+    they used changes."""
+    classes = _get_plugin_classes(plugin_file)
+    for cls in classes:
+        if not getattr(cls, "cache_variables", False):
+            return cls().get_variables(file, backup_dirs, **kwargs)
+
+        key = _variables_key(plugin_file, file, backup_dirs, kwargs)
+        cached = _variables.get(key) if key else None
+        if cached and dependencies_current(cached):
+            for path, signature in cached.dependencies.items():
+                record_dependency(path, signature)
+            return dict(cached.variables)
+
+        with track_dependencies() as deps:
+            record_dependency(plugin_file)
+            variables = cls().get_variables(file, backup_dirs, **kwargs)
+        if key:
+            _variables[key] = _CachedVariables(dict(variables), deps.files, time.monotonic())
+        return variables
+    return {}
+
+
+@contextmanager
+def track_dependencies():
+    """Collect files and folders used while rendering, nested trackers pass them on to outer ones."""
+    deps = _Dependencies()
+    outer = _collector.get()
+    token = _collector.set(deps)
+    try:
+        yield deps
+    finally:
+        _collector.reset(token)
+        if outer is not None:
+            outer.files.update(deps.files)
+
+
+def tracking() -> bool:
+    """Whether dependencies of a cached result are being collected."""
+    return _collector.get() is not None
+
+
+def record_dependency(path: str, signature: tuple | None = None):
+    """Mark a file or folder as used by the cached result being built.
+    Folders change signature when files are added, removed or renamed in them."""
+    deps = _collector.get()
+    if deps is not None:
+        deps.files[path] = signature if signature is not None else _signature(path)
+
+
+def clear_cache():
+    _templates.clear()
+    _plugins.clear()
+    _variables.clear()
+
+
+def _get_plugin_classes(plugin_file: str) -> list[type]:
+    plugin = _plugins.get(plugin_file)
+    now = time.monotonic()
+    if plugin and now - plugin.checked < CHECK_INTERVAL:
+        return plugin.classes
+
+    signature = _signature(plugin_file)
+    if plugin and plugin.signature == signature:
+        plugin.checked = now
+        return plugin.classes
+
+    from python.helpers import extract_tools
+    from python.helpers.files import VariablesPlugin
+
+    classes = extract_tools.load_classes_from_file(
+        plugin_file, VariablesPlugin, one_per_file=False
+    )
+    _plugins[plugin_file] = _Plugin(classes, signature or (), now)
+    return classes
+
+
+def dependencies_current(cached: Any) -> bool:
+    """Whether files recorded in cached.dependencies are unchanged, checked at most once per
+    CHECK_INTERVAL (cached.checked holds the time of the last check)."""
+    now = time.monotonic()
+    if now - cached.checked < CHECK_INTERVAL:
+        return True
+    for path, signature in cached.dependencies.items():
+        if _signature(path) != signature:
+            return False
+    cached.checked = now
+    return True
+
+
+def _variables_key(plugin_file: str, file: str, backup_dirs: list[str], kwargs: dict) -> tuple | None:
+    try:
+        key = (plugin_file, file, tuple(backup_dirs), tuple(sorted(kwargs.items())))
+        hash(key)
+        return key
+    except TypeError:
+        return None  # unhashable arguments, not cached
+
+
+def _signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
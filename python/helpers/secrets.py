@@ -16,6 +16,8 @@ if TYPE_CHECKING:
 # New alias-based placeholder format §§secret(KEY)
 ALIAS_PATTERN = r"§§secret\(([A-Za-z_][A-Za-z0-9_]*)\)"
 DEFAULT_SECRETS_FILE = "tmp/secrets.env"
+# how often loaded secrets check their files for outside changes
+FILE_CHECK_INTERVAL = 1.0
 
 
 def alias_for_key(key: str, placeholder: str = "§§secret({key})") -> str:
@@ -35,6 +37,56 @@ class EnvLine:
     )
 
 
+class SecretsMatcher:
+    """Replaces many secret values in a single pass over the text.
+
+    Values are compiled into one regular expression shaped like a prefix trie,
+    so the cost depends on the text length rather than on the number of secrets.
+    At every position the longest matching value wins.
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        # value -> replacement
+        self.replacements = {v: r for v, r in replacements.items() if v}
+        self.pattern = (
+            re.compile(_trie_regex(list(self.replacements))) if self.replacements else None
+        )
+
+    def replace(self, text: str) -> str:
+        if not self.pattern or not text:
+            return text
+        return self.pattern.sub(self._replacement, text)
+
+    def _replacement(self, match: re.Match) -> str:
+        return self.replacements[match.group(0)]
+
+
+def _trie_regex(values: List[str]) -> str:
+    trie: dict = {}
+    for value in values:
+        node = trie
+        for ch in value:
+            node = node.setdefault(ch, {})
+        node[""] = True  # end of a value
+    return _trie_node_regex(trie)
+
+
+def _trie_node_regex(node: dict) -> str:
+    branches = []
+    for ch in sorted(k for k in node if k):
+        # collapse chains without branching into one literal
+        literal, child = ch, node[ch]
+        while len(child) == 1 and "" not in child:
+            (next_ch, child), = child.items()
+            literal += next_ch
+        branches.append(re.escape(literal) + _trie_node_regex(child))
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # a value ends here, longer values are tried first as the group is greedy
+    return "(?:" + body + ")?" if "" in node else body
+
+
 class StreamingSecretsFilter:
     """Stateful streaming filter that masks secrets on the fly.
 
@@ -44,7 +96,12 @@ class StreamingSecretsFilter:
     - On finalize(), any unresolved partial is masked with '***'.
     """
 
-    def __init__(self, key_to_value: Dict[str, str], min_trigger: int = 3):
+    def __init__(
+        self,
+        key_to_value: Dict[str, str],
+        min_trigger: int = 3,
+        matcher: Optional[SecretsMatcher] = None,
+    ):
         self.min_trigger = max(1, int(min_trigger))
         # Map value -> key for placeholder construction
         self.value_to_key: Dict[str, str] = {
@@ -52,11 +109,16 @@ class StreamingSecretsFilter:
         }
         # Only keep non-empty values
         self.secret_values: List[str] = [v for v in self.value_to_key.keys() if v]
-        # Precompute all prefixes for quick suffix matching
+        self.matcher = matcher or SecretsMatcher(
+            {v: alias_for_key(k) for v, k in self.value_to_key.items()}
+        )
+        # Precompute all prefixes for quick suffix matching, shorter ones than
+        # min_trigger are held too so a secret split across chunks is still found
         self.prefixes: Set[str] = set()
         for v in self.secret_values:
-            for i in range(self.min_trigger, len(v) + 1):
+            for i in range(1, len(v) + 1):
                 self.prefixes.add(v[:i])
+        self.first_chars: Set[str] = {v[0] for v in self.secret_values}
         self.max_len: int = max((len(v) for v in self.secret_values), default=0)
 
         # Internal buffer of pending text that is not safe to flush yet
@@ -64,23 +126,16 @@ class StreamingSecretsFilter:
 
     def _replace_full_values(self, text: str) -> str:
         """Replace all full secret values with placeholders in the given text."""
-        # Sort by length desc to avoid partial overlaps
-        for val in sorted(self.secret_values, key=len, reverse=True):
-            if not val:
-                continue
-            key = self.value_to_key.get(val, "")
-            if key:
-                text = text.replace(val, alias_for_key(key))
-        return text
+        return self.matcher.replace(text)
 
-    def _longest_suffix_prefix(self, text: str) -> int:
+    def _longest_suffix_prefix(self, text: str, min_len: int = 1) -> int:
         """Return length of longest suffix of text that is a known secret prefix.
-        Returns 0 if none found (or only shorter than min_trigger)."""
-        max_check = min(len(text), self.max_len)
-        for length in range(max_check, self.min_trigger - 1, -1):
-            suffix = text[-length:]
-            if suffix in self.prefixes:
-                return length
+        Returns 0 if none found (or only shorter than min_len)."""
+        start = max(0, len(text) - self.max_len)
+        for i in range(start, len(text) - min_len + 1):
+            # only slice where a secret could start
+            if text[i] in self.first_chars and text[i:] in self.prefixes:
+                return len(text) - i
         return 0
 
     def process_chunk(self, chunk: str) -> str:
@@ -111,7 +166,7 @@ class StreamingSecretsFilter:
         if not self.pending:
             return ""
 
-        hold_len = self._longest_suffix_prefix(self.pending)
+        hold_len = self._longest_suffix_prefix(self.pending, self.min_trigger)
         if hold_len > 0:
             safe = self.pending[:-hold_len]
             # Mask unresolved partial
@@ -122,11 +177,65 @@ class StreamingSecretsFilter:
         return result
 
 
+class StreamingMasker:
+    """Masks the accumulated text of one stream as mask_values() would, rescanning only
+    the text that arrived since the last call plus the longest secret length.
+
+    Text before `stable` can no longer change its masking: every position there had all
+    characters of any secret that could start at it. Its masked form is kept and reused.
+    Text that does not continue the previous one is masked from the start again.
+    """
+
+    def __init__(self, matcher: SecretsMatcher):
+        self.matcher = matcher
+        self.max_len: int = max((len(v) for v in matcher.replacements), default=0)
+        self._reset()
+
+    def _reset(self):
+        self.source = ""  # last text seen
+        self.stable = 0  # length of the source prefix with final masking
+        self.masked: str | None = None  # masked source[:stable], None while nothing was masked
+
+    def mask(self, text: str) -> str:
+        pattern = self.matcher.pattern
+        if not pattern or not text:
+            return text
+        if not text.startswith(self.source):
+            self._reset()
+        self.source = text
+
+        # matches starting at or before limit are final, later ones may still grow
+        limit = len(text) - self.max_len
+        pos = self.stable
+        parts = []
+        for match in pattern.finditer(text, self.stable):
+            if match.start() > limit:
+                break
+            parts.append(text[pos : match.start()])
+            parts.append(self.matcher.replacements[match.group(0)])
+            pos = match.end()
+        # no match starts between pos and limit, that text is final as well
+        if limit >= pos:
+            parts.append(text[pos : limit + 1])
+            pos = limit + 1
+        if self.masked is not None:
+            self.masked += "".join(parts)
+        elif pos > self.stable and len(parts) > 1:
+            self.masked = text[: self.stable] + "".join(parts)
+        self.stable = pos
+
+        tail = text[self.stable :]
+        if self.masked is None and not pattern.search(tail):
+            return text  # nothing to mask so far, no copy needed
+        return (self.masked or text[: self.stable]) + self.matcher.replace(tail)
+
+
 class SecretsManager:
     PLACEHOLDER_PATTERN = ALIAS_PATTERN
     MASK_VALUE = "***"
 
     _instances: Dict[Tuple[str, ...], "SecretsManager"] = {}
+    _instances_lock = threading.Lock()  # managers are shared by all event loop shards
     _secrets_cache: Optional[Dict[str, str]] = None
     _last_raw_text: Optional[str] = None
 
@@ -135,9 +244,10 @@ class SecretsManager:
         if not secrets_files:
             secrets_files = (DEFAULT_SECRETS_FILE,)
         key = tuple(secrets_files)
-        if key not in cls._instances:
-            cls._instances[key] = cls(*secrets_files)
-        return cls._instances[key]
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(*secrets_files)
+            return cls._instances[key]
 
     def __init__(self, *files: str):
         self._lock = threading.RLock()
@@ -146,6 +256,10 @@ class SecretsManager:
         self._raw_snapshots: Dict[str, str] = {}
         self._secrets_cache = None
         self._last_raw_text = None
+        # compiled matchers by (min_length, placeholder), dropped with the secrets cache
+        self._matchers: Dict[Tuple[int, str], SecretsMatcher] = {}
+        self._file_signature: Tuple = ()
+        self._file_checked: float = 0.0
 
     def read_secrets_raw(self) -> str:
         """Read raw secrets file content from local filesystem (same system)."""
@@ -176,9 +290,12 @@ class SecretsManager:
     def load_secrets(self) -> Dict[str, str]:
         """Load secrets from file, return key-value dict"""
         with self._lock:
-            if self._secrets_cache is not None:
+            if self._secrets_cache is not None and not self._files_changed():
                 return self._secrets_cache
 
+            self._matchers = {}
+            self._file_signature = self._get_file_signature()
+            self._file_checked = time.monotonic()
             combined_raw = self.read_secrets_raw()
             merged_secrets = (
                 self.parse_env_content(combined_raw) if combined_raw else {}
@@ -191,6 +308,42 @@ class SecretsManager:
             self._secrets_cache = merged_secrets
             return merged_secrets
 
+    def _get_file_signature(self) -> Tuple:
+        signature = []
+        for path in self._files:
+            try:
+                stat = os.stat(files.get_abs_path(path))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _files_changed(self) -> bool:
+        # stat the files at most once per interval, this runs on every masked string
+        now = time.monotonic()
+        if now - self._file_checked < FILE_CHECK_INTERVAL:
+            return False
+        self._file_checked = now
+        return self._get_file_signature() != self._file_signature
+
+    def get_matcher(
+        self, min_length: int = 4, placeholder: str = "§§secret({key})"
+    ) -> SecretsMatcher:
+        """Compiled matcher for current secret values, rebuilt when the secrets change."""
+        with self._lock:
+            secrets = self.load_secrets()
+            matcher = self._matchers.get((min_length, placeholder))
+            if matcher is None:
+                matcher = SecretsMatcher(
+                    {
+                        value: alias_for_key(key, placeholder)
+                        for key, value in secrets.items()
+                        if value and len(value.strip()) >= min_length
+                    }
+                )
+                self._matchers[(min_length, placeholder)] = matcher
+            return matcher
+
     def save_secrets(self, secrets_content: str):
         """Save secrets content to file and update cache"""
         if len(self._files) != 1:
@@ -256,7 +409,13 @@ class SecretsManager:
 
     def create_streaming_filter(self) -> "StreamingSecretsFilter":
         """Create a streaming-aware secrets filter snapshotting current secret values."""
-        return StreamingSecretsFilter(self.load_secrets())
+        return StreamingSecretsFilter(
+            self.load_secrets(), matcher=self.get_matcher(min_length=1)
+        )
+
+    def create_stream_masker(self, min_length: int = 4) -> StreamingMasker:
+        """Masker for the growing full text of a stream, same result as mask_values()."""
+        return StreamingMasker(self.get_matcher(min_length))
 
     def replace_placeholders(self, text: str) -> str:
         """Replace secret placeholders with actual values"""
@@ -301,18 +460,7 @@ class SecretsManager:
         """Replace actual secret values with placeholders in text"""
         if not text:
             return text
-
-        secrets = self.load_secrets()
-        result = text
-
-        # Sort by length (longest first) to avoid partial replacements
-        for key, value in sorted(
-            secrets.items(), key=lambda x: len(x[1]), reverse=True
-        ):
-            if value and len(value.strip()) >= min_length:
-                result = result.replace(value, alias_for_key(key, placeholder))
-
-        return result
+        return self.get_matcher(min_length, placeholder).replace(text)
 
     def get_masked_secrets(self) -> str:
         """Get content with values masked for frontend display (preserves comments and unrecognized lines)"""
@@ -349,12 +497,15 @@ class SecretsManager:
         """Clear the secrets cache"""
         with self._lock:
             self._secrets_cache = None
+            self._matchers = {}
             self._raw_snapshots = {}
             self._last_raw_text = None
 
     @classmethod
     def _invalidate_all_caches(cls):
-        for instance in cls._instances.values():
+        with cls._instances_lock:
+            instances = list(cls._instances.values())
+        for instance in instances:
             instance.clear_cache()
 
     # ---------------- Internal helpers for parsing/merging ----------------
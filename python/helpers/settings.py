@@ -1,9 +1,11 @@
 import base64
+import copy
 import hashlib
 import json
 import os
 import re
 import subprocess
+import threading
 from typing import Any, Literal, TypedDict, cast
 
 import models
@@ -74,6 +76,8 @@ class Settings(TypedDict):
     memory_memorize_enabled: bool
     memory_memorize_consolidation: bool
     memory_memorize_replace_threshold: float
+    memory_index_type: str
+    memory_knowledge_background: bool
 
     api_keys: dict[str, str]
 
@@ -88,6 +92,10 @@ class Settings(TypedDict):
     rfc_port_ssh: int
 
     shell_interface: Literal['local','ssh']
+    executor_threads: int
+    executor_processes: int
+    agent_loop_shards: int
+    agent_loop_placement: str
 
     stt_model_size: str
     stt_language: str
@@ -162,7 +170,29 @@ PASSWORD_PLACEHOLDER = "****PSWD****"
 API_KEY_PLACEHOLDER = "************"
 
 SETTINGS_FILE = files.get_abs_path("tmp/settings.json")
-_settings: Settings | None = None
+_settings: Settings | None = None  # normalized, frozen snapshot
+_generation = 0  # bumped whenever a new snapshot is stored
+_settings_lock = threading.RLock()
+
+
+class FrozenDict(dict):
+    """Read-only dict, copies (dict.copy, copy.copy, copy.deepcopy) are plain mutable dicts."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("settings snapshot is read-only, use set_settings or set_settings_delta")
+
+    __setitem__ = __delitem__ = _readonly  # type: ignore
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore
+    __ior__ = _readonly  # type: ignore
+
+    def __reduce_ex__(self, protocol):  # type: ignore
+        return (dict, (dict(self),))
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    return value
 
 
 def convert_out(settings: Settings) -> SettingsOutput:
@@ -837,6 +867,33 @@ def convert_out(settings: Settings) -> SettingsOutput:
         }
     )
 
+    memory_fields.append(
+        {
+            "id": "memory_index_type",
+            "title": "Memory search index",
+            "description": "Vector index used to search memories and documents. Flat is exact but scans all vectors, HNSW and IVF are approximate and much faster on large memory. Auto switches by memory size.",
+            "type": "select",
+            "value": settings["memory_index_type"],
+            "options": [
+                {"value": "auto", "label": "Auto (by size)"},
+                {"value": "flat", "label": "Flat (exact)"},
+                {"value": "hnsw", "label": "HNSW"},
+                {"value": "ivf_flat", "label": "IVF-Flat"},
+                {"value": "ivf_pq", "label": "IVF-PQ"},
+            ],
+        }
+    )
+
+    memory_fields.append(
+        {
+            "id": "memory_knowledge_background",
+            "title": "Import knowledge in background",
+            "description": "Knowledge files are imported while the agent already runs. The first chat does not wait for the import, but knowledge recall is incomplete until it finishes.",
+            "type": "switch",
+            "value": settings["memory_knowledge_background"],
+        }
+    )
+
     memory_section: SettingsSection = {
         "id": "memory",
         "title": "Memory",
@@ -858,6 +915,51 @@ def convert_out(settings: Settings) -> SettingsOutput:
         }
     )
 
+    dev_fields.append(
+        {
+            "id": "executor_threads",
+            "title": "Worker threads",
+            "description": "Threads running blocking work (vector search, tokenizing, file parsing) off the agent event loops. 0 sizes the pool by CPU count.",
+            "type": "number",
+            "value": settings["executor_threads"],
+        }
+    )
+
+    dev_fields.append(
+        {
+            "id": "executor_processes",
+            "title": "Worker processes",
+            "description": "Processes extracting and OCRing documents in parallel. 0 sizes the pool by CPU count, at most 4.",
+            "type": "number",
+            "value": settings["executor_processes"],
+        }
+    )
+
+    dev_fields.append(
+        {
+            "id": "agent_loop_shards",
+            "title": "Agent event loops",
+            "description": "Number of event loop threads chats and scheduled tasks run on. A chat keeps its loop, a blocked loop only delays the chats placed on it. Applies to chats started afterwards.",
+            "type": "number",
+            "value": settings["agent_loop_shards"],
+        }
+    )
+
+    dev_fields.append(
+        {
+            "id": "agent_loop_placement",
+            "title": "Agent event loop placement",
+            "description": "How new chats are assigned to event loops. Least loaded picks the loop with the fewest running tasks, hash keeps a chat on the same loop across restarts.",
+            "type": "select",
+            "value": settings["agent_loop_placement"],
+            "options": [
+                {"value": "least_loaded", "label": "Least loaded"},
+                {"value": "round_robin", "label": "Round robin"},
+                {"value": "hash", "label": "Hash of chat ID"},
+            ],
+        }
+    )
+
     if runtime.is_development():
         # dev_fields.append(
         #     {
@@ -1313,7 +1415,7 @@ def _get_api_key_field(settings: Settings, provider: str, title: str) -> Setting
 
 
 def convert_in(settings: dict) -> Settings:
-    current = get_settings()
+    current = copy.deepcopy(get_settings())
     for section in settings["sections"]:
         if "fields" in section:
             for field in section["fields"]:
@@ -1334,20 +1436,41 @@ def convert_in(settings: dict) -> Settings:
     return current
 
 def get_settings() -> Settings:
-    global _settings
-    if not _settings:
-        _settings = _read_settings_file()
-    if not _settings:
-        _settings = get_default_settings()
-    norm = normalize_settings(_settings)
-    return norm
+    """Current settings as a read-only snapshot, normalized once per generation.
+    Use copy.deepcopy or dict(...) to get a mutable copy."""
+    snapshot = _settings
+    if snapshot is None:
+        snapshot = _load_settings()
+    return snapshot
+
+
+def get_settings_generation() -> int:
+    """Counter bumped by every settings change, for caches derived from settings."""
+    get_settings()
+    return _generation
+
+
+def _load_settings() -> Settings:
+    with _settings_lock:
+        if _settings is None:
+            _store_settings(_read_settings_file() or get_default_settings())
+        return _settings  # type: ignore
+
+
+def _store_settings(settings: Settings):
+    global _settings, _generation
+    normalized = normalize_settings(settings)
+    with _settings_lock:
+        _settings = _freeze(normalized)
+        _generation += 1
 
 
 def set_settings(settings: Settings, apply: bool = True):
-    global _settings
     previous = _settings
-    _settings = normalize_settings(settings)
-    _write_settings_file(_settings)
+    normalized = normalize_settings(settings)
+    _write_settings_file(normalized)
+    # normalize again, the mcp server token depends on the credentials written above
+    _store_settings(normalized)
     if apply:
         _apply_settings(previous)
 
@@ -1504,6 +1627,8 @@ def get_default_settings() -> Settings:
         memory_memorize_enabled=True,
         memory_memorize_consolidation=True,
         memory_memorize_replace_threshold=0.9,
+        memory_index_type="auto",
+        memory_knowledge_background=True,
         api_keys={},
         auth_login="",
         auth_password="",
@@ -1517,6 +1642,10 @@ def get_default_settings() -> Settings:
         rfc_port_http=55080,
         rfc_port_ssh=55022,
         shell_interface="local" if runtime.is_dockerized() else "ssh",
+        executor_threads=0,
+        executor_processes=0,
+        agent_loop_shards=1,
+        agent_loop_placement="least_loaded",
         stt_model_size="base",
         stt_language="en",
         stt_silence_threshold=0.3,
@@ -1557,11 +1686,17 @@ def _apply_settings(previous: Settings | None):
                 whisper.preload, _settings["stt_model_size"]
             )  # TODO overkill, replace with background task
 
-        # force memory reload on embedding model change
+        # resize worker pools and agent event loop shards
+        from initialize import initialize_workers
+
+        initialize_workers()
+
+        # force memory reload on embedding model or index type change
         if not previous or (
             _settings["embed_model_name"] != previous["embed_model_name"]
             or _settings["embed_model_provider"] != previous["embed_model_provider"]
             or _settings["embed_model_kwargs"] != previous["embed_model_kwargs"]
+            or _settings["memory_index_type"] != previous["memory_index_type"]
         ):
             from python.helpers.memory import reload as memory_reload
 
@@ -5,14 +5,18 @@ import time
 import sys
 from typing import Optional, Tuple
 from python.helpers import tty_session, runtime
-from python.helpers.shell_ssh import clean_string
+from python.helpers.terminal_output import TerminalOutput, clean_string
 
 class LocalInteractiveSession:
     def __init__(self, cwd: str|None = None):
         self.session: tty_session.TTYSession|None = None
-        self.full_output = ''
+        self.output = TerminalOutput()
         self.cwd = cwd
 
+    @property
+    def full_output(self) -> str:
+        return self.output.text()
+
     async def connect(self):
         self.session = tty_session.TTYSession(runtime.get_terminal_executable(), cwd=self.cwd)
         await self.session.start()
@@ -26,24 +30,32 @@ class LocalInteractiveSession:
     async def send_command(self, command: str):
         if not self.session:
             raise Exception("Shell not connected")
-        self.full_output = ""
+        self.output.reset()
         await self.session.sendline(command)
- 
-    async def read_output(self, timeout: float = 0, reset_full_output: bool = False) -> Tuple[str, Optional[str]]:
+
+    async def read_partial(self, wait: float = 0, timeout: float = 0) -> str:
+        """Wait up to `wait` seconds for output, then read until idle or timeout.
+        New output is added to self.output, returns it cleaned."""
         if not self.session:
             raise Exception("Shell not connected")
 
-        if reset_full_output:
-            self.full_output = ""
+        partial_output = ""
+        if wait > 0:
+            # woken by the terminal reader as soon as output arrives
+            partial_output = await self.session.read(timeout=wait) or ""
+            if not partial_output:
+                return ""
+        partial_output += await self.session.read_full_until_idle(idle_timeout=0.01, total_timeout=timeout)
+        self.output.feed(partial_output)
+        return clean_string(partial_output)
 
-        # get output from terminal
-        partial_output = await self.session.read_full_until_idle(idle_timeout=0.01, total_timeout=timeout)
-        self.full_output += partial_output
+    async def read_output(self, timeout: float = 0, reset_full_output: bool = False) -> Tuple[str, Optional[str]]:
+        if reset_full_output:
+            self.output.reset()
 
-        # clean output
-        partial_output = clean_string(partial_output)
-        clean_full_output = clean_string(self.full_output)
+        partial_output = await self.read_partial(timeout=timeout)
+        clean_full_output = self.output.text()
 
         if not partial_output:
             return clean_full_output, None
-        return clean_full_output, partial_output
\ No newline at end of file
+        return clean_full_output, partial_output
@@ -5,6 +5,7 @@ import re
 from typing import Tuple
 from python.helpers.log import Log
 from python.helpers.print_style import PrintStyle
+from python.helpers.terminal_output import TerminalOutput, clean_string
 # from python.helpers.strings import calculate_valid_match_lengths
 
 
@@ -24,7 +25,7 @@ class SSHInteractiveSession:
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.shell = None
-        self.full_output = b""
+        self.output = TerminalOutput()
         self.last_command = b""
         self.trimmed_command_length = 0  # Initialize trimmed_command_length
         self.cwd = cwd
@@ -97,7 +98,7 @@ class SSHInteractiveSession:
     async def send_command(self, command: str):
         if not self.shell:
             raise Exception("Shell not connected")
-        self.full_output = b""
+        self.output.reset()
         # if len(command) > 10: # if command is long, add end_comment to split output
         #     command = (command + " \\\n" +SSHInteractiveSession.end_comment + "\n")
         # else:
@@ -106,14 +107,21 @@ class SSHInteractiveSession:
         self.trimmed_command_length = 0
         self.shell.send(self.last_command)
         
-    async def read_output(
-        self, timeout: float = 0, reset_full_output: bool = False
-    ) -> Tuple[str, str]:
+    @property
+    def full_output(self) -> str:
+        return self.output.text()
+
+    async def read_partial(self, wait: float = 0, timeout: float = 0) -> str:
+        """Wait up to `wait` seconds for output, then read what is ready until timeout.
+        New output is added to self.output, returns it cleaned."""
         if not self.shell:
             raise Exception("Shell not connected")
 
-        if reset_full_output:
-            self.full_output = b""
+        # paramiko channels can not be awaited, check for data in short steps
+        wait_until = time.time() + wait
+        while not self.shell.recv_ready() and time.time() < wait_until:
+            await asyncio.sleep(0.05)
+
         partial_output = b""
         leftover = b""
         start_time = time.time()
@@ -123,7 +131,7 @@ class SSHInteractiveSession:
         ):
 
             # data = self.shell.recv(1024)
-            data = self.receive_bytes()
+            data = self.receive_bytes(1 << 16)
 
             # # Trim own command from output
             # if (
@@ -153,17 +161,20 @@ class SSHInteractiveSession:
             #         self.trimmed_command_length += trim_com
 
             partial_output += data
-            self.full_output += data
-            await asyncio.sleep(0.1)  # Prevent busy waiting
+            await asyncio.sleep(0)  # let other tasks run between reads
 
-        # Decode once at the end
+        # Decode once at the end, receive_bytes keeps multi-byte characters whole
         decoded_partial_output = partial_output.decode("utf-8", errors="replace")
-        decoded_full_output = self.full_output.decode("utf-8", errors="replace")
-
-        decoded_partial_output = clean_string(decoded_partial_output)
-        decoded_full_output = clean_string(decoded_full_output)
+        self.output.feed(decoded_partial_output)
+        return clean_string(decoded_partial_output)
 
-        return decoded_full_output, decoded_partial_output
+    async def read_output(
+        self, timeout: float = 0, reset_full_output: bool = False
+    ) -> Tuple[str, str]:
+        if reset_full_output:
+            self.output.reset()
+        decoded_partial_output = await self.read_partial(timeout=timeout)
+        return self.output.text(), decoded_partial_output
 
     def receive_bytes(self, num_bytes=1024):
         if not self.shell:
@@ -212,35 +223,3 @@ class SSHInteractiveSession:
                         break
 
         return data
-
-def clean_string(input_string):
-    # Remove ANSI escape codes
-    ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
-    cleaned = ansi_escape.sub("", input_string)
-
-    # remove null bytes
-    cleaned = cleaned.replace("\x00", "")
-
-    # remove ipython \r\r\n> sequences from the start
-    cleaned = re.sub(r'^[ \r]*(?:\r*\n>[ \r]*)*', '', cleaned)
-    # also remove any amount of '> ' sequences from the start
-    cleaned = re.sub(r'^(>\s*)+', '', cleaned)
-
-    # Replace '\r\n' with '\n'
-    cleaned = cleaned.replace("\r\n", "\n")
-
-    # remove leading \r and spaces
-    cleaned = cleaned.lstrip("\r ")
-
-    # Split the string by newline characters to process each segment separately
-    lines = cleaned.split("\n")
-
-    for i in range(len(lines)):
-        # Handle carriage returns '\r' by splitting and taking the last part
-        parts = [part for part in lines[i].split("\r") if part.strip()]
-        if parts:
-            lines[i] = parts[
-                -1
-            ].rstrip()  # Overwrite with the last part after the last '\r'
-
-    return "\n".join(lines)
@@ -22,7 +22,7 @@ from python.helpers.print_style import PrintStyle
 from python.helpers.defer import DeferredTask
 from python.helpers.files import get_abs_path, make_dirs, read_file, write_file
 from python.helpers.localization import Localization
-from python.helpers import projects
+from python.helpers import projects, change_feed, loop_shards
 import pytz
 from typing import Annotated
 
@@ -536,6 +536,7 @@ class SchedulerTaskList(BaseModel):
                         "ERROR: Null token persisted in JSON file for an adhoc task"
                     )
 
+        change_feed.mark_dirty()
         return self
 
     async def update_task_by_uuid(
@@ -889,8 +890,12 @@ class TaskScheduler:
                 # Make one final save to ensure all states are persisted
                 await self._tasks.save()
 
-        deferred_task = DeferredTask(thread_name=self.__class__.__name__)
-        deferred_task.start_task(_run_task_wrapper, task.uuid, task_context)
+        # on the shard of the task's chat context, like messages sent to that chat
+        ctxid = task.context_id or task.uuid
+        deferred_task = DeferredTask(thread_name=loop_shards.place(ctxid))
+        deferred_task.start_task(
+            loop_shards.track, ctxid, _run_task_wrapper, task.uuid, task_context
+        )
 
         # Ensure background execution doesn't exit immediately on async await, especially in script contexts
         # This helps prevent premature exits when running from non-event-loop contexts
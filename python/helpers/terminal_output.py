@@ -0,0 +1,162 @@
+from collections import deque
+import re
+from typing import Callable
+
+# cleaned characters kept per command, the first and the last half, the middle is dropped
+# (below the 1 MB the code execution tool truncates its output to)
+MAX_CHARS = 800_000
+
+_ANSI_ESCAPE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+_START_NOISE = re.compile(r"[^\s>]")  # first char the start cleanup can not remove
+
+
+class TerminalOutput:
+    """Cleaned output of one terminal command, same text as clean_string() over all raw output.
+
+    Raw chunks are cleaned line by line as lines complete, so every character is cleaned once.
+    ANSI sequences never span lines and only the start of the output needs cleaning across
+    lines, which is done once before the first line with content is accepted. The current
+    line is kept raw, shortened to its last carriage return segment (progress bars).
+    Only MAX_CHARS cleaned characters are kept, from the start and from the end.
+    """
+
+    def __init__(self, max_chars: int = MAX_CHARS):
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self):
+        self.head: list[str] = []  # first lines, up to half of max_chars
+        self.tail: deque[str] = deque()  # last complete lines
+        self.head_chars = 0
+        self.tail_chars = 0
+        self.dropped = 0  # characters dropped between head and tail
+        self.version = 0  # increases with every chunk fed
+        self._start: str | None = ""  # raw output while the start is not cleaned yet
+        self._line = ""  # raw current line
+
+    def feed(self, raw: str):
+        if not raw:
+            return
+        self.version += 1
+        if self._start is not None:
+            self._feed_start(raw)
+            return
+
+        lines = (self._line + raw).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            self._add(_clean_line(line))
+        self._shorten_line()
+
+    def text(self, placeholder: Callable[[int], str] | None = None) -> str:
+        """Cleaned output, placeholder(count) marks dropped characters."""
+        if self._start is not None:
+            return clean_string(self._start)
+        lines = [*self.head]
+        if self.dropped:
+            lines.append(
+                placeholder(self.dropped)
+                if placeholder
+                else f"<< {self.dropped} characters removed >>"
+            )
+        lines.extend(self.tail)
+        lines.append(_clean_line(self._line, complete=False))
+        return "\n".join(lines)
+
+    def last_lines(self, count: int) -> str:
+        """The last count lines of the cleaned output, for prompt detection."""
+        if self._start is not None:
+            return "\n".join(self.text().split("\n")[-count:])
+        lines = [_clean_line(self._line, complete=False)]
+        for line in reversed(self.tail):
+            if len(lines) >= count:
+                break
+            lines.append(line)
+        if not self.dropped:
+            for line in reversed(self.head):
+                if len(lines) >= count:
+                    break
+                lines.append(line)
+        return "\n".join(reversed(lines))
+
+    def _feed_start(self, raw: str):
+        # keep raw output until a complete line has content the start cleanup stops at
+        self._start += raw
+        end = self._start.rfind("\n")
+        if end == -1:
+            return
+        complete = self._start[: end + 1]
+        if not _START_NOISE.search(_ANSI_ESCAPE.sub("", complete).replace("\x00", "")):
+            return
+        self._line = self._start[end + 1 :]
+        self._start = None
+        for line in clean_string(complete).split("\n")[:-1]:
+            self._add(line)
+        self._shorten_line()
+
+    def _add(self, line: str):
+        size = len(line) + 1
+        if not self.dropped and self.head_chars + size <= self.max_chars // 2:
+            self.head.append(line)
+            self.head_chars += size
+            return
+        self.tail.append(line)
+        self.tail_chars += size
+        while self.tail_chars > self.max_chars // 2 and len(self.tail) > 1:
+            removed = len(self.tail.popleft()) + 1
+            self.tail_chars -= removed
+            self.dropped += removed
+
+    def _shorten_line(self):
+        # only the last segment with content after a carriage return is kept of a line
+        cr = self._line.rfind("\r", 0, len(self._line.rstrip("\r")))
+        if cr <= 0:
+            return
+        segment = self._line[cr:]
+        esc = segment.rfind("\x1b")
+        if esc != -1 and not _ANSI_ESCAPE.match(segment, esc):
+            segment = segment[:esc]  # the escape may still be completed by the next chunk
+        if _clean_line(segment).strip():
+            self._line = self._line[cr:]
+
+
+def _clean_line(line: str, complete: bool = True) -> str:
+    line = _ANSI_ESCAPE.sub("", line).replace("\x00", "")
+    if complete and line.endswith("\r"):
+        line = line[:-1]  # '\r\n' -> '\n'
+    parts = [part for part in line.split("\r") if part.strip()]
+    if parts:
+        return parts[-1].rstrip()
+    return line
+
+
+def clean_string(input_string):
+    # Remove ANSI escape codes
+    cleaned = _ANSI_ESCAPE.sub("", input_string)
+
+    # remove null bytes
+    cleaned = cleaned.replace("\x00", "")
+
+    # remove ipython \r\r\n> sequences from the start
+    cleaned = re.sub(r'^[ \r]*(?:\r*\n>[ \r]*)*', '', cleaned)
+    # also remove any amount of '> ' sequences from the start
+    cleaned = re.sub(r'^(>\s*)+', '', cleaned)
+
+    # Replace '\r\n' with '\n'
+    cleaned = cleaned.replace("\r\n", "\n")
+
+    # remove leading \r and spaces
+    cleaned = cleaned.lstrip("\r ")
+
+    # Split the string by newline characters to process each segment separately
+    lines = cleaned.split("\n")
+
+    for i in range(len(lines)):
+        # Handle carriage returns '\r' by splitting and taking the last part
+        parts = [part for part in lines[i].split("\r") if part.strip()]
+        if parts:
+            lines[i] = parts[
+                -1
+            ].rstrip()  # Overwrite with the last part after the last '\r'
+
+    return "\n".join(lines)
@@ -1,22 +1,73 @@
-from typing import Literal
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import threading
+from typing import Literal, Sequence
 import tiktoken
 
 APPROX_BUFFER = 1.1
 TRIM_BUFFER = 0.8
+DEFAULT_ENCODING = "cl100k_base"
+CACHE_SIZE = 8192  # counted strings remembered by content hash
+CACHE_MIN_CHARS = 64  # shorter strings are cheaper to encode than to hash
 
+_cache: OrderedDict[tuple[str, bytes], int] = OrderedDict()
+_cache_lock = threading.Lock()
 
-def count_tokens(text: str, encoding_name="cl100k_base") -> int:
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str, encoding_name=DEFAULT_ENCODING) -> int:
     if not text:
         return 0
+    return count_tokens_batch([text], encoding_name)[0]
+
+
+def count_tokens_batch(
+    texts: Sequence[str], encoding_name=DEFAULT_ENCODING
+) -> list[int]:
+    """Count tokens of many texts, cached ones are looked up, the rest is encoded in one batch."""
+    counts = [0] * len(texts)
+    keys: list[tuple[str, bytes] | None] = [None] * len(texts)
+    missing: list[int] = []
 
-    # Get the encoding
-    encoding = tiktoken.get_encoding(encoding_name)
+    with _cache_lock:
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            if len(text) >= CACHE_MIN_CHARS:
+                key = (encoding_name, _digest(text))
+                keys[i] = key
+                cached = _cache.get(key)
+                if cached is not None:
+                    _cache.move_to_end(key)
+                    counts[i] = cached
+                    continue
+            missing.append(i)
 
-    # Encode the text and count the tokens
-    tokens = encoding.encode(text, disallowed_special=())
-    token_count = len(tokens)
+    if not missing:
+        return counts
 
-    return token_count
+    encoding = get_encoding(encoding_name)
+    if len(missing) == 1:
+        encoded = [encoding.encode(texts[missing[0]], disallowed_special=())]
+    else:
+        encoded = encoding.encode_batch(
+            [texts[i] for i in missing], disallowed_special=()
+        )
+
+    with _cache_lock:
+        for i, tokens in zip(missing, encoded):
+            counts[i] = len(tokens)
+            key = keys[i]
+            if key is not None:
+                _cache[key] = counts[i]
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return counts
 
 
 def approximate_tokens(
@@ -25,6 +76,10 @@ def approximate_tokens(
     return int(count_tokens(text) * APPROX_BUFFER)
 
 
+def approximate_tokens_batch(texts: Sequence[str]) -> list[int]:
+    return [int(count * APPROX_BUFFER) for count in count_tokens_batch(texts)]
+
+
 def trim_to_tokens(
     text: str,
     max_tokens: int,
@@ -42,3 +97,7 @@ def trim_to_tokens(
     if direction == "start":
         return text[:approx_chars] + ellipsis
     return ellipsis + text[chars - approx_chars : chars]
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+import os
+import time
+from typing import TypeVar
+
+from python.helpers import extract_tools, files
+
+T = TypeVar("T")
+
+# how often (seconds) tool files are checked for changes when watching is enabled
+WATCH_INTERVAL = 2.0
+
+
+@dataclass
+class _Entry:
+    cls: type
+    signature: tuple
+    checked: float
+
+
+def get_tool_class(name: str, profile: str, base_class: type[T]) -> type[T] | None:
+    """Tool class for the name, the profile tool overriding the default one.
+    Resolved once per (profile, name), reloaded on file changes when watching is enabled.
+    Unknown tools are not cached, None is returned."""
+    key = (profile, name)
+    entry = _classes.get(key)
+    if entry and (time.monotonic() - entry.checked < WATCH_INTERVAL or not _watch_enabled()):
+        return entry.cls  # type: ignore[return-value]
+
+    paths = _get_files(name, profile)
+    signature = _get_signature(paths)
+    if entry and entry.signature == signature:
+        entry.checked = time.monotonic()
+        return entry.cls  # type: ignore[return-value]
+
+    cls = _resolve(paths, base_class)
+    if cls is None:
+        _classes.pop(key, None)
+        return None
+    _classes[key] = _Entry(cls, signature, time.monotonic())
+    return cls
+
+
+def clear_cache():
+    _classes.clear()
+
+
+def set_watch(enabled: bool | None):
+    """Enable or disable reloading on file changes, None means only in development."""
+    global _watch
+    _watch = enabled
+
+
+_classes: dict[tuple[str, str], _Entry] = {}
+_watch: bool | None = None
+
+
+def _get_files(name: str, profile: str) -> list[str]:
+    paths = []
+    if profile:
+        paths.append(files.get_abs_path("agents/" + profile + "/tools/" + name + ".py"))
+    paths.append(files.get_abs_path("python/tools/" + name + ".py"))
+    return paths
+
+
+def _resolve(paths: list[str], base_class: type[T]) -> type[T] | None:
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        try:
+            classes = extract_tools.load_classes_from_file(path, base_class)
+        except Exception:
+            continue  # broken profile tool falls back to the default one
+        if classes:
+            return classes[0]
+    return None
+
+
+def _get_signature(paths: list[str]) -> tuple:
+    if not _watch_enabled():
+        return ()
+    signature = []
+    for path in paths:
+        try:
+            signature.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _watch_enabled() -> bool:
+    if _watch is None:
+        from python.helpers import runtime
+        return runtime.is_development()
+    return _watch
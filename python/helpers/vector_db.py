@@ -1,4 +1,5 @@
-from typing import Any, List, Sequence
+import asyncio
+from typing import Iterable, List, Sequence
 import uuid
 from langchain_community.vectorstores import FAISS
 
@@ -14,12 +15,14 @@ from langchain_community.vectorstores.utils import (
     DistanceStrategy,
 )
 from langchain.embeddings import CacheBackedEmbeddings
-from simpleeval import simple_eval
+from python.helpers.metadata_index import MetadataFilter
+from python.helpers.vector_index import AnnSearchMixin
+from python.helpers import settings
 
 from agent import Agent
 
 
-class MyFaiss(FAISS):
+class MyFaiss(AnnSearchMixin, FAISS):
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -35,17 +38,22 @@ class MyFaiss(FAISS):
 class VectorDB:
 
     _cached_embeddings: dict[str, CacheBackedEmbeddings] = {}
+    _dimensions: dict[str, int] = {}  # vector size per embedding model
 
     @staticmethod
-    def _get_embeddings(agent: Agent, cache: bool = True):
-        model = agent.get_embedding_model()
-        if not cache:
-            return model  # return raw embeddings if cache is False
-        namespace = getattr(
+    def _get_namespace(model) -> str:
+        return getattr(
             model,
             "model_name",
             "default",
         )
+
+    @staticmethod
+    def _get_embeddings(agent: Agent, cache: bool = True):
+        model = agent.get_embedding_model()
+        if not cache:
+            return model  # return raw embeddings if cache is False
+        namespace = VectorDB._get_namespace(model)
         if namespace not in VectorDB._cached_embeddings:
             store = InMemoryByteStore()
             VectorDB._cached_embeddings[namespace] = (
@@ -61,7 +69,10 @@ class VectorDB:
         self.agent = agent
         self.cache = cache  # store cache preference
         self.embeddings = self._get_embeddings(agent, cache=cache)
-        self.index = faiss.IndexFlatIP(len(self.embeddings.embed_query("example")))
+        self.model_id = self._get_namespace(agent.get_embedding_model())
+        if self.model_id not in VectorDB._dimensions:
+            VectorDB._dimensions[self.model_id] = len(self.embeddings.embed_query("example"))
+        self.index = faiss.IndexFlatIP(VectorDB._dimensions[self.model_id])
 
         self.db = MyFaiss(
             embedding_function=self.embeddings,
@@ -72,6 +83,10 @@ class VectorDB:
             # normalize_L2=True,
             relevance_score_fn=cosine_normalizer,
         )
+        # documents are added later, the ANN index is trained lazily on first search
+        self.db.set_ann_index_type(
+            settings.get_settings()["memory_index_type"], build=False
+        )
 
     async def search_by_similarity_threshold(
         self, query: str, limit: int, threshold: float, filter: str = ""
@@ -86,26 +101,42 @@ class VectorDB:
             filter=comparator,
         )
 
+    async def search_by_similarity_threshold_multi(
+        self, queries: list[str], limit: int, threshold: float, ids: Iterable[str]
+    ) -> list[list[Document]]:
+        """Top documents for each query, only among the documents with the given ids."""
+        embeddings = await asyncio.gather(
+            *[self.embeddings.aembed_query(query) for query in queries]
+        )
+        relevance = self.db._select_relevance_score_fn()
+        results = self.db.similarity_search_by_vectors_in_ids(list(embeddings), limit, ids)
+        return [
+            [doc for doc, score in found if relevance(score) >= threshold]
+            for found in results
+        ]
+
     async def search_by_metadata(self, filter: str, limit: int = 0) -> list[Document]:
-        comparator = get_comparator(filter)
-        all_docs = self.db.get_all_docs()
-        result = []
-        for doc in all_docs.values():
-            if comparator(doc.metadata):
-                result.append(doc)
-                # stop if limit reached and limit > 0
-                if limit > 0 and len(result) >= limit:
-                    break
-        return result
-
-    async def insert_documents(self, docs: list[Document]):
+        return self.db.search_by_metadata(get_comparator(filter), limit=limit)
+
+    async def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def insert_documents(self, docs: list[Document], vectors: Sequence[Sequence[float]] | None = None):
+        """Add documents, embedding them unless their vectors are given."""
         ids = [str(uuid.uuid4()) for _ in range(len(docs))]
 
         if ids:
             for doc, id in zip(docs, ids):
                 doc.metadata["id"] = id  # add ids to documents metadata
 
-            self.db.add_documents(documents=docs, ids=ids)
+            if vectors is None:
+                self.db.add_documents(documents=docs, ids=ids)
+            else:
+                self.db.add_embeddings(
+                    zip([doc.page_content for doc in docs], [list(v) for v in vectors]),
+                    metadatas=[doc.metadata for doc in docs],
+                    ids=ids,
+                )
         return ids
 
     async def delete_documents_by_ids(self, ids: list[str]):
@@ -139,12 +170,4 @@ def cosine_normalizer(val: float) -> float:
 
 
 def get_comparator(condition: str):
-    def comparator(data: dict[str, Any]):
-        try:
-            result = simple_eval(condition, {}, data)
-            return result
-        except Exception as e:
-            # PrintStyle.error(f"Error evaluating condition: {e}")
-            return False
-
-    return comparator
+    return MetadataFilter(condition)
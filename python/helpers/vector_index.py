@@ -0,0 +1,453 @@
+import functools
+import math
+import operator
+import threading
+from typing import Any, Callable, Iterable, List, Literal, Optional, Tuple, Union
+
+import numpy as np
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores.utils import DistanceStrategy
+from python.helpers.metadata_index import MetadataFilter, MetadataIndex
+from python.helpers.print_style import PrintStyle
+
+IndexType = Literal["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"]
+INDEX_TYPES: list[IndexType] = ["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"]
+
+# automatic selection by corpus size
+AUTO_HNSW_MIN_SIZE = 20_000
+AUTO_IVF_PQ_MIN_SIZE = 1_000_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 96
+IVF_MIN_POINTS_PER_CENTROID = 39  # faiss warns below this
+IVF_NPROBE_RATIO = 0.1
+IVF_MIN_NPROBE = 8
+PQ_NBITS = 8
+PQ_MIN_TRAIN_SIZE = (1 << PQ_NBITS) * IVF_MIN_POINTS_PER_CENTROID
+PQ_RERANK_FACTOR = 4  # compressed codes are approximate, rescore candidates exactly
+# filtered subsets up to this size are scored exactly instead of searching the index
+EXACT_SUBSET_MAX = 4096
+
+
+def select_index_type(requested: str, size: int) -> IndexType:
+    """Resolve 'auto' (or an unusable choice for the current size) to a concrete index type."""
+    if requested == "auto":
+        if size >= AUTO_IVF_PQ_MIN_SIZE:
+            return "ivf_pq"
+        if size >= AUTO_HNSW_MIN_SIZE:
+            return "hnsw"
+        return "flat"
+    # IVF variants need enough vectors to train centroids, stay exact until then
+    if requested == "ivf_flat" and size < IVF_MIN_POINTS_PER_CENTROID * 4:
+        return "flat"
+    if requested == "ivf_pq" and size < PQ_MIN_TRAIN_SIZE:
+        return "flat"
+    if requested in INDEX_TYPES:
+        return requested  # type: ignore
+    return "flat"
+
+
+def build_index(index_type: IndexType, vectors: np.ndarray) -> faiss.Index:
+    """Create, train and fill an inner-product ANN index over the given vectors."""
+    count, dim = vectors.shape
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = _ivf_nlist(count)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, nlist, _pq_subquantizers(dim), PQ_NBITS,
+                faiss.METRIC_INNER_PRODUCT,
+            )
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = max(IVF_MIN_NPROBE, int(nlist * IVF_NPROBE_RATIO))
+    else:
+        index = faiss.IndexFlatIP(dim)
+    if count:
+        index.add(vectors)
+    return index
+
+
+def _ivf_nlist(count: int) -> int:
+    nlist = int(4 * math.sqrt(count))
+    nlist = min(nlist, count // IVF_MIN_POINTS_PER_CENTROID)
+    return max(1, nlist)
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # largest divisor of dim giving sub-vectors of at least 4 dimensions
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def search_ann(
+    ann: faiss.Index,
+    exact: faiss.Index,
+    vectors: np.ndarray,
+    k: int,
+    selector: faiss.IDSelector | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Search the ANN index, rescoring PQ candidates against the exact vectors with the same positions.
+    An optional selector restricts the search to a subset of positions."""
+    params = _search_params(ann, selector)
+    if not isinstance(ann, faiss.IndexIVFPQ):
+        return ann.search(vectors, k, params=params)
+    _, candidates = ann.search(vectors, k * PQ_RERANK_FACTOR, params=params)
+    scores = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+    indices = np.full((len(vectors), k), -1, dtype=np.int64)
+    for row, (vector, cand) in enumerate(zip(vectors, candidates)):
+        cand = cand[cand >= 0]
+        if not len(cand):
+            continue
+        exact_scores = exact.reconstruct_batch(cand) @ vector
+        order = np.argsort(-exact_scores)[:k]
+        scores[row, : len(order)] = exact_scores[order]
+        indices[row, : len(order)] = cand[order]
+    return scores, indices
+
+
+def search_subset(
+    exact: faiss.Index, vectors: np.ndarray, k: int, positions: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-k over a small set of positions for each query vector."""
+    scores = vectors @ exact.reconstruct_batch(positions).T
+    order = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(scores, order, axis=1), positions[order]
+
+
+def _search_params(index: faiss.Index, selector: faiss.IDSelector | None):
+    if selector is None:
+        return None
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def flat_vectors(index: faiss.Index) -> np.ndarray | None:
+    """Vectors of a flat index as a view of its storage (no copy), None for other index types."""
+    if not isinstance(index, faiss.IndexFlat) or index.ntotal == 0:
+        return None
+    data = faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d)
+    return data.reshape(index.ntotal, index.d)
+
+
+def get_vectors(index: faiss.Index) -> np.ndarray:
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._store_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class AnnSearchMixin:
+    """Adds an optional ANN index next to the exact flat FAISS index of a langchain FAISS store.
+
+    The flat index stays the source of truth for persistence, deletes and the docstore
+    position mapping. The ANN index is built over the same positions and only used
+    to find candidates during similarity search. Additions are applied incrementally,
+    deletions shift positions so the ANN index is rebuilt in a background thread,
+    searches fall back to the exact index until the rebuild is done.
+
+    Filters given as MetadataFilter with a compiled plan are evaluated over a columnar
+    metadata index and applied as a position mask before the vector search.
+
+    Searches and changes hold a per store lock, a store is shared by agents running
+    on several event loop shards and worker threads.
+    """
+
+    ann_index_type: IndexType = "flat"
+    _ann: faiss.Index | None = None
+    _ann_version: int = -1
+    _index_version: int = 0
+    _ann_rebuild: threading.Thread | None = None
+    _meta: MetadataIndex | None = None
+    _meta_version: int = -1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._store_lock = threading.RLock()
+
+    def set_ann_index_type(self, index_type: str, build: bool = True):
+        self.ann_index_type = index_type  # type: ignore
+        self._ann = None
+        self._ann_version = -1
+        if build:
+            self.rebuild_ann(background=False)
+
+    def get_ann_index_type(self) -> IndexType:
+        return select_index_type(self.ann_index_type, self.index.ntotal)  # type: ignore
+
+    def rebuild_ann(self, background: bool = True):
+        """(Re)train the ANN index from the vectors in the flat index."""
+        index_type = self.get_ann_index_type()
+        if index_type == "flat":
+            self._ann = None
+            self._ann_version = -1
+            return
+        if self._ann_rebuild and self._ann_rebuild.is_alive():
+            return
+
+        version = self._index_version
+        vectors = get_vectors(self.index)  # type: ignore
+
+        def build():
+            try:
+                ann = build_index(index_type, vectors)
+                # install only when the flat index did not change during the build
+                if self._index_version == version:
+                    self._ann = ann
+                    self._ann_version = version
+            except Exception as e:
+                PrintStyle.error(f"Failed to build {index_type} index: {e}")
+
+        if background:
+            self._ann_rebuild = threading.Thread(
+                target=build, name="AnnIndexRebuild", daemon=True
+            )
+            self._ann_rebuild.start()
+        else:
+            build()
+
+    def _get_ann(self) -> faiss.Index | None:
+        if self.ann_index_type == "flat":
+            return None
+        if self._ann is not None and self._ann_version == self._index_version:
+            return self._ann
+        # stale or missing, search exactly for now and rebuild in background
+        self.rebuild_ann(background=True)
+        return None
+
+    def get_metadata_index(self) -> MetadataIndex:
+        if self._meta is None or self._meta_version != self._index_version:
+            meta = MetadataIndex()
+            meta.append(
+                self.docstore.search(self.index_to_docstore_id[i]).metadata  # type: ignore
+                for i in range(len(self.index_to_docstore_id))  # type: ignore
+            )
+            self._meta = meta
+            self._meta_version = self._index_version
+        return self._meta
+
+    @_locked
+    def search_by_metadata(self, filter: MetadataFilter, limit: int = 0) -> list[Document]:
+        if filter.plan is None:
+            docs = (doc for doc in self.docstore._dict.values() if filter(doc.metadata))  # type: ignore
+        else:
+            positions = np.flatnonzero(self.get_metadata_index().mask(filter.plan))
+            docs = (
+                self.docstore.search(self.index_to_docstore_id[int(i)])  # type: ignore
+                for i in positions
+            )
+        result = []
+        for doc in docs:
+            result.append(doc)
+            if limit > 0 and len(result) >= limit:
+                break
+        return result
+
+    @_locked
+    def add_embeddings(self, text_embeddings: Iterable[Tuple[str, List[float]]], metadatas=None, ids=None, **kwargs):  # type: ignore
+        text_embeddings = list(text_embeddings)
+        result = super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)  # type: ignore
+        self._on_added(
+            [e for _, e in text_embeddings],
+            metadatas or [{} for _ in text_embeddings],
+        )
+        return result
+
+    def add_texts(self, texts: Iterable[str], metadatas=None, ids=None, **kwargs):  # type: ignore
+        texts = list(texts)
+        embeddings = self._embed_documents(texts)  # type: ignore
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids, **kwargs)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas=None, ids=None, **kwargs):  # type: ignore
+        texts = list(texts)
+        embeddings = await self._aembed_documents(texts)  # type: ignore
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids, **kwargs)
+
+    @_locked
+    def delete(self, ids=None, **kwargs):  # type: ignore
+        result = super().delete(ids=ids, **kwargs)  # type: ignore
+        self._index_version += 1  # positions shifted, ann index is stale now
+        return result
+
+    def _on_added(self, embeddings: list, metadatas: list[dict]):
+        up_to_date = self._ann is not None and self._ann_version == self._index_version
+        meta_up_to_date = self._meta is not None and self._meta_version == self._index_version
+        self._index_version += 1
+        if meta_up_to_date:
+            self._meta.append(metadatas)  # type: ignore
+            self._meta_version = self._index_version
+        if not up_to_date or not embeddings:
+            return
+        # new vectors are appended at the end of the flat index, positions stay aligned
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self._normalize_L2:  # type: ignore
+            faiss.normalize_L2(vectors)
+        self._ann.add(vectors)  # type: ignore
+        self._ann_version = self._index_version
+        # corpus outgrew the current index type, retrain
+        if self.get_ann_index_type() != _index_type_of(self._ann):
+            self.rebuild_ann(background=True)
+
+    @_locked
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Union[Callable, dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        plan = filter.plan if isinstance(filter, MetadataFilter) else None
+        ann = self._get_ann()
+        if ann is None and plan is None:
+            return super().similarity_search_with_score_by_vector(  # type: ignore
+                embedding, k=k, filter=filter, fetch_k=fetch_k, **kwargs
+            )
+
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:  # type: ignore
+            faiss.normalize_L2(vector)
+        if plan is not None:
+            # pre-filter: the mask already applies the condition, no post-filtering needed
+            scores, indices = self._search_masked(
+                ann, vector, k, self.get_metadata_index().mask(plan)
+            )
+            filter = None
+        else:
+            scores, indices = search_ann(
+                ann, self.index, vector, k if filter is None else fetch_k  # type: ignore
+            )
+
+        filter_func = self._create_filter_func(filter) if filter is not None else None  # type: ignore
+        docs = []
+        for j, i in enumerate(indices[0]):
+            if i == -1:
+                continue
+            doc = self.docstore.search(self.index_to_docstore_id[i])  # type: ignore
+            if not isinstance(doc, Document):
+                continue
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, scores[0][j]))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = (
+                operator.ge
+                if self.distance_strategy  # type: ignore
+                in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+                else operator.le
+            )
+            docs = [(doc, s) for doc, s in docs if cmp(s, score_threshold)]
+        return docs[:k]
+
+    @_locked
+    def similarity_search_multi_by_vector(
+        self, embedding: List[float], searches: list[tuple[MetadataFilter | None, int]]
+    ) -> list[List[Tuple[Document, float]]]:
+        """Top k documents with scores for each (filter, k) search of one query vector.
+
+        Without an ANN index, compiled filters are answered from a single pass of the query
+        over the flat vectors, each filter selecting its positions from the same scores.
+        Other searches run one by one."""
+        ann = self._get_ann()
+        vectors = flat_vectors(self.index) if ann is None else None  # type: ignore
+        scores: np.ndarray | None = None
+        results = []
+        for filter, k in searches:
+            plan = filter.plan if isinstance(filter, MetadataFilter) else None
+            if vectors is None or (filter is not None and plan is None):
+                results.append(self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter))
+                continue
+            if scores is None:
+                vector = np.array(embedding, dtype=np.float32)
+                if self._normalize_L2:  # type: ignore
+                    vector = vector / max(np.linalg.norm(vector), 1e-12)
+                scores = vectors @ vector
+            if plan is None:
+                positions = np.arange(len(scores))
+            else:
+                positions = np.flatnonzero(self.get_metadata_index().mask(plan))
+            subset = scores[positions]
+            if k <= 0:
+                top = positions[:0]
+            elif len(subset) > k:
+                top = np.argpartition(-subset, k - 1)[:k]
+                top = top[np.argsort(-subset[top], kind="stable")]
+            else:
+                top = np.argsort(-subset, kind="stable")
+            docs = []
+            for i in top:
+                doc = self.docstore.search(self.index_to_docstore_id[int(positions[i])])  # type: ignore
+                if isinstance(doc, Document):
+                    docs.append((doc, subset[i]))
+            results.append(docs)
+        return results
+
+    @_locked
+    def similarity_search_by_vectors_in_ids(
+        self, embeddings: List[List[float]], k: int, ids: Iterable[str]
+    ) -> list[List[Tuple[Document, float]]]:
+        """Top k documents with scores for each query vector, only among the documents
+        with the given ids. All query vectors are searched in one call."""
+        mask = self.get_metadata_index().mask_in("id", ids)
+        if not len(embeddings) or not mask.any():
+            return [[] for _ in embeddings]
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self._normalize_L2:  # type: ignore
+            faiss.normalize_L2(vectors)
+        scores, indices = self._search_masked(self._get_ann(), vectors, k, mask)
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            docs = []
+            for score, i in zip(row_scores, row_indices):
+                if i == -1:
+                    continue
+                doc = self.docstore.search(self.index_to_docstore_id[int(i)])  # type: ignore
+                if isinstance(doc, Document):
+                    docs.append((doc, score))
+            results.append(docs)
+        return results
+
+    def _search_masked(
+        self, ann: faiss.Index | None, vector: np.ndarray, k: int, mask: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        positions = np.flatnonzero(mask)
+        if len(positions) <= EXACT_SUBSET_MAX:
+            return search_subset(self.index, vector, k, positions)  # type: ignore
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        return search_ann(ann or self.index, self.index, vector, k, selector)  # type: ignore
+
+
+def _index_type_of(index: faiss.Index | None) -> IndexType:
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
@@ -1,4 +1,3 @@
-import asyncio
 from datetime import datetime, timezone
 
 from python.helpers.print_style import PrintStyle
@@ -62,7 +61,8 @@ async def managed_wait(agent, target_time, is_duration_wait, log, get_heading_ca
         if log:
             log.update(heading=get_heading_callback(format_remaining_time(remaining_seconds)))
         sleep_duration = min(1.0, remaining_seconds)
-        
-        await asyncio.sleep(sleep_duration)
+
+        # woken right away by an intervention or a pause, handled on the next iteration
+        await agent.wait_for_intervention(sleep_duration)
     
     return target_time
@@ -1,4 +1,4 @@
-from python.helpers import files, memory
+from python.helpers import files, memory, prompt_segments
 from python.helpers.tool import Tool, Response
 from agent import Agent
 from python.helpers.log import LogItem
@@ -48,6 +48,7 @@ async def update_behaviour(agent: Agent, log_item: LogItem, adjustments: str):
     # update rules file
     rules_file = get_custom_rules_file(agent)
     files.write_file(rules_file, adjustments_merge)
+    prompt_segments.invalidate("behaviour")
     log_item.update(result="Behaviour updated")
 
 
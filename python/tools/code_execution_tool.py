@@ -1,4 +1,3 @@
-import asyncio
 from dataclasses import dataclass
 import shlex
 import time
@@ -28,6 +27,11 @@ OUTPUT_TIMEOUTS: dict[str, int] = {
     "dialog_timeout": 5,
 }
 
+# seconds between log updates while output streams in
+LOG_INTERVAL = 0.25
+# lines from the end of the output searched for the log heading
+HEADING_LINES = 20
+
 @dataclass
 class ShellWrap:
     id: int
@@ -239,13 +243,14 @@ class CodeExecution(Tool):
         between_output_timeout=15,  # Wait up to x seconds between outputs
         dialog_timeout=5,  # potential dialog detection timeout
         max_exec_timeout=180,  # hard cap on total runtime
-        sleep_time=0.1,
+        sleep_time=0.5,  # longest wait for output before timeouts are checked again
         prefix="",
         timeouts: dict | None = None,
     ):
 
         # if not self.state:
         self.state = await self.prepare_state(session=session)
+        shell = self.state.shells[session].session
 
         # Override timeouts if a dict is provided
         if timeouts:
@@ -256,38 +261,30 @@ class CodeExecution(Tool):
 
         start_time = time.time()
         last_output_time = start_time
-        full_output = ""
-        truncated_output = ""
+        last_log_time = 0.0
+        logged_version = 0
         got_output = False
+        if reset_full_output:
+            shell.output.reset()
 
         # if prefix, log right away
         if prefix:
             self.log.update(content=prefix)
 
         while True:
-            await asyncio.sleep(sleep_time)
-            full_output, partial_output = await self.state.shells[session].session.read_output(
-                timeout=1, reset_full_output=reset_full_output
-            )
-            reset_full_output = False  # only reset once
+            # returns as soon as the terminal reader gets output
+            partial_output = await shell.read_partial(wait=sleep_time, timeout=1)
 
             await self.agent.handle_intervention()
 
             now = time.time()
             if partial_output:
                 PrintStyle(font_color="#85C1E9").stream(partial_output)
-                # full_output += partial_output # Append new output
-                truncated_output = self.fix_full_output(full_output)
-                self.set_progress(truncated_output)
-                heading = self.get_heading_from_output(truncated_output, 0)
-                self.log.update(content=prefix + truncated_output, heading=heading)
                 last_output_time = now
                 got_output = True
 
                 # Check for shell prompt at the end of output
-                last_lines = (
-                    truncated_output.splitlines()[-3:] if truncated_output else []
-                )
+                last_lines = self.get_last_lines(shell, 3)
                 last_lines.reverse()
                 for idx, line in enumerate(last_lines):
                     for pat in self.prompt_patterns:
@@ -296,19 +293,33 @@ class CodeExecution(Tool):
                                 "Detected shell prompt, returning output early."
                             )
                             last_lines.reverse()
+                            truncated_output = self.get_output_text(shell)
+                            self.set_progress(truncated_output)
                             heading = self.get_heading_from_output(
                                 "\n".join(last_lines), idx + 1, True
                             )
-                            self.log.update(heading=heading)
+                            self.log.update(content=prefix + truncated_output, heading=heading)
                             self.mark_session_idle(session)
                             return truncated_output
 
+            # the full output is rendered for the log at most once per LOG_INTERVAL
+            if shell.output.version != logged_version and now - last_log_time >= LOG_INTERVAL:
+                truncated_output = self.get_output_text(shell)
+                self.set_progress(truncated_output)
+                heading = self.get_heading_from_output(
+                    "\n".join(self.get_last_lines(shell, HEADING_LINES)), 0
+                )
+                self.log.update(content=prefix + truncated_output, heading=heading)
+                last_log_time = now
+                logged_version = shell.output.version
+
             # Check for max execution time
             if now - start_time > max_exec_timeout:
                 sysinfo = self.agent.read_prompt(
                     "fw.code.max_time.md", timeout=max_exec_timeout
                 )
                 response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
+                truncated_output = self.get_output_text(shell)
                 if truncated_output:
                     response = truncated_output + "\n\n" + response
                 PrintStyle.warning(sysinfo)
@@ -333,6 +344,7 @@ class CodeExecution(Tool):
                         "fw.code.pause_time.md", timeout=between_output_timeout
                     )
                     response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
+                    truncated_output = self.get_output_text(shell)
                     if truncated_output:
                         response = truncated_output + "\n\n" + response
                     PrintStyle.warning(sysinfo)
@@ -343,9 +355,7 @@ class CodeExecution(Tool):
                 # potential dialog detection
                 if now - last_output_time > dialog_timeout:
                     # Check for dialog prompt at the end of output
-                    last_lines = (
-                        truncated_output.splitlines()[-2:] if truncated_output else []
-                    )
+                    last_lines = self.get_last_lines(shell, 2)
                     for line in last_lines:
                         for pat in self.dialog_patterns:
                             if pat.search(line.strip()):
@@ -359,6 +369,7 @@ class CodeExecution(Tool):
                                 response = self.agent.read_prompt(
                                     "fw.code.info.md", info=sysinfo
                                 )
+                                truncated_output = self.get_output_text(shell)
                                 if truncated_output:
                                     response = truncated_output + "\n\n" + response
                                 PrintStyle.warning(sysinfo)
@@ -370,6 +381,22 @@ class CodeExecution(Tool):
                                 )
                                 return response
 
+    def get_output_text(self, shell: LocalInteractiveSession | SSHInteractiveSession) -> str:
+        # dropped middle of very long outputs is marked like truncated text
+        output = shell.output.text(
+            placeholder=lambda length: self.agent.read_prompt(
+                "fw.msg_truncated.md", length=length
+            )
+        )
+        return self.fix_full_output(output)
+
+    def get_last_lines(
+        self, shell: LocalInteractiveSession | SSHInteractiveSession, count: int
+    ) -> list[str]:
+        # same as the last lines of get_output_text, without rendering all output
+        tail = self.fix_full_output(shell.output.last_lines(count + 1))
+        return tail.splitlines()[-count:]
+
     async def handle_running_session(
         self,
         session=0,
@@ -265,6 +265,8 @@ def run():
 
 
 def init_a0():
+    # worker pools and agent event loops, before chats are placed on them
+    initialize.initialize_workers()
     # initialize contexts and MCP
     init_chats = initialize.initialize_chats()
     # only wait for init chats, otherwise they would seem to disappear for a while on restart
@@ -0,0 +1,69 @@
+"""Streaming a large tool call token by token: parsing the whole accumulated response for
+every token (the previous behaviour) compared to feeding each token to one incremental parser.
+
+Run manually: python tests/dirty_json_benchmark.py --size 50000 --token 4
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+
+from python.helpers.dirty_json import DirtyJson
+
+
+def build_response(size: int) -> str:
+    lines, length, i = [], 0, 0
+    while length < size:
+        line = f'def handler_{i}(event):\n    return {{"id": {i}, "name": "item\\t{i}"}}\n'
+        lines.append(line)
+        length += len(line)
+        i += 1
+    return json.dumps(
+        {
+            "thoughts": ["Write the handlers module", "Then run it"],
+            "headline": "Writing handlers module",
+            "tool_name": "code_execution_tool",
+            "tool_args": {"runtime": "python", "code": "".join(lines)[:size]},
+        },
+        indent=4,
+    )
+
+
+def run(size: int, token: int, sample: int):
+    text = build_response(size)
+    tokens = [text[i : i + token] for i in range(0, len(text), token)]
+
+    # reparse the accumulated text, measured on every sample-th token and scaled up
+    start = time.perf_counter()
+    full = ""
+    for n, chunk in enumerate(tokens):
+        full += chunk
+        if n % sample == 0:
+            DirtyJson.parse_string(full)
+    reparse_s = (time.perf_counter() - start) * sample
+
+    start = time.perf_counter()
+    parser = DirtyJson()
+    for chunk in tokens:
+        parser.feed(chunk)
+    streamed = parser.close()
+    stream_s = time.perf_counter() - start
+
+    assert streamed == DirtyJson.parse_string(text)
+    print(f"response: {len(text)} chars in {len(tokens)} tokens")
+    print(f"reparse per token:  {reparse_s:.2f} s (estimated from every {sample}th token)")
+    print(f"incremental parser: {stream_s * 1e3:.1f} ms")
+    print(f"speedup:            {reparse_s / stream_s:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--token", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=50)
+    args = parser.parse_args()
+    run(args.size, args.token, args.sample)
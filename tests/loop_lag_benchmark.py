@@ -0,0 +1,91 @@
+"""Event loop lag of an agent loop while it runs blocking work (exact vector search and
+document hashing): calls made inline on the loop (the previous behaviour) compared to
+calls made through the managed worker thread pool. Other chats on the loop tick every
+10 ms, reports the loop lag measured by the executors monitor and the ticks missed.
+
+Run manually: python tests/loop_lag_benchmark.py --vectors 200000 --calls 20
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import hashlib
+import time
+
+import faiss
+import numpy as np
+
+from python.helpers import executors
+
+TICK = 0.01
+
+
+def search(index: faiss.Index, queries: np.ndarray):
+    return index.search(queries, 10)
+
+
+def digest(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+async def run_mode(index, queries, data, calls: int, chats: int, threaded: bool):
+    loop = asyncio.get_running_loop()
+    lag = executors.monitor_loop(loop, "threaded" if threaded else "inline")
+    ticks = 0
+    running = True
+
+    async def chat():
+        nonlocal ticks
+        while running:
+            await asyncio.sleep(TICK)
+            ticks += 1
+
+    tasks = [asyncio.create_task(chat()) for _ in range(chats)]
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    for _ in range(calls):
+        if threaded:
+            await executors.run_in_thread(search, index, queries)
+            await executors.run_in_thread(digest, data)
+        else:
+            search(index, queries)
+            digest(data)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    running = False
+    await asyncio.gather(*tasks)
+    expected = chats * elapsed / TICK
+    return elapsed, lag, 1 - ticks / expected if expected else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--data-mb", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatIP(args.dim)
+    index.add(rng.standard_normal((args.vectors, args.dim), dtype=np.float32))
+    queries = rng.standard_normal((4, args.dim), dtype=np.float32)
+    data = os.urandom(args.data_mb * 1024 * 1024)
+
+    for threaded in (False, True):
+        elapsed, lag, missed = asyncio.run(
+            run_mode(index, queries, data, args.calls, args.chats, threaded)
+        )
+        print(
+            f"{'thread pool' if threaded else 'inline':>11}: {elapsed:6.2f}s, "
+            f"loop lag mean {lag.mean * 1000:7.1f} ms, max {lag.max * 1000:7.1f} ms, "
+            f"{missed:.0%} chat ticks missed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Memory recall searches: two filtered searches of the same query, each embedding the query
+(the previous behaviour), compared to one multi-area search sharing the embedding and the
+pass over the vectors. Embedding latency is simulated with --embed-ms.
+
+Run manually: python tests/memory_recall_benchmark.py --size 50000 --dim 768 --embed-ms 40
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+import numpy as np
+import faiss
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from python.helpers.metadata_index import MetadataFilter
+from python.helpers.vector_index import AnnSearchMixin
+
+AREAS = ["main", "fragments", "solutions"]
+MEMORIES = "area == 'main' or area == 'fragments'"
+SOLUTIONS = "area == 'solutions'"
+
+
+class SlowEmbeddings(Embeddings):
+    def __init__(self, dim: int, delay: float):
+        self.dim = dim
+        self.delay = delay
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.delay)
+        rng = np.random.default_rng(abs(hash(text)) % (1 << 32))
+        vec = rng.normal(size=self.dim)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+class AnnFaiss(AnnSearchMixin, FAISS):
+    pass
+
+
+def run(size: int, dim: int, queries: int, embed_ms: float):
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embeddings = SlowEmbeddings(dim, embed_ms / 1000)
+    db = AnnFaiss(
+        embedding_function=embeddings,
+        index=faiss.IndexFlatIP(dim),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+    )
+    db.add_embeddings(
+        [(f"memory {i}", v.tolist()) for i, v in enumerate(vectors)],
+        metadatas=[{"area": AREAS[i % 3]} for i in range(size)],
+        ids=[str(i) for i in range(size)],
+    )
+    db.get_metadata_index()
+    memories, solutions = MetadataFilter(MEMORIES), MetadataFilter(SOLUTIONS)
+
+    start = time.perf_counter()
+    for q in range(queries):
+        query = f"query {q}"
+        old = [
+            db.similarity_search_with_score_by_vector(embeddings.embed_query(query), k=12, filter=memories),
+            db.similarity_search_with_score_by_vector(embeddings.embed_query(query), k=8, filter=solutions),
+        ]
+    old_time = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    for q in range(queries):
+        new = db.similarity_search_multi_by_vector(
+            embeddings.embed_query(f"query {q}"), [(memories, 12), (solutions, 8)]
+        )
+    new_time = (time.perf_counter() - start) / queries
+
+    assert [[d.id for d, _ in r] for r in new] == [[d.id for d, _ in r] for r in old]
+    print(f"{size} memories of dim {dim}, embedding {embed_ms:.0f} ms")
+    print(f"two searches: {old_time * 1000:8.1f} ms/recall")
+    print(f"multi search: {new_time * 1000:8.1f} ms/recall")
+    print(f"speedup: {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--embed-ms", type=float, default=40)
+    args = parser.parse_args()
+    run(args.size, args.dim, args.queries, args.embed_ms)
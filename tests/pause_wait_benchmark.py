@@ -0,0 +1,58 @@
+"""Paused agents waiting for resume: polling the paused flag every 100 ms (the previous
+behaviour) compared to waiting on a ThreadSafeEvent. Reports CPU time spent while paused
+and the delay between unpausing and the waiters resuming.
+
+Run manually: python tests/pause_wait_benchmark.py --contexts 50 --pause 3
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+
+from python.helpers.defer import ThreadSafeEvent
+
+
+async def run_mode(contexts: int, pause: float, event: ThreadSafeEvent | None):
+    state = {"paused": True}
+    resumed: list[float] = []
+
+    async def waiter():
+        if event:
+            await event.wait_for(lambda: not state["paused"])
+        else:
+            while state["paused"]:
+                await asyncio.sleep(0.1)
+        resumed.append(time.perf_counter())
+
+    tasks = [asyncio.create_task(waiter()) for _ in range(contexts)]
+    cpu = time.process_time()
+    await asyncio.sleep(pause)
+    cpu = time.process_time() - cpu
+    state["paused"] = False
+    unpaused = time.perf_counter()
+    if event:
+        event.set()
+    await asyncio.gather(*tasks)
+    return cpu, max(resumed) - unpaused
+
+
+def run(contexts: int, pause: float):
+    for name, event in (("sleep loop", None), ("event", ThreadSafeEvent())):
+        cpu, delay = asyncio.run(run_mode(contexts, pause, event))
+        print(
+            f"{name:>10}: {cpu * 1000:8.1f} ms CPU while paused, "
+            f"resume delay {delay * 1000:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contexts", type=int, default=50)
+    parser.add_argument("--pause", type=float, default=3.0)
+    args = parser.parse_args()
+    print(f"{args.contexts} paused contexts for {args.pause}s")
+    run(args.contexts, args.pause)
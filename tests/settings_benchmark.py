@@ -0,0 +1,42 @@
+"""Per-call cost of get_settings() with the cached snapshot compared to normalizing on every call
+(the previous behaviour, including the git version lookup).
+
+Run manually: python tests/settings_benchmark.py --calls 100000
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+from python.helpers import git, settings
+
+
+def per_call(func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def uncached():
+    git._version = None  # previously every call opened the repo and ran git describe
+    return settings.normalize_settings(settings.get_settings())
+
+
+def run(calls: int):
+    settings.get_settings()  # load the snapshot outside the measurement
+    old = per_call(uncached, max(1, calls // 1000))
+    new = per_call(settings.get_settings, calls)
+    print(f"normalize per call: {old * 1e3:.3f} ms")
+    print(f"cached snapshot:    {new * 1e6:.3f} us")
+    print(f"speedup:            {old / new:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.calls)
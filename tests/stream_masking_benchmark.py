@@ -0,0 +1,69 @@
+"""Masking the accumulated text of a long streamed response after every chunk: mask_values()
+over the whole text (the previous behaviour) compared to a stream masker that reuses the
+masked prefix.
+
+Run manually: python tests/stream_masking_benchmark.py --size 200000 --chunk 16 --rate 0.001
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import string
+import tempfile
+import time
+
+from python.helpers.secrets import SecretsManager
+
+
+def run(secret_count: int, size: int, chunk: int, rate: float):
+    rng = random.Random(42)
+    alphabet = string.ascii_letters + string.digits
+    secrets = {
+        f"KEY_{i}": "sk-" + "".join(rng.choices(alphabet, k=rng.randint(16, 48)))
+        for i in range(secret_count)
+    }
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(2000)]
+    parts, length = [], 0
+    while length < size:
+        word = rng.choice(list(secrets.values())) if rng.random() < rate else rng.choice(words)
+        parts.append(word)
+        length += len(word) + 1
+    text = " ".join(parts)
+    prefixes = [text[:end] for end in range(chunk, len(text) + chunk, chunk)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "secrets.env")
+        with open(path, "w") as f:
+            f.write("\n".join(f"{k}={v}" for k, v in secrets.items()))
+        manager = SecretsManager(path)
+        manager.mask_values("warm up")
+
+        start = time.perf_counter()
+        for full in prefixes:
+            expected = manager.mask_values(full)
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        masker = manager.create_stream_masker()
+        for full in prefixes:
+            masked = masker.mask(full)
+        stream_s = time.perf_counter() - start
+
+    assert masked == expected
+    print(f"{secret_count} secrets, {len(text)} chars in {len(prefixes)} chunks")
+    print(f"{'mask full text':<22}{full_s * 1000:>10.1f} ms")
+    print(f"{'stream masker':<22}{stream_s * 1000:>10.1f} ms")
+    print(f"{'speedup':<22}{full_s / stream_s:>10.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--secrets", type=int, default=50)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.001, help="share of words that are secrets")
+    args = parser.parse_args()
+    run(args.secrets, args.size, args.chunk, args.rate)
@@ -0,0 +1,67 @@
+"""Capturing a long command output read in small chunks: clean_string() over the whole
+accumulated output after every read plus a search of its last lines (the previous behaviour)
+compared to the incrementally cleaned TerminalOutput buffer.
+
+Run manually: python tests/terminal_output_benchmark.py --size 2000000 --chunk 4096
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+
+from python.helpers.terminal_output import TerminalOutput, clean_string
+
+
+def run(size: int, chunk: int, samples: int):
+    rng = random.Random(42)
+    parts, length = [], 0
+    while length < size:
+        if rng.random() < 0.05:
+            part = "".join(f"\r\x1b[2K{p}%" for p in range(0, 101, 10)) + "\r\n"
+        else:
+            part = f"\x1b[32mINFO\x1b[0m line {length} " + "x" * rng.randint(10, 120) + "\r\n"
+        parts.append(part)
+        length += len(part)
+    raw = "".join(parts)
+    chunks = [raw[pos : pos + chunk] for pos in range(0, len(raw), chunk)]
+
+    # previous behaviour, sampled: cost of a read grows with the output so far
+    step = max(1, len(chunks) // samples)
+    measured, full = 0.0, ""
+    for i, part in enumerate(chunks):
+        full += part
+        if i % step == 0 or i == len(chunks) - 1:
+            start = time.perf_counter()
+            text = clean_string(full)
+            text.splitlines()[-3:]
+            measured += time.perf_counter() - start
+    sampled = len(range(0, len(chunks), step)) + (0 if (len(chunks) - 1) % step == 0 else 1)
+    old_time = measured / sampled * len(chunks)
+    old_text = clean_string(raw)
+
+    start = time.perf_counter()
+    output = TerminalOutput(max_chars=len(raw) * 2)
+    for part in chunks:
+        output.feed(part)
+        output.last_lines(4)
+    new_text = output.text()
+    new_time = time.perf_counter() - start
+
+    assert new_text == old_text
+    print(f"output: {len(raw)} chars in {len(chunks)} reads of {chunk}")
+    print(f"clean_string per read (estimated): {old_time:.3f}s")
+    print(f"TerminalOutput:                    {new_time:.3f}s")
+    print(f"speedup: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2_000_000)
+    parser.add_argument("--chunk", type=int, default=4096)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    run(args.size, args.chunk, args.samples)
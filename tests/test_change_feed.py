@@ -0,0 +1,67 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+
+from python.helpers import change_feed
+
+
+def test_wait_returns_immediately_when_behind():
+    revision = change_feed.mark_dirty("ctx")
+    assert change_feed.get_context_revision("ctx") == revision
+    result = asyncio.run(change_feed.wait_for_change(revision - 1, timeout=5, ctxid="ctx"))
+    assert result == revision
+
+
+def test_wait_wakes_on_change_from_other_thread():
+    revision = change_feed.get_revision()
+    timer = threading.Timer(0.05, change_feed.mark_dirty, args=("ctx",))
+    timer.start()
+    result = asyncio.run(change_feed.wait_for_change(revision, timeout=5, ctxid="ctx"))
+    timer.join()
+    assert result > revision
+
+
+def test_wait_times_out_without_change():
+    revision = change_feed.get_revision()
+    assert asyncio.run(change_feed.wait_for_change(revision, timeout=0.05)) == revision
+
+
+def test_context_change_wakes_only_its_pollers():
+    async def main():
+        revision = change_feed.get_revision()
+        own = asyncio.create_task(change_feed.wait_for_change(revision, 5, "shown"))
+        other = asyncio.create_task(change_feed.wait_for_change(revision, 0.2, "other"))
+        await asyncio.sleep(0.01)
+        list_revision = change_feed.get_list_revision()
+        change_feed.mark_dirty("shown")  # e.g. a streamed log chunk
+        assert await own > revision
+        await asyncio.sleep(0.05)
+        assert not other.done()  # waits until its timeout
+        await other
+        assert change_feed.get_list_revision() == list_revision
+
+    asyncio.run(main())
+
+
+def test_list_change_wakes_all_pollers():
+    async def main():
+        revision = change_feed.get_revision()
+        waiters = [
+            asyncio.create_task(change_feed.wait_for_change(revision, 5, ctxid))
+            for ctxid in ("a", "b", "")
+        ]
+        await asyncio.sleep(0.01)
+        change_feed.mark_dirty("a", listed=True)  # renamed
+        assert all(result > revision for result in await asyncio.gather(*waiters))
+        assert change_feed.get_list_revision() > revision
+
+    asyncio.run(main())
+
+
+def test_revision_of_previous_server_run_returns_immediately():
+    revision = change_feed.get_revision()
+    result = asyncio.run(change_feed.wait_for_change(revision + 1000, timeout=5))
+    assert result == revision
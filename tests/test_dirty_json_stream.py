@@ -0,0 +1,75 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import random
+
+from python.helpers.dirty_json import DirtyJson
+
+
+RESPONSE = {
+    "thoughts": ["list files", "then \"quote\" them"],
+    "headline": "Listing files",
+    "tool_name": "code_execution_tool",
+    "tool_args": {
+        "runtime": "python",
+        "code": "import os\nprint(os.listdir('.'))\n# \\u00e9 and {braces} [brackets]\n",
+        "flags": [1, -2.5, True, None],
+    },
+}
+
+
+def stream(text: str, sizes=(1, 7)) -> DirtyJson:
+    rng = random.Random(1)
+    parser = DirtyJson()
+    i = 0
+    while i < len(text):
+        n = rng.randint(*sizes)
+        parser.feed(text[i : i + n])
+        i += n
+    return parser
+
+
+def test_streamed_result_equals_parse():
+    for text in [
+        json.dumps(RESPONSE),
+        json.dumps(RESPONSE, indent=4),
+        "Sure, here it is:\n```json\n" + json.dumps(RESPONSE) + "\n```",
+        "{thoughts: ['a', 'b'], tool_name: response, // comment\n tool_args: {text: '''multi\nline'''}}",
+        '{"a": "cut off',
+        '{"a": [1, 2,',
+    ]:
+        parser = stream(text)
+        assert parser.close() == DirtyJson.parse_string(text)
+
+
+def test_partial_values_visible_while_streaming():
+    parser = DirtyJson()
+    parser.feed('{"tool_name": "response", "tool_args": {"text": "Hel')
+    assert parser.result == {"tool_name": "response", "tool_args": {"text": "Hel"}}
+    parser.feed('lo')
+    assert parser.result["tool_args"]["text"] == "Hello"
+    parser.feed(' world"}}')
+    assert parser.close() == {"tool_name": "response", "tool_args": {"text": "Hello world"}}
+
+
+def test_changed_holds_top_level_keys_touched_by_chunk():
+    parser = DirtyJson()
+    parser.feed('{"headline": "Lis')
+    assert parser.changed == {"headline"}
+    parser.feed('ting", "tool_name": "x", "tool_')
+    assert parser.changed == {"headline", "tool_name"}
+    parser.feed('args": {"code": "pri')
+    assert parser.changed == {"tool_args"}
+    parser.feed('nt(1)"}}')
+    assert parser.changed == {"tool_args"}
+    parser.feed(" trailing")
+    assert parser.changed == set()
+
+
+def test_text_before_document_is_skipped():
+    parser = DirtyJson()
+    assert parser.feed("Let me think") is None
+    assert parser.feed(' about it {"a"') == {}
+    assert parser.feed(": 1}") == {"a": 1}
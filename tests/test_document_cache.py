@@ -0,0 +1,69 @@
+import sys, os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from python.helpers.document_cache import (
+    DocumentCache,
+    file_validator,
+    http_validator,
+    make_key,
+)
+
+
+def test_round_trip_with_vectors(tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache.db"))
+    vectors = np.random.default_rng(1).random((3, 8)).astype(np.float32)
+    cache.put("a", "file:///a.pdf", "full text", ["c1", "c2", "c3"], vectors, "model")
+    cache.put("b", "file:///b.pdf", "text only")
+
+    doc = cache.get("a")
+    assert doc is not None
+    assert doc.text == "full text" and doc.chunks == ["c1", "c2", "c3"] and doc.model == "model"
+    assert np.array_equal(doc.vectors, vectors)  # type: ignore[arg-type]
+
+    doc = cache.get("b")
+    assert doc is not None and doc.chunks is None and doc.vectors is None
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 1, 2)
+    assert abs(stats.hit_rate - 2 / 3) < 1e-9
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    DocumentCache(path).put("a", "file:///a.txt", "text")
+    assert DocumentCache(path).get("a").text == "text"  # type: ignore[union-attr]
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache.db"), max_bytes=250)
+    for key in "abc":
+        cache.put(key, key, "x" * 100)
+        time.sleep(0.01)
+    assert cache.get("a") is None  # over the limit after "c"
+    cache.get("b")  # b is now more recent than c
+    time.sleep(0.01)
+    cache.put("d", "d", "x" * 100)
+    assert cache.get("c") is None
+    assert cache.get("b") is not None and cache.get("d") is not None
+    assert cache.stats().size <= 250
+
+    cache.put("huge", "huge", "x" * 1000)  # larger than the whole cache, not stored
+    assert cache.get("huge") is None
+
+
+def test_validators(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("one")
+    first = file_validator(str(path))
+    path.write_text("two")
+    assert file_validator(str(path)) != first
+    assert make_key("file:///doc.txt", first) != make_key("file:///doc.txt", file_validator(str(path)))
+
+    assert http_validator({"etag": '"abc"'}) == 'etag:"abc"'
+    assert http_validator({"last-modified": "Mon", "content-length": "10"}) == "modified:Mon:10"
+    assert http_validator({}) is None
@@ -0,0 +1,59 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+# needs the full agent dependencies
+document_query = pytest.importorskip("python.helpers.document_query", exc_type=ImportError)
+from langchain_core.documents import Document
+
+
+class FakeAgent:
+    async def handle_intervention(self):
+        pass
+
+    def parse_prompt(self, file, **kwargs):
+        return file
+
+    async def call_utility_model(self, system, message):
+        return '["first query", "second query"]'
+
+    async def call_chat_model(self, messages):
+        self.messages = messages
+        return "answer", ""
+
+
+class FakeStore:
+    def __init__(self):
+        self.searches = []
+
+    async def search_documents_multi(self, queries, document_uris, limit, threshold):
+        self.searches.append((queries, document_uris, limit))
+        return [
+            [Document(f"{query} chunk {i}", metadata={"id": f"{query}-{i}"}) for i in range(limit)]
+            for query in queries
+        ]
+
+
+def test_questions_are_searched_once_across_all_documents():
+    helper = document_query.DocumentQueryHelper.__new__(document_query.DocumentQueryHelper)
+    helper.agent = FakeAgent()
+    helper.store = FakeStore()
+    helper.progress_callback = lambda text: None
+    indexed = []
+
+    async def document_get_content(uri, add_to_db=False):
+        indexed.append(uri)
+        return ""
+
+    helper.document_get_content = document_get_content
+    uris = [f"/docs/{i}.txt" for i in range(5)]
+    found, answer = asyncio.run(helper.document_qa(uris, ["question 1", "question 2"]))
+
+    assert found and answer == "answer"
+    assert sorted(indexed) == uris
+    # the context holds at most 100 chunks per question, whatever the number of documents
+    assert helper.store.searches == [(["first query", "second query"], uris, 100)]
+    assert helper.agent.messages[1].content.count(" chunk ") == 200
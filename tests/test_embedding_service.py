@@ -0,0 +1,95 @@
+import sys, os
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import InMemoryByteStore
+
+from python.helpers.embedding_service import EmbeddingService, SQLiteByteStore
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.batches: list[list[str]] = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(t)), float(ord(t[0]))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_sqlite_store_roundtrip(tmp_path):
+    store = SQLiteByteStore(str(tmp_path / "cache.db"))
+    store.mset([("a", b"1"), ("b", b"2")])
+    assert store.mget(["b", "x", "a"]) == [b"2", None, b"1"]
+    assert sorted(store.yield_keys(prefix="a")) == ["a"]
+    store.mdelete(["a"])
+    assert store.mget(["a", "b"]) == [None, b"2"]
+    store.close()
+
+    # persisted in the single file
+    reopened = SQLiteByteStore(str(tmp_path / "cache.db"))
+    assert reopened.mget(["b"]) == [b"2"]
+    assert os.listdir(tmp_path) and all(n.startswith("cache.db") for n in os.listdir(tmp_path))
+
+
+def test_sqlite_store_migrates_from_fallback(tmp_path):
+    legacy = InMemoryByteStore()
+    legacy.mset([("old", b"vector")])
+    store = SQLiteByteStore(str(tmp_path / "cache.db"), fallback=legacy)
+    assert store.mget(["old", "none"]) == [b"vector", None]
+    legacy.mdelete(["old"])
+    assert store.mget(["old"]) == [b"vector"]
+
+
+def test_concurrent_queries_are_coalesced():
+    model = CountingEmbeddings(delay=0.05)
+    service = EmbeddingService(model, batch_size=64, max_concurrency=1)
+    texts = [f"query {i}" for i in range(20)] + ["query 0"]
+    results: dict[int, list[float]] = {}
+
+    def worker(i):
+        results[i] = service.embed_query(texts[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results[i] == model.embed_documents([texts[i]])[0] for i in range(len(texts)))
+    sent = model.batches[:-len(texts)]
+    assert len(sent) < 5
+    # duplicates within a batch are embedded once
+    assert sum(len(b) for b in sent) <= 20
+
+
+def test_documents_split_into_bounded_batches():
+    model = CountingEmbeddings()
+    service = EmbeddingService(model, batch_size=8, max_concurrency=2)
+    texts = [f"doc {i}" for i in range(30)]
+    vectors = asyncio.run(service.aembed_documents(texts))
+    assert vectors == [[float(len(t)), float(ord(t[0]))] for t in texts]
+    assert all(len(b) <= 8 for b in model.batches)
+    assert service.embed_documents([]) == []
+
+
+def test_errors_reach_every_caller():
+    service = EmbeddingService(CountingEmbeddings(fail=True))
+    with pytest.raises(RuntimeError):
+        service.embed_query("x")
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.aembed_query("y"))
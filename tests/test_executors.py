@@ -0,0 +1,90 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from python.helpers import executors
+
+
+@pytest.fixture(autouse=True)
+def pools():
+    executors.configure(threads=2)
+    yield
+    executors.configure()
+
+
+def test_run_in_thread_uses_worker_pool():
+    async def main():
+        name = await executors.run_in_thread(lambda: threading.current_thread().name)
+        value = await executors.run_in_thread(pow, 2, exp=10)
+        return name, value
+
+    name, value = asyncio.run(main())
+    assert name.startswith("Worker")
+    assert value == 1024
+
+
+def test_configure_replaces_thread_pool():
+    pool = executors.get_thread_pool()
+    assert pool._max_workers == 2
+    executors.configure(threads=3)
+    assert executors.get_thread_pool() is not pool
+    assert executors.get_thread_pool()._max_workers == 3
+
+
+def test_serial_pool_keeps_order():
+    done = []
+    pool = executors.get_serial_pool("TestSerial")
+    futures = [pool.submit(done.append, i) for i in range(50)]
+    for future in futures:
+        future.result()
+    assert done == list(range(50))
+    assert executors.get_serial_pool("TestSerial") is pool
+
+
+def test_monitor_loop_measures_blocking(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(executors, "LAG_INTERVAL", 0.01)
+    monkeypatch.setattr(executors, "LAG_WARN", 0.1)
+    monkeypatch.setattr(executors.PrintStyle, "warning", warnings.append)
+
+    async def main():
+        lag = executors.monitor_loop(asyncio.get_running_loop(), "test")
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop
+        await asyncio.sleep(0.05)
+        # to_thread runs in the managed pool of a monitored loop
+        name = await asyncio.to_thread(lambda: threading.current_thread().name)
+        assert lag in executors.get_loop_lags()
+        return lag, name
+
+    lag, name = asyncio.run(main())
+    assert lag.samples >= 2
+    assert lag.blocked >= 1
+    assert lag.max >= 0.15
+    assert "Event loop 'test' was blocked" in warnings[0]
+    assert name.startswith("Worker")
+
+
+def test_probe_stops_with_terminated_loop_thread():
+    from python.helpers.defer import EventLoopThread
+
+    loop_thread = EventLoopThread("TestProbeStop")
+    loop, thread = loop_thread.loop, loop_thread.thread
+
+    async def probe():
+        return executors._probes.get(asyncio.get_running_loop())
+
+    task = loop_thread.run_coroutine(probe()).result(5)
+    assert task and not task.done()
+
+    loop_thread.terminate()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert task.cancelled()  # not left pending in the dropped loop
+    assert all(lag.name != "TestProbeStop" for lag in executors.get_loop_lags())
+    loop.close()
@@ -0,0 +1,75 @@
+import sys, os
+import asyncio
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import extension
+
+
+EXTENSION_SOURCE = """
+from python.helpers.extension import Extension
+
+class Ext(Extension):
+    async def execute(self, calls=None, **kwargs):
+        calls.append({tag!r})
+"""
+
+
+def write_extension(folder, name, tag):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w") as f:
+        f.write(EXTENSION_SOURCE.format(tag=tag))
+
+
+class FakeAgent:
+    class config:
+        profile = "dev"
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    defaults, profile = str(tmp_path / "defaults"), str(tmp_path / "profile")
+    write_extension(defaults, "_10_a.py", "default a")
+    write_extension(defaults, "_20_b.py", "default b")
+    write_extension(profile, "_20_b.py", "profile b")
+    write_extension(profile, "_15_c.py", "profile c")
+    monkeypatch.setattr(
+        extension,
+        "_get_folders",
+        lambda point, prof: [defaults, profile] if prof else [defaults],
+    )
+    extension.clear_cache()
+    extension.reset_timings()
+    extension.set_watch(False)
+    yield defaults, profile
+    extension.set_watch(None)
+    extension.clear_cache()
+
+
+def test_chain_merged_and_cached(folders):
+    chain = extension.get_extension_chain("point", "dev")
+    assert [extension._get_file_from_module(c.__module__) for c in chain] == ["_10_a", "_15_c", "_20_b"]
+    assert extension.get_extension_chain("point", "dev") is chain
+    assert len(extension.get_extension_chain("point", "")) == 2
+
+    calls = []
+    asyncio.run(extension.call_extensions("point", agent=FakeAgent(), calls=calls))  # type: ignore
+    assert calls == ["default a", "profile c", "profile b"]
+
+    timings = {t.name: t for t in extension.get_timings()}
+    assert set(timings) == {"_10_a", "_15_c", "_20_b"}
+    assert all(t.calls == 1 and t.extension_point == "point" for t in timings.values())
+
+
+def test_watch_reloads_changed_folder(folders, monkeypatch):
+    defaults, _ = folders
+    extension.set_watch(True)
+    monkeypatch.setattr(extension, "WATCH_INTERVAL", 0.0)
+    assert len(extension.get_extension_chain("point", "")) == 2
+
+    write_extension(defaults, "_30_d.py", "default d")
+    time.sleep(0.01)
+    assert len(extension.get_extension_chain("point", "")) == 3
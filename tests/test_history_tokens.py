@@ -0,0 +1,119 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+# needs the full agent dependencies
+history = pytest.importorskip("python.helpers.history", exc_type=ImportError)
+
+
+class FakeAgent:
+    async def call_utility_model(self, system, message):
+        return "short summary"
+
+    def read_prompt(self, file, **kwargs):
+        return file
+
+    def parse_prompt(self, file, **kwargs):
+        return kwargs["summary"]
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Word counts instead of tiktoken, with a log of what was tokenized."""
+    calls: list[list[str]] = []
+
+    def approximate_tokens(text):
+        calls.append([text])
+        return len(text.split())
+
+    def approximate_tokens_batch(texts):
+        calls.append(list(texts))
+        return [len(text.split()) for text in texts]
+
+    monkeypatch.setattr(history.tokens, "approximate_tokens", approximate_tokens)
+    monkeypatch.setattr(history.tokens, "approximate_tokens_batch", approximate_tokens_batch)
+    return calls
+
+
+@pytest.fixture
+def hist():
+    return history.History(agent=FakeAgent())
+
+
+def test_messages_are_counted_lazily_and_in_one_batch(counted, hist):
+    topic = hist.current
+    for i in range(3):
+        topic.add_message(False, f"message {i}")
+    assert counted == []
+
+    restored = history.Message.from_dict(
+        {"ai": True, "content": "stored count", "tokens": 42}, history=hist
+    )
+    assert restored.tokens == 42
+
+    topic.set_messages(topic.messages + [restored])
+    assert counted == []
+    total = topic.get_tokens()
+    # one batch for the three new messages, the stored count is kept
+    assert len(counted) == 1 and len(counted[0]) == 3
+    assert total == sum(m.tokens for m in topic.messages[:3]) + 42
+
+
+def test_topic_total_is_invalidated_by_changes(counted, hist):
+    topic = hist.current
+    topic.add_message(False, "one two")
+    topic.add_message(True, "three four five")
+    before = topic.get_tokens()
+    assert topic.get_tokens() == before  # cached
+
+    topic.add_message(False, "six")
+    assert topic.get_tokens() > before
+
+    before = topic.get_tokens()
+    topic.messages[1].set_summary("x")
+    assert topic.get_tokens() < before
+
+    topic.set_messages(topic.messages[:1])
+    assert topic.get_tokens() == topic.messages[0].get_tokens()
+
+    topic.summary = "a b c d e f g h i j k l m n o p"
+    assert topic.get_tokens() == 16
+    topic.summary = ""
+    assert topic.get_tokens() == topic.messages[0].get_tokens()
+
+
+def test_topic_total_is_invalidated_by_compress_attention(counted, hist):
+    topic = hist.current
+    for i in range(6):
+        topic.add_message(i % 2 == 1, "long message content " * 5)
+    before = topic.get_tokens()
+    assert asyncio.run(topic.compress_attention())
+    assert topic.get_tokens() < before
+    assert topic.get_tokens() == sum(m.get_tokens() for m in topic.messages)
+
+
+def test_bulk_total_follows_nested_records(counted, hist):
+    topic = history.Topic(history=hist)
+    topic.add_message(False, "one two three")
+    bulk = history.Bulk(history=hist)
+    bulk.set_records([topic])
+    before = bulk.get_tokens()
+    assert bulk.get_tokens() == before  # cached
+
+    topic.add_message(True, "four five")
+    assert bulk.get_tokens() > before
+
+    topic.messages[0].set_summary("x")
+    assert bulk.get_tokens() == topic.get_tokens()
+
+    topic.summary = "a b c d e f g h"
+    assert bulk.get_tokens() == 8
+
+    bulk.summary = "a b"
+    assert bulk.get_tokens() == 2
+    bulk.summary = ""
+    bulk.set_records([])
+    assert bulk.get_tokens() == 0
@@ -0,0 +1,124 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import files  # imported first, knowledge_import depends on it
+from python.helpers import knowledge_import
+
+
+def write(path, content, mtime=None):
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def load(folder, index):
+    return knowledge_import.load_knowledge(None, str(folder), index, {"area": "main"})
+
+
+def persist(index):
+    # what Memory.preload_knowledge keeps of the index between imports
+    return {
+        key: {k: v for k, v in data.items() if k not in ("documents", "state")}
+        for key, data in index.items()
+        if data["state"] != "removed"
+    }
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(knowledge_import.PrintStyle, "standard", lambda *a, **k: None)
+    monkeypatch.setattr(knowledge_import.PrintStyle, "print", lambda *a, **k: None)
+
+
+def test_unchanged_size_and_mtime_skip_hashing(tmp_path, monkeypatch):
+    write(tmp_path / "a.txt", "alpha", mtime=1_000_000)
+    index = load(tmp_path, {})
+    key = str(tmp_path / "a.txt")
+    assert index[key]["state"] == "changed"
+    assert index[key]["documents"][0].page_content == "alpha"
+    assert index[key]["documents"][0].metadata["area"] == "main"
+
+    def no_hashing(path):
+        raise AssertionError("hashed an unchanged file")
+
+    monkeypatch.setattr(knowledge_import, "calculate_checksum", no_hashing)
+    index = load(tmp_path, persist(index))
+    assert index[key]["state"] == "original"
+
+
+def test_changed_mtime_hashes_and_detects_content(tmp_path):
+    write(tmp_path / "a.txt", "alpha", mtime=1_000_000)
+    index = persist(load(tmp_path, {}))
+    key = str(tmp_path / "a.txt")
+
+    # touched, same content
+    os.utime(tmp_path / "a.txt", (1_000_100, 1_000_100))
+    index = load(tmp_path, index)
+    assert index[key]["state"] == "original"
+    assert index[key]["mtime"] == 1_000_100
+
+    # same size and new content
+    write(tmp_path / "a.txt", "gamma", mtime=1_000_200)
+    index = load(tmp_path, persist(index))
+    assert index[key]["state"] == "changed"
+    assert index[key]["documents"][0].page_content == "gamma"
+
+
+def test_failed_load_keeps_previous_version_and_retries(tmp_path, monkeypatch):
+    write(tmp_path / "a.txt", "alpha", mtime=1_000_000)
+    index = persist(load(tmp_path, {}))
+    key = str(tmp_path / "a.txt")
+    index[key]["ids"] = ["old"]
+
+    write(tmp_path / "a.txt", "beta!", mtime=1_000_100)
+    load_file_documents = knowledge_import.load_file_documents
+
+    def broken(path, ext):
+        raise OSError("locked")
+
+    monkeypatch.setattr(knowledge_import, "load_file_documents", broken)
+    index = load(tmp_path, index)
+    # previous documents stay, the empty checksum forces a retry
+    assert index[key]["state"] == "original"
+    assert index[key]["ids"] == ["old"]
+    assert index[key]["checksum"] == ""
+
+    monkeypatch.setattr(knowledge_import, "load_file_documents", load_file_documents)
+    index = load(tmp_path, persist(index))
+    assert index[key]["state"] == "changed"
+    assert index[key]["ids"] == ["old"]  # removed by the memory before the new version is inserted
+    assert index[key]["documents"][0].page_content == "beta!"
+
+
+def test_removed_files_are_marked(tmp_path):
+    write(tmp_path / "a.txt", "alpha")
+    write(tmp_path / "b.txt", "beta")
+    index = persist(load(tmp_path, {}))
+    os.remove(tmp_path / "b.txt")
+    index = load(tmp_path, index)
+    assert index[str(tmp_path / "b.txt")]["state"] == "removed"
+    assert index[str(tmp_path / "a.txt")]["state"] == "original"
+
+
+def test_load_pool_is_kept_until_the_last_import_ends(monkeypatch):
+    class FakePool:
+        def __init__(self, **kwargs):
+            self.stopped = False
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            assert not cancel_futures
+            self.stopped = True
+
+    monkeypatch.setattr(knowledge_import, "ProcessPoolExecutor", FakePool)
+    first = knowledge_import.load_pool_session()
+    first.__enter__()
+    pool = knowledge_import._get_load_pool()
+    with knowledge_import.load_pool_session():  # import of another memory
+        assert knowledge_import._get_load_pool() is pool
+        first.__exit__(None, None, None)
+        assert not pool.stopped
+    assert pool.stopped
+    assert knowledge_import._load_pool is None
@@ -0,0 +1,90 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from python.helpers import loop_shards
+from python.helpers.defer import DeferredTask
+
+
+@pytest.fixture(autouse=True)
+def shards(monkeypatch):
+    monkeypatch.setattr(loop_shards, "_shards", [loop_shards._Shard(loop_shards.THREAD_NAME)])
+    monkeypatch.setattr(loop_shards, "_placements", {})
+    monkeypatch.setattr(loop_shards, "_next", 0)
+    yield
+    loop_shards.configure()
+
+
+def test_single_shard_keeps_previous_thread():
+    assert loop_shards.place("a") == loop_shards.THREAD_NAME
+    assert loop_shards.place("b") == loop_shards.THREAD_NAME
+
+
+def test_round_robin_and_sticky_placement():
+    loop_shards.configure(3, "round_robin")
+    names = [loop_shards.place(ctxid) for ctxid in "abcd"]
+    assert names == ["AgentContext", "AgentContext-1", "AgentContext-2", "AgentContext"]
+    # a context keeps its shard, also when the shard count changes
+    loop_shards.configure(1)
+    assert loop_shards.place("b") == "AgentContext-1"
+    assert [s.name for s in loop_shards.get_stats()] == ["AgentContext", "AgentContext-1", "AgentContext-2"]
+    loop_shards.release("b")
+    loop_shards.release("c")
+    assert [s.name for s in loop_shards.get_stats()] == ["AgentContext"]
+
+
+def test_hash_placement_is_stable(monkeypatch):
+    loop_shards.configure(4, "hash")
+    first = {ctxid: loop_shards.place(ctxid) for ctxid in map(str, range(40))}
+    monkeypatch.setattr(loop_shards, "_placements", {})
+    assert {ctxid: loop_shards.place(ctxid) for ctxid in first} == first
+    assert len(set(first.values())) == 4
+
+
+def test_least_loaded_prefers_idle_shards():
+    loop_shards.configure(2, "least_loaded")
+    assert loop_shards.place("a") == "AgentContext"
+    assert loop_shards.place("b") == "AgentContext-1"
+    release = threading.Event()
+
+    async def busy():
+        await asyncio.get_running_loop().run_in_executor(None, release.wait)
+
+    task = DeferredTask(loop_shards.place("a")).start_task(loop_shards.track, "a", busy)
+    time.sleep(0.1)
+    # shard 0 runs a task now, new contexts go to shard 1 until it is as busy
+    assert loop_shards.place("c") == "AgentContext-1"
+    stats = {s.name: s for s in loop_shards.get_stats()}
+    assert stats["AgentContext"].running == 1
+    assert stats["AgentContext-1"].contexts == 2
+    release.set()
+    task.result_sync(5)
+    assert loop_shards.get_stats()[0].running == 0
+    assert loop_shards.get_stats()[0].started == 1
+
+
+def test_blocked_shard_does_not_delay_other_shard():
+    loop_shards.configure(2, "round_robin")
+    names = [loop_shards.place("x"), loop_shards.place("y")]
+    assert names[0] != names[1]
+
+    async def block():
+        time.sleep(0.5)  # blocks its event loop
+        return threading.current_thread().name
+
+    async def quick():
+        await asyncio.sleep(0)
+        return threading.current_thread().name
+
+    blocked = DeferredTask(names[0]).start_task(loop_shards.track, "x", block)
+    time.sleep(0.05)
+    start = time.monotonic()
+    other = DeferredTask(names[1]).start_task(loop_shards.track, "y", quick)
+    assert other.result_sync(5) == names[1]
+    assert time.monotonic() - start < 0.3
+    assert blocked.result_sync(5) == names[0]
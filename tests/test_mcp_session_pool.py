@@ -0,0 +1,165 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+
+import pytest
+
+from python.helpers import mcp_session_pool
+
+
+class FakeServer:
+    """Stands in for the transport, sessions of a dropped connection stop answering."""
+
+    def __init__(self):
+        self.sessions: list["FakeSession"] = []
+
+    def drop(self):
+        for session in self.sessions:
+            session.dropped = True
+
+
+class FakeSession:
+    def __init__(self, read, write, read_timeout_seconds=None):
+        self.server: FakeServer = read
+        self.dropped = False
+        self.closed = False
+
+    async def __aenter__(self):
+        self.server.sessions.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def initialize(self):
+        pass
+
+    async def send_ping(self):
+        self.check()
+
+    def check(self):
+        if self.dropped:
+            raise ConnectionError("connection lost")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(mcp_session_pool, "ClientSession", FakeSession)
+    return FakeServer()
+
+
+@pytest.fixture
+def pool():
+    pool = mcp_session_pool.SessionPool(thread_name="MCPSessionsTest")
+    yield pool
+    pool.close_all()
+
+
+def connect_to(server: FakeServer):
+    connects = []
+
+    async def connect(stack):
+        connects.append(1)
+        return server, None
+
+    return connect, connects
+
+
+async def use(session: FakeSession):
+    session.check()
+    return session
+
+
+def test_session_is_reused(server, pool):
+    connect, connects = connect_to(server)
+    first = asyncio.run(pool.run("server", connect, use))
+    second = asyncio.run(pool.run("server", connect, use))
+    assert first is second
+    assert len(connects) == 1
+
+
+def test_reconnect_after_dropped_session(server, pool):
+    connect, connects = connect_to(server)
+    first = asyncio.run(pool.run("server", connect, use))
+    server.drop()
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.run("server", connect, use))
+    assert first.closed  # did not answer the ping, dropped from the pool
+
+    second = asyncio.run(pool.run("server", connect, use))
+    assert second is not first and not second.closed
+    assert len(connects) == 2
+
+
+def test_retry_once_on_new_session(server, pool):
+    connect, connects = connect_to(server)
+    first = asyncio.run(pool.run("server", connect, use))
+    server.drop()
+    second = asyncio.run(pool.run("server", connect, use, retry=True))
+    assert second is not first
+    assert len(connects) == 2
+
+    calls = []
+
+    async def always_failing(session):
+        calls.append(session)
+        server.drop()
+        session.check()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.run("server", connect, always_failing, retry=True))
+    assert len(calls) == 2  # repeated once, not more
+
+
+def test_error_of_live_session_is_not_retried(server, pool):
+    connect, connects = connect_to(server)
+    calls = []
+
+    async def invalid_call(session):
+        calls.append(session)
+        raise ValueError("unknown tool")
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.run("server", connect, invalid_call, retry=True))
+    assert len(calls) == 1 and len(connects) == 1
+    assert not calls[0].closed  # server still answers, the session is kept
+
+
+def test_idle_session_is_evicted(server, pool, monkeypatch):
+    monkeypatch.setattr(mcp_session_pool, "EVICTION_INTERVAL", 0.05)
+    monkeypatch.setattr(mcp_session_pool, "IDLE_TIMEOUT", 0.1)
+    connect, connects = connect_to(server)
+    session = asyncio.run(pool.run("server", connect, use))
+
+    deadline = time.monotonic() + 5
+    while not session.closed and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert session.closed
+    assert "server" not in pool._sessions
+
+    asyncio.run(pool.run("server", connect, use))
+    assert len(connects) == 2
+
+
+def test_requests_in_flight_are_bounded(server, pool):
+    connect, connects = connect_to(server)
+    running, peak = [], []
+
+    async def slow(session):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+        return session
+
+    async def burst():
+        return await asyncio.gather(
+            *[pool.run("server", connect, slow) for _ in range(12)]
+        )
+
+    sessions = asyncio.run(burst())
+    assert len(set(map(id, sessions))) == 1 and len(connects) == 1
+    assert max(peak) == mcp_session_pool.MAX_CONCURRENT_REQUESTS
@@ -0,0 +1,114 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from python.helpers.memory_journal import MemoryJournal
+
+DIM = 8
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(sum(text.encode()))
+        return rng.random(DIM).tolist()
+
+
+def _new_db():
+    return FAISS(
+        embedding_function=FakeEmbeddings(),
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+    )
+
+
+def _add(db, journal, texts, ids):
+    docs = [Document(t, metadata={"id": i}) for t, i in zip(texts, ids)]
+    vectors = db.embedding_function.embed_documents(texts)
+    db.add_embeddings(zip(texts, vectors), metadatas=[d.metadata for d in docs], ids=ids)
+    journal.append_add(docs, ids, vectors)
+
+
+def _load(path):
+    return FAISS.load_local(path, FakeEmbeddings(), allow_dangerous_deserialization=True)
+
+
+def test_replay_and_compaction(tmp_path):
+    path = str(tmp_path)
+    db = _new_db()
+    db.save_local(path)
+    journal = MemoryJournal(path)
+
+    _add(db, journal, ["alpha", "beta", "gamma"], ["a", "b", "c"])
+    db.delete(["b"])
+    journal.append_delete(["b"])
+    db.delete(["a"])
+    _add(db, journal, ["alpha v2"], ["a"])  # journaled as add only, upsert on replay
+
+    restored = _load(path)
+    assert journal.replay(restored) == 3
+    assert sorted(restored.docstore._dict) == ["a", "c"]  # type: ignore
+    assert restored.docstore._dict["a"].page_content == "alpha v2"  # type: ignore
+    assert restored.index.ntotal == db.index.ntotal
+
+    assert journal.compact(db, background=False)
+    assert not os.path.exists(journal.journal_path)
+    assert not os.path.exists(journal.compacting_path)
+
+    compacted = _load(path)
+    assert journal.replay(compacted) == 0
+    assert sorted(compacted.docstore._dict) == ["a", "c"]  # type: ignore
+
+
+def test_replay_docs_for_reindex(tmp_path):
+    path = str(tmp_path)
+    db = _new_db()
+    journal = MemoryJournal(path)
+    _add(db, journal, ["one", "two"], ["1", "2"])
+    journal.append_delete(["1"])
+
+    docs = {"0": Document("zero", metadata={"id": "0"})}
+    journal.replay_docs(docs)
+    assert sorted(docs) == ["0", "2"]
+
+
+def test_torn_snapshot_is_detected(tmp_path):
+    path = str(tmp_path)
+    db = _new_db()
+    db.save_local(path)
+    journal = MemoryJournal(path)
+    assert journal.snapshot_intact()  # snapshot without a marker
+
+    _add(db, journal, ["one", "two"], ["1", "2"])
+    assert journal.compact(db, background=False)
+    assert journal.snapshot_intact()
+    with open(os.path.join(path, "index.faiss"), "rb") as f:
+        old_index = f.read()
+
+    _add(db, journal, ["three"], ["3"])
+    db.delete(["1"])
+    journal.append_delete(["1"])
+    assert journal.compact(db, background=False)
+    assert journal.snapshot_intact()
+
+    # crash after the store was replaced, before the index was
+    with open(os.path.join(path, "index.faiss"), "wb") as f:
+        f.write(old_index)
+    torn = _load(path)
+    assert torn.index.ntotal == len(torn.index_to_docstore_id)  # sizes match
+    assert not journal.snapshot_intact()
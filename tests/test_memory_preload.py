@@ -0,0 +1,117 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+# needs the full agent dependencies
+memory = pytest.importorskip("python.helpers.memory", exc_type=ImportError)
+Memory = memory.Memory
+
+
+class FakeLog:
+    def __init__(self):
+        self.progress: list[str] = []
+
+    def update(self, **kwargs):
+        pass
+
+    def stream(self, progress: str = "", **kwargs):
+        self.progress.append(progress)
+
+
+class FakeMemory(Memory):
+    """Knowledge preload over an in-memory document dict instead of a FAISS store."""
+
+    def __init__(self, index, block_after: int = -1):
+        super().__init__(db=None, memory_subdir="test")  # type: ignore
+        self.index = index
+        self.docs: dict[str, Document] = {}
+        self.batches = 0
+        self.block_after = block_after
+        self.blocked = asyncio.Event()
+
+    def _preload_knowledge_folders(self, log_item, kn_dirs, index):
+        return self.index
+
+    async def insert_documents(self, docs):
+        if self.batches == self.block_after:
+            self.blocked.set()
+            await asyncio.Event().wait()  # cancelled here
+        self.batches += 1
+        ids = [f"{self.batches}-{i}" for i in range(len(docs))]
+        self.docs.update(zip(ids, docs))
+        return ids
+
+    async def delete_documents_by_ids(self, ids):
+        return [self.docs.pop(id) for id in ids if id in self.docs]
+
+
+@pytest.fixture
+def db_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "abs_db_dir", lambda subdir: str(tmp_path))
+    monkeypatch.setattr(Memory, "KNOWLEDGE_INSERT_BATCH", 2)
+    return tmp_path
+
+
+def changed_index(count: int):
+    docs = [Document(f"doc {i}") for i in range(count)]
+    return {
+        "a.md": {"file": "a.md", "checksum": "x", "ids": [], "state": "changed", "documents": docs}
+    }
+
+
+def test_preload_inserts_in_batches_and_saves_index(db_dir):
+    mem = FakeMemory(changed_index(5))
+    log = FakeLog()
+    asyncio.run(mem.preload_knowledge(log, ["default"], "test"))  # type: ignore
+    assert mem.batches == 3
+    with open(db_dir / "knowledge_import.json") as f:
+        saved = json.load(f)
+    assert saved["a.md"]["ids"] == sorted(mem.docs, key=list(mem.docs).index)
+    assert "documents" not in saved["a.md"] and "state" not in saved["a.md"]
+    assert "\nEmbedded 5/5 knowledge documents" in log.progress
+
+
+def test_cancelled_preload_removes_inserted_batches(db_dir):
+    mem = FakeMemory(changed_index(7), block_after=2)
+
+    async def main():
+        task = asyncio.create_task(mem.preload_knowledge(None, ["default"], "test"))
+        await mem.blocked.wait()
+        assert len(mem.docs) == 4
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # nothing left to be inserted a second time by the next import
+    assert mem.docs == {}
+    assert not (db_dir / "knowledge_import.json").exists()
+
+
+def test_background_preload_reports_and_forgets_task(db_dir, monkeypatch):
+    errors = []
+    monkeypatch.setattr(memory.PrintStyle, "error", errors.append)
+
+    async def run(mem):
+        log = FakeLog()
+        task = asyncio.create_task(
+            mem.preload_knowledge_background(log, ["default"], "test")
+        )
+        Memory._preload_tasks["test"] = task
+        await task
+        return log
+
+    log = asyncio.run(run(FakeMemory(changed_index(3))))
+    assert log.progress[-1] == "\nKnowledge import finished"
+    assert "test" not in Memory._preload_tasks
+
+    failing = FakeMemory(changed_index(3))
+    failing._preload_knowledge_folders = lambda *args: {"a.md": {}}  # type: ignore
+    log = asyncio.run(run(failing))
+    assert log.progress[-1].startswith("\nKnowledge import failed")
+    assert errors and "test" not in Memory._preload_tasks
@@ -0,0 +1,182 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+# needs the full agent dependencies
+memory = pytest.importorskip("python.helpers.memory", exc_type=ImportError)
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+
+Memory = memory.Memory
+DIM = 8
+
+
+class FakeEmbeddings(Embeddings):
+    fail = False
+
+    def embed_documents(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding service down")
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(sum(text.encode()))
+        return rng.random(DIM).tolist()
+
+
+def new_db():
+    return memory.MyFaiss(
+        embedding_function=FakeEmbeddings(),
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+    )
+
+
+def fake_agent(subdir: str):
+    log = SimpleNamespace(log=lambda **kwargs: None)
+    config = SimpleNamespace(embeddings_model=None, knowledge_subdirs=[])
+    return SimpleNamespace(subdir=subdir, context=SimpleNamespace(log=log), config=config)
+
+
+@pytest.fixture(autouse=True)
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(Memory, "index", {})
+    monkeypatch.setattr(Memory, "_opening", {})
+    monkeypatch.setattr(Memory, "_preload_tasks", {})
+    monkeypatch.setattr(Memory, "_stopping", {})
+    monkeypatch.setattr(Memory, "_generations", {})
+    monkeypatch.setattr(memory, "abs_db_dir", lambda subdir: str(tmp_path / subdir))
+    monkeypatch.setattr(memory, "get_agent_memory_subdir", lambda agent: agent.subdir)
+    monkeypatch.setattr(memory, "get_knowledge_subdirs_by_memory_subdir", lambda *a: [])
+    monkeypatch.setattr(memory.PrintStyle, "standard", lambda *a, **k: None)
+
+
+def test_store_is_opened_once_without_blocking_other_loops(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    opened = []
+
+    def initialize(log_item, model_config, memory_subdir, in_memory=False):
+        opened.append(memory_subdir)
+        if memory_subdir == "slow":
+            started.set()
+            release.wait(5)
+        return new_db(), True
+
+    monkeypatch.setattr(Memory, "initialize", staticmethod(initialize))
+    asyncio.run(Memory.get(fake_agent("fast")))
+
+    results = []
+
+    def open_slow():  # agents of two shards
+        results.append(asyncio.run(Memory.get(fake_agent("slow"))).db)
+
+    threads = [threading.Thread(target=open_slow) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # open memories stay available while another one is opened
+    start = time.monotonic()
+    asyncio.run(Memory.get(fake_agent("fast")))
+    assert time.monotonic() - start < 1
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert opened == ["fast", "slow"]
+    assert len(results) == 2 and results[0] is results[1]
+
+
+def test_failed_open_is_retried_by_next_caller(monkeypatch):
+    attempts = []
+
+    def initialize(log_item, model_config, memory_subdir, in_memory=False):
+        attempts.append(memory_subdir)
+        if len(attempts) == 1:
+            raise RuntimeError("model not available")
+        return new_db(), True
+
+    monkeypatch.setattr(Memory, "initialize", staticmethod(initialize))
+    with pytest.raises(RuntimeError):
+        asyncio.run(Memory.get(fake_agent("main")))
+    assert Memory._opening == {}
+    assert asyncio.run(Memory.get(fake_agent("main"))).db is Memory.index["main"]
+    assert len(attempts) == 2
+
+
+def test_reload_stops_knowledge_import_before_reopening(monkeypatch):
+    events = []
+
+    def initialize(log_item, model_config, memory_subdir, in_memory=False):
+        events.append("open")
+        return new_db(), True
+
+    importing = threading.Event()
+
+    async def preload(self, log_item, kn_dirs, memory_subdir):
+        importing.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.2)  # removes what it inserted
+            events.append("import stopped")
+            raise
+
+    monkeypatch.setattr(Memory, "initialize", staticmethod(initialize))
+    monkeypatch.setattr(Memory, "preload_knowledge_background", preload)
+    monkeypatch.setattr(memory, "get_knowledge_subdirs_by_memory_subdir", lambda *a: ["default"])
+    monkeypatch.setattr(memory.settings, "get_settings", lambda: {"memory_knowledge_background": True})
+
+    # agent loop of another shard
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(Memory.get(fake_agent("main")), loop).result(5)
+        assert importing.wait(5)
+
+        memory.reload()  # embedding settings changed
+        assert Memory.index == {} and Memory._preload_tasks == {}
+        monkeypatch.setattr(memory, "get_knowledge_subdirs_by_memory_subdir", lambda *a: [])
+        asyncio.run(Memory.get(fake_agent("main")))
+        assert events == ["open", "import stopped", "open"]
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+def test_update_keeps_originals_when_embedding_fails():
+    mem = Memory(new_db(), memory_subdir="main")
+    id = asyncio.run(mem.insert_text("original", {"area": "main"}))
+    mem.db.embedding_function.fail = True
+    with pytest.raises(RuntimeError):
+        asyncio.run(mem.update_documents([memory.Document("updated", metadata={"id": id})]))
+    assert mem.get_document_by_id(id).page_content == "original"
+
+
+def test_concurrent_updates_of_one_document():
+    mem = Memory(new_db(), memory_subdir="main")
+    id = asyncio.run(mem.insert_text("original", {"area": "main"}))
+
+    def update(text):  # agents of two shards
+        doc = memory.Document(text, metadata={"id": id, "area": "main"})
+        asyncio.run(mem.update_documents([doc]))
+
+    threads = [threading.Thread(target=update, args=(f"update {i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert mem.db.index.ntotal == len(mem.db.index_to_docstore_id) == 1
+    assert mem.get_document_by_id(id).page_content.startswith("update")
@@ -0,0 +1,45 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers.metadata_index import MetadataFilter, MetadataIndex
+
+METADATAS = [
+    {"id": "1", "area": "main", "timestamp": "2024-01-01"},
+    {"id": "2", "area": "fragments", "timestamp": "2024-02-01"},
+    {"id": "3", "area": "solutions"},
+    {"id": "4", "knowledge_source": True},
+    {"id": "5", "area": "main", "document_uri": "file:///a.txt"},
+]
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        "area == 'main'",
+        "area == 'main' or area == 'fragments'",
+        "'main' == area",
+        "area != 'main'",
+        "not area == 'main'",
+        "area in 'main solutions' and timestamp >= '2024-01-01'",
+        "knowledge_source == True or area == 'main'",
+        "area == 'main' and knowledge_source == True",
+        "document_uri == 'file:///a.txt'",
+    ],
+)
+def test_mask_matches_per_document_evaluation(condition):
+    filter = MetadataFilter(condition)
+    assert filter.plan is not None
+    index = MetadataIndex()
+    index.append(METADATAS)
+    expected = [filter(m) for m in METADATAS]
+    assert index.mask(filter.plan).tolist() == expected
+
+
+def test_unsupported_condition_falls_back():
+    filter = MetadataFilter("area.startswith('ma')")
+    assert filter.plan is None
+    assert filter({"area": "main"}) is True
+    assert filter({}) is False
@@ -0,0 +1,74 @@
+import sys, os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import pdf_extract
+
+
+@pytest.fixture
+def fake_pages(monkeypatch):
+    state = {"running": 0, "max_running": 0, "backends": set()}
+    lock = threading.Lock()
+
+    def count_pages(path, backend):
+        if backend == "pymupdf" and path == "broken.pdf":
+            raise RuntimeError("cannot open")
+        return 23
+
+    def extract_range(path, start, end, backend):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+            state["backends"].add(backend)
+        time.sleep(0.01 * (end % 3))  # finish out of order
+        with lock:
+            state["running"] -= 1
+        return [(i, f"page {i}", i % 5 == 0) for i in range(start, end)]
+
+    monkeypatch.setattr(pdf_extract, "count_pages", count_pages)
+    monkeypatch.setattr(pdf_extract, "extract_range", extract_range)
+    monkeypatch.setattr(pdf_extract.executors, "PROCESS_WORKERS", 2)
+    return state
+
+
+def test_pages_joined_in_order_with_progress(fake_pages):
+    progress = []
+    with ThreadPoolExecutor(8) as executor:
+        text = asyncio.run(pdf_extract.extract_pdf("doc.pdf", progress.append, executor))
+    assert text == "\n".join(f"page {i}" for i in range(23))
+    assert progress[0] == "Extracting 23 PDF pages"
+    assert progress[-1] == "Extracted 23/23 PDF pages (5 with OCR)"
+    # at most process workers * TASKS_PER_WORKER ranges in flight
+    assert fake_pages["max_running"] <= 2 * pdf_extract.TASKS_PER_WORKER
+    assert fake_pages["backends"] == {"pymupdf"}
+
+
+def test_falls_back_to_ocr_backend(fake_pages, monkeypatch):
+    errors = []
+    monkeypatch.setattr(pdf_extract.PrintStyle, "error", errors.append)
+    with ThreadPoolExecutor(4) as executor:
+        text = asyncio.run(pdf_extract.extract_pdf("broken.pdf", executor=executor))
+    assert text.startswith("page 0\npage 1")
+    assert fake_pages["backends"] == {"pdf2image"}
+    assert "cannot open" in errors[0]
+
+
+def test_pymupdf_extracts_text_pages(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    path = str(tmp_path / "doc.pdf")
+    pdf = fitz.open()
+    for i in range(3):
+        pdf.new_page().insert_text((72, 72), f"Hello page {i}")
+    pdf.save(path)
+    pdf.close()
+
+    assert pdf_extract.count_pages(path, "pymupdf") == 3
+    pages = pdf_extract.extract_range(path, 1, 3, "pymupdf")
+    assert [(i, ocr) for i, _, ocr in pages] == [(1, False), (2, False)]
+    assert pages[0][1].startswith("Hello page 1")
@@ -0,0 +1,109 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import pytest
+
+# needs the full agent dependencies
+persist_chat = pytest.importorskip("python.helpers.persist_chat", exc_type=ImportError)
+from agent import AgentContext
+from initialize import initialize_agent
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    monkeypatch.setattr(persist_chat, "CHATS_FOLDER", str(tmp_path))
+    ctx = AgentContext(config=initialize_agent())
+    yield ctx
+    AgentContext.remove(ctx.id)
+    persist_chat._journal_states.pop(ctx.id, None)
+
+
+def load(ctxid: str) -> dict:
+    """What load_tmp_chats passes to _deserialize_context."""
+    with open(persist_chat._get_chat_file_path(ctxid), encoding="utf-8") as f:
+        data = json.load(f)
+    persist_chat._replay_journal(data, persist_chat._get_journal_file_path(ctxid))
+    return data
+
+
+def without_progress(data: dict) -> dict:
+    # progress is not restored, a loaded chat starts with the initial one
+    log = {k: v for k, v in data["log"].items() if k not in ("progress", "progress_no")}
+    return {**data, "log": log}
+
+
+def test_journal_replay_restores_live_context(context):
+    hist = context.agent0.history
+    hist.add_message(False, "first question")
+    context.log.log(type="user", heading="User message", content="first question")
+    persist_chat.save_tmp_chat(context)  # snapshot
+
+    for i in range(3):
+        hist.add_message(i % 2 == 0, f"message {i}")
+        context.log.log(type="info", heading=f"step {i}", content=f"message {i}")
+        persist_chat.save_tmp_chat(context)
+
+    hist.current.summary = "summary of the first topic"
+    context.log.logs[1].update(content="updated step")
+    persist_chat.save_tmp_chat(context)
+
+    hist.new_topic()
+    hist.add_message(False, "second topic")
+    context.data["key"] = "value"
+    persist_chat.save_tmp_chat(context)
+
+    context.log.reset()
+    context.log.log(type="info", heading="after reset")
+    hist.add_message(True, "answer")
+    persist_chat.save_tmp_chat(context)
+
+    with open(persist_chat._get_journal_file_path(context.id), encoding="utf-8") as f:
+        assert len(f.readlines()) == 7  # header and six entries, no second snapshot
+
+    expected = persist_chat._serialize_context(context)
+    data = load(context.id)
+    assert {k: v for k, v in data.items() if k != "journal_id"} == expected
+
+    restored = persist_chat._deserialize_context(data)
+    assert without_progress(persist_chat._serialize_context(restored)) == without_progress(expected)
+
+
+def test_journal_of_other_snapshot_is_ignored(context):
+    hist = context.agent0.history
+    hist.add_message(False, "in the snapshot")
+    persist_chat.save_tmp_chat(context)
+    snapshot = persist_chat._serialize_context(context)
+    hist.add_message(True, "only in the journal")
+    persist_chat.save_tmp_chat(context)
+
+    # snapshot rewritten, but the new journal header was never written
+    path = persist_chat._get_chat_file_path(context.id)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["journal_id"] = "other"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    data = load(context.id)
+    assert {k: v for k, v in data.items() if k != "journal_id"} == snapshot
+
+
+def test_torn_last_journal_line_is_skipped(context):
+    hist = context.agent0.history
+    persist_chat.save_tmp_chat(context)
+    hist.add_message(False, "complete entry")
+    persist_chat.save_tmp_chat(context)
+    expected = persist_chat._serialize_context(context)
+
+    hist.add_message(True, "torn entry")
+    persist_chat.save_tmp_chat(context)
+    journal = persist_chat._get_journal_file_path(context.id)
+    with open(journal, "rb") as f:
+        content = f.read()
+    with open(journal, "wb") as f:
+        f.write(content[: len(content) - len(content.splitlines()[-1]) // 2])
+
+    data = load(context.id)
+    assert {k: v for k, v in data.items() if k != "journal_id"} == expected
@@ -0,0 +1,96 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import prompt_segments, prompt_templates
+
+
+class FakeAgent:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def no_check_interval(monkeypatch):
+    monkeypatch.setattr(prompt_templates, "CHECK_INTERVAL", 0.0)
+
+
+def test_segment_rebuilt_on_key_change_and_invalidation():
+    agent, other = FakeAgent(), FakeAgent()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return f"segment {len(builds)}"
+
+    assert prompt_segments.get_segment(agent, "s", 1, build) == "segment 1"
+    assert prompt_segments.get_segment(agent, "s", 1, build) == "segment 1"
+    assert prompt_segments.get_segment(agent, "s", 2, build) == "segment 2"
+    assert prompt_segments.get_segment(other, "s", 2, build) == "segment 3"
+
+    prompt_segments.invalidate("s", agent=agent)
+    assert prompt_segments.get_segment(agent, "s", 2, build) == "segment 4"
+    assert prompt_segments.get_segment(other, "s", 2, build) == "segment 3"
+    prompt_segments.invalidate("s")
+    assert prompt_segments.get_segment(other, "s", 2, build) == "segment 5"
+
+
+def test_segment_rebuilt_when_read_file_changes(tmp_path):
+    agent = FakeAgent()
+    rules = tmp_path / "rules.md"
+
+    def build():
+        prompt_templates.record_dependency(str(rules))
+        return rules.read_text() if rules.exists() else "default"
+
+    assert prompt_segments.get_segment(agent, "rules", None, build) == "default"
+    rules.write_text("custom")
+    assert prompt_segments.get_segment(agent, "rules", None, build) == "custom"
+
+
+def test_segment_rebuilt_when_override_file_is_added(tmp_path):
+    from python.helpers import files
+
+    agent = FakeAgent()
+    profile_dir, default_dir = tmp_path / "profile", tmp_path / "default"
+    profile_dir.mkdir()
+    default_dir.mkdir()
+    (default_dir / "main.md").write_text("default main")
+    os.utime(profile_dir, (1_000_000, 1_000_000))
+
+    def build():
+        return files.read_prompt_file("main.md", [str(profile_dir), str(default_dir)])
+
+    assert prompt_segments.get_segment(agent, "main", None, build) == "default main"
+    # a file in a folder of higher priority shadows the one read before
+    (profile_dir / "main.md").write_text("profile main")
+    assert prompt_segments.get_segment(agent, "main", None, build) == "profile main"
+
+
+def test_project_segment_rebuilt_when_instruction_file_changes(tmp_path, monkeypatch):
+    # needs the full agent dependencies
+    system_prompt = pytest.importorskip(
+        "python.extensions.system_prompt._10_system_prompt", exc_type=ImportError
+    )
+    projects = system_prompt.projects
+    monkeypatch.setattr(projects, "PROJECTS_PARENT_DIR", str(tmp_path))
+    meta = tmp_path / "demo" / projects.PROJECT_META_DIR
+    (meta / projects.PROJECT_INSTRUCTIONS_DIR).mkdir(parents=True)
+    (meta / projects.PROJECT_HEADER_FILE).write_text('{"title": "Demo"}')
+    rules = meta / projects.PROJECT_INSTRUCTIONS_DIR / "rules.md"
+    rules.write_text("use tabs")
+    os.utime(rules, (1_000_000, 1_000_000))
+
+    agent = FakeAgent()
+    agent.context = type("Context", (), {"get_data": lambda self, key: "demo"})()
+    agent.read_prompt = lambda file, **kwargs: kwargs.get("project_instructions", "")
+
+    def build():
+        return system_prompt.get_project_prompt(agent)
+
+    assert prompt_segments.get_segment(agent, "project", "demo", build).endswith("use tabs")
+    # edited in place, the folder itself does not change
+    rules.write_text("use tab!")
+    os.utime(rules, (1_000_100, 1_000_100))
+    assert prompt_segments.get_segment(agent, "project", "demo", build).endswith("use tab!")
@@ -0,0 +1,93 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import files, prompt_templates
+
+
+PLUGIN_SOURCE = """
+import os
+from python.helpers.files import VariablesPlugin
+from python.helpers import prompt_templates
+
+class Listing(VariablesPlugin):
+    cache_variables = {cache}
+
+    def get_variables(self, file, backup_dirs=None, **kwargs):
+        with open(os.path.join(backup_dirs[0], "calls.log"), "a") as f:
+            f.write("call\\n")
+        folder = os.path.join(backup_dirs[0], "parts")
+        prompt_templates.record_dependency(folder)
+        return {{"listing": ",".join(sorted(os.listdir(folder)))}}
+"""
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    # make sure the change is visible to mtime checks on coarse filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture(autouse=True)
+def no_check_interval(monkeypatch):
+    monkeypatch.setattr(prompt_templates, "CHECK_INTERVAL", 0.0)
+    prompt_templates.clear_cache()
+    yield
+    prompt_templates.clear_cache()
+
+
+def test_single_pass_render_with_includes(tmp_path):
+    write(tmp_path / "main.md", "A {{name}} {{ include 'part.md' }} {{missing}} {{ include '/abs.md' }}")
+    write(tmp_path / "part.md", "part {{name}}")
+    result = files.read_prompt_file("main.md", [str(tmp_path)], name="{{missing}}")
+    # values are not expanded again
+    assert result == "A {{missing}} part {{missing}} {{missing}} {{ include '/abs.md' }}"
+
+
+def test_template_reloaded_when_file_changes(tmp_path):
+    write(tmp_path / "t.md", "one {{x}}")
+    assert files.read_prompt_file("t.md", [str(tmp_path)], x=1) == "one 1"
+    template = prompt_templates.get_template(str(tmp_path / "t.md"))
+    assert prompt_templates.get_template(str(tmp_path / "t.md")) is template
+
+    write(tmp_path / "t.md", "two {{x}}")
+    assert files.read_prompt_file("t.md", [str(tmp_path)], x=1) == "two 1"
+
+
+def test_json_template(tmp_path):
+    write(tmp_path / "t.md", '```json\n{"a": {{value}}, "b": "{{ include \'x.md\' }}"}\n```')
+    assert files.parse_file("t.md", [str(tmp_path)], value=[1, 2]) == {
+        "a": [1, 2],
+        "b": "{{ include 'x.md' }}",
+    }
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_plugin_variables_cached_until_dependencies_change(tmp_path, cache):
+    os.makedirs(tmp_path / "parts")
+    write(tmp_path / "parts" / "a", "")
+    write(tmp_path / "list.md", "[{{listing}}]")
+    write(tmp_path / "list.py", PLUGIN_SOURCE.format(cache=cache))
+
+    assert files.read_prompt_file("list.md", [str(tmp_path)]) == "[a]"
+    assert files.read_prompt_file("list.md", [str(tmp_path)]) == "[a]"
+    calls = (tmp_path / "calls.log").read_text().splitlines()
+    assert len(calls) == (1 if cache else 2)
+
+    write(tmp_path / "parts" / "b", "")
+    os.utime(tmp_path / "parts", ns=(0, os.stat(tmp_path / "parts").st_mtime_ns + 1_000_000_000))
+    assert files.read_prompt_file("list.md", [str(tmp_path)]) == "[a,b]"
+
+
+def test_includes_in_values_use_outer_directories():
+    # the agent0 response tool includes a file only found in the default prompts folder,
+    # the tools plugin reads it without that folder
+    dirs = [files.get_abs_path("agents", "agent0", "prompts"), files.get_abs_path("prompts")]
+    tips = files.read_prompt_file("agent.system.response_tool_tips.md", dirs)
+    result = files.read_prompt_file("agent.system.tools.md", dirs)
+    assert 'include "agent.system.response_tool_tips.md"' not in result
+    assert tips.strip() in result
@@ -0,0 +1,77 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.helpers.secrets import SecretsManager, StreamingSecretsFilter
+
+
+def _manager(tmp_path, content: str) -> SecretsManager:
+    path = tmp_path / "secrets.env"
+    path.write_text(content)
+    return SecretsManager(str(path))
+
+
+def test_mask_values_prefers_longest_value(tmp_path):
+    manager = _manager(tmp_path, "SHORT=abcd1234\nLONG=abcd1234efgh\nOTHER=zz\n")
+    text = "x abcd1234efgh y abcd1234 z zz"
+    assert (
+        manager.mask_values(text)
+        == "x §§secret(LONG) y §§secret(SHORT) z zz"  # OTHER is below min_length
+    )
+    assert manager.mask_values(text, placeholder="<{key}>").startswith("x <LONG>")
+
+
+def test_matcher_rebuilt_when_file_changes(tmp_path, monkeypatch):
+    from python.helpers import secrets
+
+    monkeypatch.setattr(secrets, "FILE_CHECK_INTERVAL", 0)
+    manager = _manager(tmp_path, "TOKEN=first-value\n")
+    assert manager.mask_values("first-value") == "§§secret(TOKEN)"
+
+    path = tmp_path / "secrets.env"
+    path.write_text("TOKEN=second-value-longer\n")
+    os.utime(path, ns=(0, 10**18))
+    assert manager.mask_values("second-value-longer") == "§§secret(TOKEN)"
+    assert manager.mask_values("first-value") == "first-value"
+
+
+def test_streaming_filter_holds_partial_secret():
+    filter = StreamingSecretsFilter({"API_KEY": "sk-secret-123"})
+    out = filter.process_chunk("value: sk-sec")
+    assert out == "value: "
+    out += filter.process_chunk("ret-123 done")
+    out += filter.finalize()
+    assert out == "value: §§secret(API_KEY) done"
+
+    filter = StreamingSecretsFilter({"API_KEY": "sk-secret-123"})
+    assert filter.process_chunk("cut sk-sec") + filter.finalize() == "cut ***"
+
+
+def test_streaming_filter_holds_prefix_shorter_than_min_trigger():
+    filter = StreamingSecretsFilter({"API_KEY": "sk-secret-123"})
+    out = filter.process_chunk("key s")
+    out += filter.process_chunk("k-secret-123.")
+    out += filter.finalize()
+    assert out == "key §§secret(API_KEY)."
+
+    filter = StreamingSecretsFilter({"API_KEY": "sk-secret-123"})
+    assert filter.process_chunk("ends with s") + filter.finalize() == "ends with s"
+
+
+def test_stream_masker_matches_mask_values(tmp_path):
+    import random
+
+    manager = _manager(tmp_path, "A=abcd\nB=abcdef\nC=cdxy12\nD=xyxyxy\n")
+    rng = random.Random(7)
+    for _ in range(200):
+        text = "".join(rng.choice("abcdefxy12 ") for _ in range(rng.randint(0, 150)))
+        masker = manager.create_stream_masker()
+        end = 0
+        while end < len(text):
+            end += rng.randint(1, 8)
+            assert masker.mask(text[:end]) == manager.mask_values(text[:end])
+
+    # text that does not continue the stream is masked from the start
+    masker = manager.create_stream_masker()
+    masker.mask("x abcdef " * 10)
+    assert masker.mask("y abcd") == "y §§secret(A)"
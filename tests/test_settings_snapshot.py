@@ -0,0 +1,33 @@
+import sys, os
+import copy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import settings
+
+
+def test_snapshot_is_cached_and_read_only():
+    snapshot = settings.get_settings()
+    assert settings.get_settings() is snapshot
+    with pytest.raises(TypeError):
+        snapshot["chat_model_name"] = "changed"  # type: ignore
+    with pytest.raises(TypeError):
+        snapshot["api_keys"]["x"] = "y"
+
+    mutable = copy.deepcopy(snapshot)
+    mutable["api_keys"]["x"] = "y"
+    assert "x" not in snapshot["api_keys"]
+    assert {**snapshot, "chat_model_name": "other"}["chat_model_name"] == "other"
+
+
+def test_storing_settings_bumps_generation(monkeypatch):
+    previous = settings.get_settings()
+    generation = settings.get_settings_generation()
+    try:
+        settings._store_settings(settings.merge_settings(previous, {"chat_model_name": "other"}))
+        assert settings.get_settings_generation() == generation + 1
+        assert settings.get_settings()["chat_model_name"] == "other"
+    finally:
+        monkeypatch.setattr(settings, "_settings", previous)
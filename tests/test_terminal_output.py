@@ -0,0 +1,81 @@
+import sys, os
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.helpers.terminal_output import TerminalOutput, clean_string
+
+
+PIECES = [
+    "\r\n", "\n", "\r", "> ", ">", " ", "\x00", "\x1b[32m", "\x1b[0m", "\x1b[2K",
+    "ok", "Downloading 10%", "Downloading 100%", "$ ", "(venv) root@host:~# ",
+]
+
+
+def _random_output(rng: random.Random, size: int) -> str:
+    return "".join(rng.choice(PIECES) for _ in range(size))
+
+
+def _chunks(rng: random.Random, text: str):
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 12)
+        yield text[pos : pos + step]
+        pos += step
+
+
+def test_chunked_feed_matches_clean_string():
+    rng = random.Random(17)
+    for _ in range(300):
+        raw = _random_output(rng, rng.randint(0, 80))
+        output = TerminalOutput()
+        fed = ""
+        for chunk in _chunks(rng, raw):
+            output.feed(chunk)
+            fed += chunk
+            assert output.text() == clean_string(fed)
+
+
+def test_last_lines_match_clean_string_tail():
+    rng = random.Random(3)
+    for _ in range(200):
+        raw = _random_output(rng, rng.randint(0, 120))
+        output = TerminalOutput()
+        for chunk in _chunks(rng, raw):
+            output.feed(chunk)
+        expected = "\n".join(clean_string(raw).split("\n")[-3:])
+        assert output.last_lines(3) == expected
+
+
+def test_progress_bar_line_is_kept_short():
+    output = TerminalOutput()
+    output.feed("start\n")
+    for i in range(10_000):
+        output.feed(f"\rprogress {i}")
+    assert len(output._line) < 30
+    assert output.text() == "start\nprogress 9999"
+
+
+def test_long_output_keeps_head_and_tail():
+    output = TerminalOutput(max_chars=100)
+    for i in range(100):
+        output.feed(f"line {i}\n")
+    text = output.text(placeholder=lambda n: f"<<{n}>>")
+    lines = text.split("\n")
+    assert lines[0] == "line 0"
+    assert lines[-2] == "line 99"
+    assert output.dropped > 0
+    assert f"<<{output.dropped}>>" in lines
+    assert output.head_chars <= 50 and output.tail_chars <= 50
+    assert output.last_lines(2) == "line 99\n"
+
+
+def test_reset_starts_new_command():
+    output = TerminalOutput()
+    output.feed("> > first\n")
+    version = output.version
+    output.reset()
+    assert output.text() == ""
+    output.feed("> second\n")
+    assert output.text() == "second\n"
+    assert output.version <= version
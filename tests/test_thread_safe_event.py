@@ -0,0 +1,61 @@
+import sys, os
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.helpers.defer import EventLoopThread, ThreadSafeEvent
+
+
+def test_wait_for_returns_when_predicate_true():
+    event = ThreadSafeEvent()
+    state = {"paused": False}
+    assert asyncio.run(event.wait_for(lambda: not state["paused"], timeout=0))
+
+
+def test_wait_for_times_out():
+    event = ThreadSafeEvent()
+    start = time.monotonic()
+    assert not asyncio.run(event.wait_for(lambda: False, timeout=0.05))
+    assert time.monotonic() - start < 1
+
+
+def test_set_from_other_thread_wakes_waiter():
+    event = ThreadSafeEvent()
+    state = {"paused": True}
+
+    async def waiter():
+        start = time.monotonic()
+        await event.wait_for(lambda: not state["paused"], timeout=5)
+        return time.monotonic() - start
+
+    loop_thread = EventLoopThread("test_thread_safe_event")
+    future = loop_thread.run_coroutine(waiter())
+    time.sleep(0.05)  # waiter is parked on the event now
+
+    def unpause():
+        state["paused"] = False
+        event.set()
+
+    threading.Thread(target=unpause).start()
+    waited = future.result(timeout=5)
+    assert 0.04 < waited < 1
+    loop_thread.terminate()
+
+
+def test_waiters_in_one_loop_all_wake():
+    event = ThreadSafeEvent()
+    state = {"ready": False}
+
+    async def main():
+        waiters = [
+            asyncio.create_task(event.wait_for(lambda: state["ready"], timeout=5))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        state["ready"] = True
+        event.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == [True, True, True]
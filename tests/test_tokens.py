@@ -0,0 +1,31 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from python.helpers import tokens
+
+try:
+    tokens.get_encoding()
+except Exception:  # encoding files are downloaded on first use
+    pytest.skip("tiktoken encoding not available", allow_module_level=True)
+
+
+def test_batch_matches_single_counts():
+    texts = ["", "short", "a longer text that is worth caching " * 10, "short"]
+    expected = [
+        len(tokens.get_encoding().encode(t, disallowed_special=())) for t in texts
+    ]
+    assert tokens.count_tokens_batch(texts) == expected
+    # second round is served from the cache
+    assert tokens.count_tokens_batch(texts) == expected
+    assert [tokens.count_tokens(t) for t in texts] == expected
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(tokens, "CACHE_SIZE", 3)
+    tokens.count_tokens_batch([f"{i} " + "x" * tokens.CACHE_MIN_CHARS for i in range(10)])
+    assert len(tokens._cache) <= 3
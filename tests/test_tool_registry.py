@@ -0,0 +1,80 @@
+import sys, os
+import time
+from collections import UserDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from python.helpers import tool_registry
+
+
+# tool base class importable by the generated tool files
+BaseTool = UserDict
+
+TOOL_SOURCE = """
+from collections import UserDict
+
+class Tool{tag}(UserDict):
+    tag = {tag!r}
+"""
+
+
+def write_tool(folder, name, tag):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name + ".py"), "w") as f:
+        f.write(TOOL_SOURCE.format(tag=tag))
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    defaults, profile = str(tmp_path / "defaults"), str(tmp_path / "profile")
+    write_tool(defaults, "search", "default")
+    write_tool(defaults, "shell", "default")
+    write_tool(profile, "search", "profile")
+    monkeypatch.setattr(
+        tool_registry,
+        "_get_files",
+        lambda name, prof: ([os.path.join(profile, name + ".py")] if prof else [])
+        + [os.path.join(defaults, name + ".py")],
+    )
+    tool_registry.clear_cache()
+    tool_registry.set_watch(False)
+    yield defaults, profile
+    tool_registry.set_watch(None)
+    tool_registry.clear_cache()
+
+
+def test_profile_overrides_and_cached(folders):
+    cls = tool_registry.get_tool_class("search", "dev", BaseTool)
+    assert cls is not None and cls.tag == "profile"  # type: ignore[attr-defined]
+    assert tool_registry.get_tool_class("search", "dev", BaseTool) is cls
+    assert tool_registry.get_tool_class("search", "", BaseTool).tag == "default"  # type: ignore[union-attr]
+    assert tool_registry.get_tool_class("shell", "dev", BaseTool).tag == "default"  # type: ignore[union-attr]
+    assert tool_registry.get_tool_class("missing", "dev", BaseTool) is None
+    assert ("dev", "missing") not in tool_registry._classes
+
+
+def test_broken_profile_tool_falls_back(folders):
+    _, profile = folders
+    with open(os.path.join(profile, "shell.py"), "w") as f:
+        f.write("raise ImportError('broken')\n")
+    assert tool_registry.get_tool_class("shell", "dev", BaseTool).tag == "default"  # type: ignore[union-attr]
+
+
+def test_watch_reloads_changed_file(folders, monkeypatch):
+    defaults, _ = folders
+    tool_registry.set_watch(True)
+    monkeypatch.setattr(tool_registry, "WATCH_INTERVAL", 0.0)
+    assert tool_registry.get_tool_class("shell", "", BaseTool).tag == "default"  # type: ignore[union-attr]
+
+    time.sleep(0.01)
+    write_tool(defaults, "shell", "changed")
+    assert tool_registry.get_tool_class("shell", "", BaseTool).tag == "changed"  # type: ignore[union-attr]
+
+
+def test_no_reload_without_watch(folders):
+    defaults, _ = folders
+    cls = tool_registry.get_tool_class("shell", "", BaseTool)
+    write_tool(defaults, "shell", "changed")
+    assert tool_registry.get_tool_class("shell", "", BaseTool) is cls
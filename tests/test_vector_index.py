@@ -0,0 +1,130 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from python.helpers.metadata_index import MetadataFilter
+from python.helpers.vector_index import AnnSearchMixin, select_index_type
+
+DIM = 16
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest(), 16))
+        vec = rng.normal(size=DIM)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+class AnnFaiss(AnnSearchMixin, FAISS):
+    pass
+
+
+def _new_db(index_type: str):
+    db = AnnFaiss(
+        embedding_function=FakeEmbeddings(),
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+    )
+    db.set_ann_index_type(index_type, build=False)
+    return db
+
+
+def test_select_index_type():
+    assert select_index_type("auto", 100) == "flat"
+    assert select_index_type("auto", 50_000) == "hnsw"
+    assert select_index_type("auto", 2_000_000) == "ivf_pq"
+    assert select_index_type("ivf_pq", 100) == "flat"  # not enough to train
+    assert select_index_type("hnsw", 10) == "hnsw"
+    assert select_index_type("unknown", 10) == "flat"
+
+
+def test_hnsw_matches_flat_and_survives_deletes():
+    texts = [f"document number {i}" for i in range(300)]
+    ids = [str(i) for i in range(300)]
+    flat = _new_db("flat")
+    hnsw = _new_db("hnsw")
+    for db in (flat, hnsw):
+        db.add_texts(texts, ids=ids)
+    hnsw.rebuild_ann(background=False)
+    assert hnsw._get_ann() is not None
+
+    # incremental add keeps the ANN index in use
+    for db in (flat, hnsw):
+        db.add_texts(["late addition"], ids=["late"])
+    assert hnsw._get_ann() is not None
+
+    query = "document number 42"
+    expected = [d.id for d, _ in flat.similarity_search_with_score(query, k=5)]
+    found = [d.id for d, _ in hnsw.similarity_search_with_score(query, k=5)]
+    assert found == expected
+
+    # deletes shift positions, search must stay correct while the ANN index is stale
+    for db in (flat, hnsw):
+        db.delete(["42", "7"])
+    results = hnsw.similarity_search_with_score(query, k=5)
+    assert all(d.id not in ("42", "7") for d, _ in results)
+    assert [d.id for d, _ in results] == [
+        d.id for d, _ in flat.similarity_search_with_score(query, k=5)
+    ]
+
+
+def test_multi_search_matches_separate_searches():
+    areas = ["main", "fragments", "solutions"]
+    texts = [f"memory {i}" for i in range(400)]
+    metadatas = [{"area": areas[i % 3]} for i in range(400)]
+    ids = [str(i) for i in range(400)]
+    db = _new_db("flat")
+    db.add_texts(texts, metadatas=metadatas, ids=ids)
+    db.delete(["5", "6"])
+
+    searches = [
+        (MetadataFilter("area == 'main' or area == 'fragments'"), 12),
+        (MetadataFilter("area == 'solutions'"), 8),
+        (None, 3),
+        (MetadataFilter("area.startswith('sol')"), 4),  # not compiled, searched separately
+        (MetadataFilter("area == 'missing'"), 5),
+    ]
+    embedding = db.embedding_function.embed_query("memory 42")  # type: ignore
+    results = db.similarity_search_multi_by_vector(embedding, searches)
+    for (filter, k), found in zip(searches, results):
+        expected = db.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+        assert [d.id for d, _ in found] == [d.id for d, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+    assert results[-1] == []
+
+
+def test_search_by_vectors_in_ids_matches_filtered_search():
+    texts = [f"chunk {i}" for i in range(200)]
+    ids = [str(i) for i in range(200)]
+    db = _new_db("flat")
+    db.add_texts(texts, metadatas=[{"id": id} for id in ids], ids=ids)
+    allowed = {str(i) for i in range(0, 200, 7)}
+
+    queries = ["chunk 14", "chunk 100", "something else"]
+    embeddings = [db.embedding_function.embed_query(q) for q in queries]  # type: ignore
+    results = db.similarity_search_by_vectors_in_ids(embeddings, 5, allowed)
+    for embedding, found in zip(embeddings, results):
+        expected = db.similarity_search_with_score_by_vector(
+            embedding, k=5, filter=lambda m: m["id"] in allowed, fetch_k=200
+        )
+        assert [d.id for d, _ in found] == [d.id for d, _ in expected]
+    assert results[0][0][0].id == "14"
+
+    assert db.similarity_search_by_vectors_in_ids(embeddings, 5, ["missing"]) == [[], [], []]
@@ -0,0 +1,96 @@
+"""Tool dispatch overhead per agent loop iteration: loading the tool class from its file on
+every call (the previous behaviour, spec_from_file_location + exec_module) compared to the
+tool registry, with and without file watching.
+
+Run manually: python tests/tool_dispatch_benchmark.py --tools 20 --iterations 2000
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tempfile
+import time
+from collections import UserDict
+
+from python.helpers import extract_tools, tool_registry
+
+# shaped like the files in python/tools: a few imports and one tool class with some methods
+TOOL_SOURCE = '''
+import asyncio, json, os, re, time
+from dataclasses import dataclass
+from collections import UserDict
+
+@dataclass
+class Result:
+    message: str
+    break_loop: bool
+
+class Tool{index}(UserDict):
+    pattern = re.compile(r"^(?P<name>[a-z_]+)(?::(?P<method>[a-z_]+))?$")
+
+    async def execute(self, **kwargs):
+        return Result(json.dumps(kwargs), False)
+
+    def describe(self):
+        return os.path.basename(__file__)
+
+    def elapsed(self, start):
+        return time.time() - start
+'''
+
+
+def run(tools: int, iterations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        defaults, profile = os.path.join(tmp, "tools"), os.path.join(tmp, "profile")
+        os.makedirs(defaults)
+        os.makedirs(profile)
+        names = [f"tool_{i}" for i in range(tools)]
+        for i, name in enumerate(names):
+            with open(os.path.join(defaults, name + ".py"), "w") as f:
+                f.write(TOOL_SOURCE.format(index=i))
+
+        def old_dispatch(name: str):
+            # profile file first, failing lookups raise and are swallowed
+            classes = []
+            try:
+                classes = extract_tools.load_classes_from_file(os.path.join(profile, name + ".py"), UserDict)
+            except Exception:
+                pass
+            if not classes:
+                classes = extract_tools.load_classes_from_file(os.path.join(defaults, name + ".py"), UserDict)
+            return classes[0]
+
+        tool_registry._get_files = lambda name, prof: [  # type: ignore[assignment]
+            os.path.join(profile, name + ".py"),
+            os.path.join(defaults, name + ".py"),
+        ]
+
+        def measure(dispatch) -> float:
+            start = time.perf_counter()
+            for i in range(iterations):
+                dispatch(names[i % tools])
+            return (time.perf_counter() - start) / iterations
+
+        old = measure(old_dispatch)
+        results = {}
+        for watch in (False, True):
+            tool_registry.clear_cache()
+            tool_registry.set_watch(watch)
+            results[watch] = measure(lambda name: tool_registry.get_tool_class(name, "dev", UserDict))
+        tool_registry.set_watch(None)
+        tool_registry.clear_cache()
+
+    print(f"{tools} tools, {iterations} dispatches (one per loop iteration)")
+    print(f"load from file per call:   {old * 1e6:9.1f} us/iteration")
+    print(f"registry:                  {results[False] * 1e6:9.1f} us/iteration ({old / results[False]:.0f}x)")
+    print(f"registry, watching files:  {results[True] * 1e6:9.1f} us/iteration ({old / results[True]:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tools", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.tools, args.iterations)
@@ -0,0 +1,63 @@
+"""Recall vs. latency of the ANN index types compared to the exact flat index.
+
+Run manually: python tests/vector_index_benchmark.py --size 50000 --dim 384
+"""
+
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+import numpy as np
+
+from python.helpers.vector_index import build_index, search_ann, select_index_type
+
+
+def run(size: int, dim: int, queries: int, k: int):
+    rng = np.random.default_rng(42)
+    # clustered data resembles real embeddings better than uniform noise
+    centers = rng.normal(size=(max(1, size // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)] + 0.3 * rng.normal(
+        size=(size, dim)
+    ).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = vectors[rng.integers(0, size, queries)] + 0.05 * rng.normal(
+        size=(queries, dim)
+    ).astype(np.float32)
+
+    flat = build_index("flat", vectors)
+    _, truth = flat.search(query_vectors, k)
+
+    print(f"{size} vectors, {dim} dims, {queries} queries, top {k}")
+    print(f"{'index':<10}{'build s':>10}{'query ms':>12}{f'recall@{k}':>12}")
+    for index_type in ("flat", "hnsw", "ivf_flat", "ivf_pq"):
+        resolved = select_index_type(index_type, size)
+        if resolved != index_type:
+            print(f"{index_type:<10} skipped, corpus too small (would use {resolved})")
+            continue
+        start = time.perf_counter()
+        index = build_index(index_type, vectors)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for q in query_vectors:
+            search_ann(index, flat, q.reshape(1, -1), k)
+        query_ms = (time.perf_counter() - start) / queries * 1000
+
+        _, found = search_ann(index, flat, query_vectors, k)
+        recall = np.mean(
+            [len(set(f) & set(t)) / k for f, t in zip(found.tolist(), truth.tolist())]
+        )
+        print(f"{index_type:<10}{build_time:>10.2f}{query_ms:>12.3f}{recall:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.size, args.dim, args.queries, args.k)
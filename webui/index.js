@@ -253,8 +253,10 @@ function setConnectionStatus(connected) {
 let lastLogVersion = 0;
 let lastLogGuid = "";
 let lastSpokenNo = 0;
+let lastRevision = 0;
+const longPollTimeout = 20; // seconds the server may hold a poll when nothing changes
 
-export async function poll() {
+export async function poll(longPoll = false) {
   let updated = false;
   try {
     // Get timezone from navigator
@@ -266,6 +268,8 @@ export async function poll() {
       notifications_from: notificationStore.lastNotificationVersion || 0,
       context: context || null,
       timezone: timezone,
+      revision: longPoll ? lastRevision : 0,
+      timeout: longPoll ? longPollTimeout : 0,
     });
 
     // Check if the response is valid
@@ -294,6 +298,7 @@ export async function poll() {
       if (chatHistoryEl) chatHistoryEl.innerHTML = "";
       lastLogVersion = 0;
       lastLogGuid = response.log_guid;
+      lastRevision = 0;
       await poll();
       return;
     }
@@ -380,6 +385,7 @@ export async function poll() {
 
     lastLogVersion = response.log_version;
     lastLogGuid = response.log_guid;
+    lastRevision = response.revision || 0;
   } catch (error) {
     console.error("Error:", error);
     setConnectionStatus(false);
@@ -478,6 +484,7 @@ export const setContext = function (id) {
   lastLogGuid = "";
   lastLogVersion = 0;
   lastSpokenNo = 0;
+  lastRevision = 0;
 
   // Stop speech when switching chats
   speechStore.stopAudio();
@@ -492,6 +499,9 @@ export const setContext = function (id) {
 
   //skip one speech if enabled when switching context
   if (localStorage.getItem("speech") == "true") skipOneSpeech = true;
+
+  // do not wait for the pending long-poll of the previous context
+  setTimeout(() => poll(), 0);
 };
 
 export const deselectChat = function () {
@@ -574,21 +584,19 @@ globalThis.updateAfterScroll = updateAfterScroll;
 // setInterval(poll, 250);
 
 async function startPolling() {
-  const shortInterval = 25;
-  const longInterval = 250;
-  const shortIntervalPeriod = 100;
-  let shortIntervalCount = 0;
+  // the server holds the poll until something changes, the interval only coalesces bursts of updates
+  const interval = 25;
+  const errorInterval = 1000;
 
   async function _doPoll() {
-    let nextInterval = longInterval;
+    let nextInterval = interval;
 
     try {
-      const result = await poll();
-      if (result) shortIntervalCount = shortIntervalPeriod; // Reset the counter when the result is true
-      if (shortIntervalCount > 0) shortIntervalCount--; // Decrease the counter on each call
-      nextInterval = shortIntervalCount > 0 ? shortInterval : longInterval;
+      await poll(true);
+      if (!getConnectionStatus()) nextInterval = errorInterval;
     } catch (error) {
       console.error("Error:", error);
+      nextInterval = errorInterval;
     }
 
     // Call the function again after the selected interval